@@ -0,0 +1,272 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+import analysis_core
+import app_paths
+import student_index
+
+logger = logging.getLogger(__name__)
+
+# =========================================================================
+# === CACHÉ DE ANÁLISIS DIRECCIONADA POR CONTENIDO ===
+# Guarda en disco local el resultado de analyze_data y las hojas leídas de
+# cada archivo SIAGIE. La clave es el SHA-256 de los bytes subidos más la
+# versión del analizador, así que un re-upload idéntico no vuelve a leer Excel.
+# =========================================================================
+
+DEFAULT_CACHE_DIR = app_paths.app_data_dir('cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+# Las entradas tienen nombres de estudiantes: no quedan en disco más de un día
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+
+def upload_hash(data):
+    """SHA-256 (hex) de los bytes del archivo subido."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(data, version=analysis_core.ANALYZER_VERSION):
+    """Clave de caché: hash del contenido + versión del analizador."""
+    return f"{upload_hash(data)}-v{version}"
+
+
+def results_cache_key(data, version=analysis_core.ANALYZER_VERSION):
+    """Clave de caché solo del resultado de analyze_data de un archivo (ver analyze_uploads)."""
+    return f"{upload_hash(data)}-resultados-v{version}"
+
+
+def sheet_cache_key(fingerprint, version=analysis_core.ANALYZER_VERSION):
+    """Clave de caché de una hoja individual (huella de su XML, ver sheet_fingerprints)."""
+    return f"hoja-{fingerprint}-v{version}"
+
+
+class AnalysisCache:
+    """
+    Caché persistente en disco con desalojo LRU acotado por tamaño y caducidad (TTL).
+    Cada entrada es un archivo pickle; la fecha de modificación marca el último uso.
+    El directorio es privado (app_paths.private_dir) y solo se cargan archivos del
+    usuario actual que nadie más puede escribir: cargar un pickle ejecuta código.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expirados': 0, 'desalojados': 0}
+        app_paths.private_dir(self.directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """Devuelve el valor guardado o None (fallo, entrada caducada o ilegible)."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                if not app_paths.is_private_file(f.fileno()):
+                    raise PermissionError(path)
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except PermissionError:
+            logger.warning("analysis_cache: se ignora %s (otro usuario puede escribirlo)", path)
+            self._remove(path)
+            self._count('misses')
+            return None
+        except Exception:
+            # Entrada corrupta (p. ej. escritura interrumpida): se descarta
+            self._remove(path)
+            self._count('misses')
+            return None
+
+        if time.time() - entry['creado'] > self.ttl_seconds:
+            self._remove(path)
+            self._count('expirados')
+            self._count('misses')
+            return None
+
+        # Marca de uso para el orden LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return entry['valor']
+
+    def put(self, key, value):
+        """Guarda el valor de forma atómica y aplica el límite de tamaño."""
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({'creado': time.time(), 'valor': value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self._evict()
+
+    def stats(self):
+        """Contadores de aciertos/fallos para monitoreo en producción."""
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        return stats
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                self._remove(os.path.join(self.directory, name))
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        # Las menos usadas recientemente salen primero
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            self._count('desalojados')
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+            if name in ('hits', 'misses'):
+                logger.info("analysis_cache %s (hits=%d, misses=%d)", name, self._stats['hits'], self._stats['misses'])
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def analyze_upload(data, cache=None):
+    """
+    Ingesta completa de un archivo subido (lo que hace el uploader del dashboard):
+    hojas leídas para el perfil por estudiante + analyze_data, con caché por archivo
+    y re-análisis incremental por hoja. Devuelve un dict con 'all_dataframes',
+    'info_areas', 'indice_estudiantes' (student_index.StudentIndex) y
+    'hojas_recalculadas'. Sin caché, siempre analiza todo.
+    """
+    key = cache_key(data)
+    entry = cache.get(key) if cache is not None else None
+    if entry is not None:
+        # Archivo idéntico a uno ya analizado: no se recalculó ninguna hoja
+        return dict(entry, hojas_recalculadas=[])
+
+    # Una sola ingesta: las hojas se leen una vez y se comparten con el análisis
+    workbook = analysis_core.read_workbook(data)
+    hojas_validas = [s for s in workbook.sheet_names if s not in analysis_core.HOJAS_NO_AREA]
+
+    # Re-upload con cambios: se reutilizan las hojas cuya huella ya está en caché
+    huellas = analysis_core.sheet_fingerprints(workbook)
+    previas = {}
+    if cache is not None:
+        for sheet in hojas_validas:
+            previa = cache.get(sheet_cache_key(huellas[sheet]))
+            if previa is not None:
+                previas[huellas[sheet]] = previa
+
+    all_dataframes = {
+        sheet: previas[huellas[sheet]]['dataframe'] if huellas[sheet] in previas else workbook.parse(sheet)
+        for sheet in hojas_validas
+    }
+    info_areas, huellas, recalculadas = analysis_core.analyze_data_incremental(
+        workbook, hojas_validas, {h: previa['resultado'] for h, previa in previas.items()}
+    )
+
+    entry = {
+        'all_dataframes': all_dataframes,
+        'info_areas': info_areas,
+        # El perfil por estudiante consulta este índice en lugar de filtrar cada hoja
+        'indice_estudiantes': student_index.StudentIndex.build(all_dataframes, info_areas),
+        'hojas_recalculadas': recalculadas,
+    }
+    if cache is not None:
+        for sheet in recalculadas:
+            cache.put(sheet_cache_key(huellas[sheet]),
+                      {'resultado': info_areas[sheet], 'dataframe': all_dataframes[sheet]})
+        cache.put(key, entry)
+        # La comparación entre períodos solo necesita los resultados (ver analyze_uploads)
+        cache.put(results_cache_key(data), info_areas)
+    return entry
+
+
+def _analyze_results(data):
+    """Tarea de un proceso del pool: solo analyze_data, sin hojas leídas ni índice de estudiantes."""
+    workbook = analysis_core.read_workbook(data)
+    hojas_validas = [s for s in workbook.sheet_names if s not in analysis_core.HOJAS_NO_AREA]
+    return analysis_core.analyze_data(workbook, hojas_validas)
+
+
+def analyze_uploads(datas, cache=None, workers=None):
+    """
+    analyze_data de varios archivos (p. ej. un archivo por período) en paralelo.
+    Solo se calculan y guardan los resultados por área (clave results_cache_key): la
+    comparación no usa las hojas leídas ni el índice de estudiantes. Toda la caché se
+    consulta y se escribe en este proceso; los archivos que faltan se analizan en un
+    pool de procesos (hasta `workers`, por defecto uno por CPU), así que la espera es
+    la del archivo más lento y no la suma. Devuelve los resultados en el orden de `datas`.
+    """
+    results = [None] * len(datas)
+    pendientes = []
+    for i, data in enumerate(datas):
+        cached = cache.get(results_cache_key(data)) if cache is not None else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pendientes.append(i)
+
+    workers = min(len(pendientes), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for i in pendientes:
+            results[i] = _analyze_results(datas[i])
+    else:
+        with analysis_core.process_pool(workers) as executor:
+            futures = {i: executor.submit(_analyze_results, datas[i]) for i in pendientes}
+            for i, future in futures.items():
+                results[i] = future.result()
+
+    if cache is not None:
+        for i in pendientes:
+            cache.put(results_cache_key(datas[i]), results[i])
+    return results
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """
+    Instancia compartida por todo el proceso (todas las sesiones de Streamlit).
+    Configurable con AULAMETRICS_CACHE_DIR, AULAMETRICS_CACHE_MAX_MB y AULAMETRICS_CACHE_TTL_HORAS.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache(
+            directory=os.environ.get('AULAMETRICS_CACHE_DIR', DEFAULT_CACHE_DIR),
+            max_bytes=int(os.environ.get('AULAMETRICS_CACHE_MAX_MB', DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+            ttl_seconds=float(os.environ.get('AULAMETRICS_CACHE_TTL_HORAS', DEFAULT_TTL_SECONDS / 3600)) * 3600,
+        )
+    return _default_cache
@@ -1,9 +1,424 @@
+import io
+import re
+import hashlib
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+import multiprocessing
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import unicodedata
+import openpyxl
+from openpyxl.utils import get_column_letter
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+from bounded_cache import BoundedLRUCache
 
 NIVELES_LOGRO = ['AD', 'A', 'B', 'C']
+# Subir cuando cambie el formato o la lógica de los resultados (invalida cachés)
+ANALYZER_VERSION = '3'
 GENERAL_SHEET_NAME = 'Generalidades' 
+# Hojas del libro SIAGIE que no son áreas curriculares
+HOJAS_NO_AREA = [GENERAL_SHEET_NAME, 'Parametros']
+
+# *** CORRECCIÓN CRÍTICA: La primera nota (NL) está en Columna D (índice 3) ***
+START_NOTE_COLUMN_INDEX = 3
+# *** CORRECCIÓN CRÍTICA: El salto es de +2 (para D -> F -> H...) ***
+JUMP_SIZE = 2
+# El primer estudiante está en la Fila 3 (índice 2)
+DATA_START_ROW_INDEX = 2
+# Fila final por defecto cuando no se detectan números de orden en la Columna A
+DEFAULT_END_ROW_INDEX = 32
+# La leyenda '01 = ...' empieza 4 filas debajo del último estudiante y se revisan 15 filas
+# (la ventana se extiende mientras sigan apareciendo líneas de leyenda seguidas)
+LEGEND_OFFSET = 4
+LEGEND_SCAN_ROWS = 15
+# Número de competencia de dos dígitos al inicio ('01 = ...', '12 = ...')
+LEGEND_NUMBER_PATTERN = re.compile(r'\d{2}')
+MAX_COMPETENCIAS = 10
+# Modo paralelo: por debajo de este número de hojas no compensa levantar procesos
+PARALLEL_MIN_SHEETS = 4
+# Columnas que lee el lector en streaming: A, B y las notas D, F, H... de hasta 10 competencias
+# (si la leyenda trae más, la hoja se vuelve a leer con las columnas necesarias)
+STREAM_MAX_COLUMN = START_NOTE_COLUMN_INDEX + JUMP_SIZE * MAX_COMPETENCIAS
+# Layouts de plantilla recordados en memoria (ver LayoutCache)
+LAYOUT_CACHE_MAX_ENTRIES = 1024
+
+class WorkbookModel:
+    """
+    Modelo en memoria de un libro SIAGIE (.xlsx).
+    El archivo se descomprime una sola vez y el XML de cada hoja se lee como máximo
+    una vez; el uploader, analyze_data y las funciones de 'Generalidades' consumen
+    las mismas filas ya leídas en lugar de volver a llamar a pd.read_excel.
+    """
+
+    def __init__(self, data, book=None):
+        self.data = data
+        if book is None:
+            book = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True, keep_links=False)
+        self.book = book
+        self.sheet_names = list(self.book.sheetnames)
+        self._rows = {}
+        self._raw = {}
+        self._parsed = {}
+        self._dimensions = {}
+        self._templates = {}
+
+    def rows(self, sheet_name):
+        """Celdas de la hoja como lista de filas, con el mismo tratamiento que pandas."""
+        if sheet_name not in self._rows:
+            self._dimension(sheet_name)
+            self._rows[sheet_name] = _read_sheet_rows(self.book[sheet_name])
+        return self._rows[sheet_name]
+
+    def raw(self, sheet_name):
+        """Equivalente a pd.read_excel(..., sheet_name=sheet_name, header=None)."""
+        if sheet_name not in self._raw:
+            self._raw[sheet_name] = _rows_to_frame(self.rows(sheet_name), header=None)
+        return self._raw[sheet_name]
+
+    def parse(self, sheet_name):
+        """Equivalente a pd.ExcelFile.parse(sheet_name) (primera fila como encabezado)."""
+        if sheet_name not in self._parsed:
+            self._parsed[sheet_name] = _rows_to_frame(self.rows(sheet_name), header=0)
+        return self._parsed[sheet_name]
+
+    def close(self):
+        """Libera el libro openpyxl y las filas ya leídas (modo de memoria acotada)."""
+        self.book.close()
+        self._rows.clear()
+        self._raw.clear()
+        self._parsed.clear()
+
+    def grade_block(self, sheet_name):
+        """
+        Bloque de notas de una hoja de área. Si la hoja ya fue leída completa (uploader)
+        se corta de esas filas; si no, se lee en streaming sin cargar la hoja entera.
+        Si la plantilla de la hoja ya se vio antes se usa su layout guardado (ver LayoutCache).
+        """
+        fingerprint = self.template_fingerprint(sheet_name)
+        layout = _layout_cache.get(fingerprint)
+
+        if sheet_name in self._rows:
+            df_full = self.raw(sheet_name)
+            block = _grade_block_from_layout(df_full, layout) if layout is not None else None
+            if block is not None:
+                return block
+            # Plantilla nueva o que ya no coincide con el layout guardado: detección completa
+            block = _grade_block_from_frame(df_full)
+        else:
+            # En streaming la detección ocurre en la misma pasada; el layout aporta el ancho
+            max_col = layout['max_col'] if layout is not None else STREAM_MAX_COLUMN
+            block = _stream_grade_block(self.book[sheet_name], max_col=max_col)
+
+        new_layout = layout_from_block(block)
+        if new_layout is not None and new_layout != layout:
+            _layout_cache.put(fingerprint, new_layout)
+        return block
+
+    def template_fingerprint(self, sheet_name):
+        """Huella de la plantilla de una hoja (nombre, columnas y encabezados), sin leer el cuerpo."""
+        if sheet_name not in self._templates:
+            if sheet_name in self._rows:
+                header = self._rows[sheet_name][:DATA_START_ROW_INDEX]
+            else:
+                self._dimension(sheet_name)
+                header = [
+                    [_convert_cell(value) for value in row]
+                    for row in self.book[sheet_name].iter_rows(max_row=DATA_START_ROW_INDEX, values_only=True)
+                ]
+            self._templates[sheet_name] = template_fingerprint(sheet_name, self._dimension(sheet_name), header)
+        return self._templates[sheet_name]
+
+    def _dimension(self, sheet_name):
+        # Rango declarado en el XML (<dimension ref="A1:M45">); se lee antes de reset_dimensions
+        if sheet_name not in self._dimensions:
+            try:
+                self._dimensions[sheet_name] = self.book[sheet_name].calculate_dimension()
+            except ValueError:
+                self._dimensions[sheet_name] = None
+        return self._dimensions[sheet_name]
+
+def _convert_cell(value):
+    # Igual que el lector openpyxl de pandas: vacío -> "" y 3.0 -> 3
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _read_sheet_rows(worksheet):
+    """Recorre la hoja una vez y devuelve filas rectangulares (sin filas vacías al final)."""
+    worksheet.reset_dimensions()
+    data = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(worksheet.iter_rows(values_only=True)):
+        converted_row = [_convert_cell(value) for value in row]
+        while converted_row and converted_row[-1] == "":
+            converted_row.pop()
+        if converted_row:
+            last_row_with_data = row_number
+        data.append(converted_row)
+    data = data[: last_row_with_data + 1]
+    if data:
+        max_width = max(len(row) for row in data)
+        data = [row + [""] * (max_width - len(row)) for row in data]
+    return data
+
+def _rows_to_frame(rows, header):
+    if not rows:
+        return pd.DataFrame()
+    try:
+        return TextParser([list(row) for row in rows], header=header, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+def _trimmed_width(row):
+    """Ancho de la fila sin las celdas vacías del final."""
+    width = len(row)
+    while width and row[width - 1] == "":
+        width -= 1
+    return width
+
+def _is_student_number(value):
+    """Número de orden válido en la Columna A (entero positivo)."""
+    return pd.notna(value) and isinstance(value, (int, float)) and value == int(value) and value > 0
+
+def _is_legend_entry(value):
+    """Línea de la leyenda de competencias ('01 = ...'); admite más de 10 competencias."""
+    return isinstance(value, str) and '=' in value and LEGEND_NUMBER_PATTERN.match(value.strip()) is not None
+
+def _legend_window(column, start):
+    """
+    Candidatos a leyenda (Columna B) desde `start`: 15 filas, y más allá solo
+    mientras sigan líneas de leyenda consecutivas (plantillas con muchas competencias).
+    """
+    values = column.iloc[start:]
+    stop = min(LEGEND_SCAN_ROWS, len(values))
+    while stop < len(values) and _is_legend_entry(values.iat[stop - 1]) and _is_legend_entry(values.iat[stop]):
+        stop += 1
+    return list(values.head(stop).items())
+
+def _grade_block_from_frame(df_full):
+    """Extrae el bloque de notas de una hoja ya cargada (header=None)."""
+    max_cols = df_full.shape[1]
+
+    # A. Identificar límites de estudiantes (Columna A/índice 0)
+    is_student_row = df_full.iloc[:, 0].apply(_is_student_number)
+    last_student_row_index = df_full[is_student_row].index.max()
+
+    # El último estudiante es la fila máxima con un número en Columna A
+    end_data_row_index = int(last_student_row_index) if pd.notna(last_student_row_index) else DEFAULT_END_ROW_INDEX
+
+    # Candidatos a leyenda (Columna B, índice 1) debajo de los estudiantes
+    comp_name_start_row_index = end_data_row_index + LEGEND_OFFSET
+    legend = _legend_window(df_full.iloc[:, 1], comp_name_start_row_index)
+
+    return _slice_grade_block(df_full, end_data_row_index, legend, pd.notna(last_student_row_index))
+
+def _slice_grade_block(df_full, end_data_row_index, legend, students_found):
+    data_rows = df_full.iloc[DATA_START_ROW_INDEX : end_data_row_index + 1]
+    notes = [data_rows.iloc[:, col].tolist() for col in range(START_NOTE_COLUMN_INDEX, df_full.shape[1], JUMP_SIZE)]
+    return {
+        'end_row': end_data_row_index, 'legend': legend, 'notes': notes, 'max_cols': df_full.shape[1],
+        'order_numbers': data_rows.iloc[:, 0].tolist(), 'names': data_rows.iloc[:, 1].tolist(),
+        'students_found': students_found,
+    }
+
+def _grade_block_from_layout(df_full, layout):
+    """
+    Corta el bloque de notas con un layout conocido, sin recorrer toda la Columna A: el
+    último estudiante se busca desde abajo (debajo solo hay leyenda y pie de página).
+    Devuelve None si la hoja no coincide con el layout.
+    """
+    n_rows, max_cols = df_full.shape
+    if max_cols < 2:
+        return None
+
+    column_a = df_full.iloc[:, 0]
+    end_data_row_index = next(
+        (idx for idx in range(n_rows - 1, DATA_START_ROW_INDEX - 1, -1) if _is_student_number(column_a.iat[idx])),
+        None,
+    )
+    if end_data_row_index is None:
+        return None
+
+    # La leyenda sigue a la misma distancia del último estudiante
+    legend = _legend_window(df_full.iloc[:, 1], end_data_row_index + LEGEND_OFFSET)
+    if [idx - end_data_row_index for idx, val in legend if _is_legend_entry(val)] != layout['legend_offsets']:
+        return None
+
+    return _slice_grade_block(df_full, end_data_row_index, legend, True)
+
+def _stream_grade_block(worksheet, max_col=STREAM_MAX_COLUMN):
+    """
+    Lector en streaming (openpyxl read_only): recorre solo las columnas A..W (o las
+    `max_col` indicadas) y se detiene al terminar la ventana de la leyenda de competencias.
+    """
+    worksheet.reset_dimensions()
+    rows = []
+    last_student_row_index = None
+    max_cols = 0
+    for row_number, row in enumerate(worksheet.iter_rows(max_col=max_col, values_only=True)):
+        end_row = last_student_row_index if last_student_row_index is not None else DEFAULT_END_ROW_INDEX
+        row = [_convert_cell(value) for value in row]
+        if row_number >= end_row + LEGEND_OFFSET + LEGEND_SCAN_ROWS:
+            # Fuera de la ventana solo se sigue leyendo si la leyenda continúa
+            if not (_is_legend_entry(rows[-1][1]) and _is_legend_entry(row[1])):
+                break
+        max_cols = max(max_cols, _trimmed_width(row))
+        if _is_student_number(row[0]):
+            last_student_row_index = row_number
+        rows.append(row)
+
+    end_data_row_index = last_student_row_index if last_student_row_index is not None else DEFAULT_END_ROW_INDEX
+    comp_name_start_row_index = end_data_row_index + LEGEND_OFFSET
+    legend = [(idx, rows[idx][1]) for idx in range(comp_name_start_row_index, len(rows))]
+    stop = min(LEGEND_SCAN_ROWS, len(legend))
+    while stop < len(legend) and _is_legend_entry(legend[stop - 1][1]) and _is_legend_entry(legend[stop][1]):
+        stop += 1
+    legend = legend[:stop]
+
+    # Más competencias en la leyenda que columnas leídas: se relee con el ancho necesario
+    needed_cols = START_NOTE_COLUMN_INDEX + JUMP_SIZE * sum(_is_legend_entry(val) for _, val in legend)
+    if max_cols >= max_col and needed_cols > max_col:
+        return _stream_grade_block(worksheet, max_col=needed_cols)
+
+    data_rows = rows[DATA_START_ROW_INDEX : end_data_row_index + 1]
+    notes = [
+        [row[col] for row in data_rows]
+        for col in range(START_NOTE_COLUMN_INDEX, max_cols, JUMP_SIZE)
+    ]
+    return {
+        'end_row': end_data_row_index, 'legend': legend, 'notes': notes, 'max_cols': max_cols,
+        'order_numbers': [row[0] for row in data_rows], 'names': [row[1] for row in data_rows],
+        'students_found': last_student_row_index is not None,
+    }
+
+def _analyze_grade_block(block):
+    """
+    Cuenta niveles de logro por competencia a partir de un bloque de notas.
+    Devuelve (competencias, calidad); ver data_quality_report.
+    """
+    # B. Extraer Nombres de Competencias (en Columna B, índice 1)
+    competencias_list = []
+    for idx, val in block['legend']:
+        if _is_legend_entry(val):
+            competencias_list.append((idx, val))
+
+    if not competencias_list:
+        # Detalle para que el docente pueda ubicar el problema en su archivo
+        first_row = block['end_row'] + LEGEND_OFFSET + 1
+        if block['legend']:
+            detalle = f"Se revisaron las filas {first_row}-{block['legend'][-1][0] + 1} buscando líneas '01 = ...'"
+        else:
+            detalle = f"La hoja termina antes de la fila {first_row}, donde debería empezar la leyenda"
+        if block['students_found']:
+            detalle += f"; el último estudiante está en la fila {block['end_row'] + 1}."
+        else:
+            detalle += "; no se encontraron números de orden en la Columna A."
+        raise ValueError(
+            f"No se pudieron identificar los nombres de las competencias en el rango esperado (Columna B). {detalle}"
+        )
+
+    # C. Analizar cada Competencia: Patrón D, F, H, J...
+    # Cálculo de la columna de nota (NL): 3 + (i * 2); VERIFICACIÓN CRÍTICA: dentro de la hoja
+    n_comp = 0
+    while n_comp < len(competencias_list) and START_NOTE_COLUMN_INDEX + n_comp * JUMP_SIZE < block['max_cols']:
+        n_comp += 1
+
+    # Todas las competencias se cuentan en una sola pasada vectorizada; la misma
+    # matriz de códigos alimenta el reporte de calidad de datos
+    notes = block['notes'][:n_comp]
+    codes = encode_levels(notes)
+    counts_list = _counts_to_dicts(count_levels_matrix(codes))
+
+    competencias_data = {}
+    for (row_idx, comp_name_full), counts in zip(competencias_list, counts_list):
+        # Almacenar datos
+        comp_name_clean = clean_competencia_name(comp_name_full)
+
+        competencias_data[comp_name_full] = {
+            'conteo_niveles': counts['conteo_niveles'],
+            'total_evaluados': counts['total_evaluados'],
+            'nombre_limpio': comp_name_clean
+        }
+    calidad = data_quality_report(codes, notes, block['order_numbers'], block['names'], list(competencias_data))
+    return competencias_data, calidad
+
+# =========================================================================
+# === LAYOUT DE PLANTILLA ===
+# Las exportaciones SIAGIE de una misma plantilla repiten la estructura de cada
+# hoja: columnas de nota, posición de la leyenda respecto del último estudiante
+# y ancho de columnas. El layout resuelto se guarda por huella de plantilla
+# (solo celdas estructurales: secciones con distinto número de estudiantes la
+# comparten) y los siguientes uploads cortan el bloque directamente
+# (validando que siga coincidiendo).
+# =========================================================================
+
+def template_fingerprint(sheet_name, dimension, header_rows):
+    """
+    SHA-1 de la estructura de una hoja: nombre, columnas del rango declarado (sin las
+    filas, que dependen del número de estudiantes), los encabezados de columna de la
+    fila sobre los estudiantes y los números de competencia de las columnas de nota.
+    El resto de las filas de encabezado (títulos con datos de la sección) no entra.
+    """
+    columns = re.sub(r'\d', '', dimension) if dimension else None
+    header_rows = [list(row) for row in header_rows]
+    column_headers = header_rows[-1] if header_rows else []
+    column_headers = column_headers[:_trimmed_width(column_headers)]
+    comp_numbers = [row[START_NOTE_COLUMN_INDEX::JUMP_SIZE] for row in header_rows[:-1]]
+    comp_numbers = [row[:_trimmed_width(row)] for row in comp_numbers]
+    payload = repr((sheet_name, columns, column_headers, comp_numbers))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def layout_from_block(block):
+    """Layout reutilizable de un bloque detectado, o None si no hay estudiantes o leyenda."""
+    legend_rows = [idx for idx, val in block['legend'] if _is_legend_entry(val)]
+    if not block['students_found'] or not legend_rows:
+        return None
+    return {
+        # Filas de la leyenda relativas al último estudiante (no dependen del tamaño de la sección)
+        'legend_offsets': [idx - block['end_row'] for idx in legend_rows],
+        'max_col': max(STREAM_MAX_COLUMN, START_NOTE_COLUMN_INDEX + JUMP_SIZE * len(legend_rows)),
+    }
+
+class LayoutCache(BoundedLRUCache):
+    """
+    Layouts resueltos por huella de plantilla, en memoria y compartidos por todas las
+    sesiones del proceso. Desalojo LRU por número de entradas.
+    """
+
+    def __init__(self, max_entries=LAYOUT_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries=max_entries)
+
+_layout_cache = LayoutCache()
+
+def get_layout_cache():
+    """Caché de layouts del proceso (para monitoreo o para vaciarla en pruebas)."""
+    return _layout_cache
+
+def read_workbook(source):
+    """
+    Punto único de ingesta: acepta un archivo subido (st.file_uploader), bytes,
+    una ruta, un pd.ExcelFile o un WorkbookModel ya construido.
+    """
+    if isinstance(source, WorkbookModel):
+        return source
+    if isinstance(source, pd.ExcelFile):
+        # Reutiliza el libro openpyxl que pandas ya abrió
+        return WorkbookModel(None, book=source.book)
+    if isinstance(source, (bytes, bytearray)):
+        return WorkbookModel(bytes(source))
+    if hasattr(source, 'read'):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return WorkbookModel(source.read())
+    with open(source, 'rb') as f:
+        return WorkbookModel(f.read())
 
 def get_level_counts(series):
     """
@@ -21,6 +436,97 @@ def get_level_counts(series):
     
     return {'conteo_niveles': counts, 'total_evaluados': total_evaluados}
 
+# Códigos int8 de la matriz de notas: AD=0, A=1, B=2, C=3, inválido=-1, vacío=-2
+CODIGO_INVALIDO = -1
+CODIGO_VACIO = -2
+
+def encode_levels(notes):
+    """
+    Codifica el bloque de notas (una lista de valores por competencia) en una matriz
+    int8 estudiantes × competencias. Cada valor distinto se normaliza una sola vez
+    (strip + upper), igual que la ruta de get_level_counts.
+    """
+    n_comp = len(notes)
+    n_students = len(notes[0]) if n_comp else 0
+    values = np.empty((n_students, n_comp), dtype=object)
+    for j, columna in enumerate(notes):
+        values[:, j] = columna
+
+    labels, uniques = pd.factorize(values.ravel())
+    normalizados = pd.Series(uniques, dtype=object).astype(str).str.strip().str.upper()
+    lookup = pd.Index(NIVELES_LOGRO).get_indexer(normalizados).astype(np.int8)
+    lookup[(normalizados == '').to_numpy()] = CODIGO_VACIO
+    # El índice -1 de factorize (NaN/None) cae en el último elemento: vacío
+    lookup = np.append(lookup, np.int8(CODIGO_VACIO))
+    return lookup[labels].reshape(n_students, n_comp)
+
+def count_levels_matrix(codes):
+    """
+    Conteo de niveles para todas las competencias en una sola pasada de np.bincount.
+    Devuelve un array (competencias × 4) en el orden de NIVELES_LOGRO.
+    """
+    n_comp = codes.shape[1]
+    valid = codes >= 0
+    flat = (np.arange(n_comp) * len(NIVELES_LOGRO) + codes)[valid]
+    return np.bincount(flat, minlength=n_comp * len(NIVELES_LOGRO)).reshape(n_comp, len(NIVELES_LOGRO))
+
+def count_levels_block(notes):
+    """
+    Versión vectorizada de get_level_counts para todo el bloque de notas:
+    devuelve una lista con el mismo dict que get_level_counts por cada competencia.
+    """
+    return _counts_to_dicts(count_levels_matrix(encode_levels(notes)))
+
+def _counts_to_dicts(counts):
+    return [
+        {'conteo_niveles': dict(zip(NIVELES_LOGRO, fila)), 'total_evaluados': sum(fila)}
+        for fila in counts.tolist()
+    ]
+
+def data_quality_report(codes, notes, order_numbers, names, comp_names):
+    """
+    Reporte de calidad de datos de una hoja a partir de la matriz de códigos del conteo
+    (sin volver a leer el libro). Solo considera las filas con número de orden en la
+    Columna A. Las notas que se normalizan a un nivel ('ad', ' B') cuentan como válidas.
+
+    Devuelve un dict con:
+      * 'por_competencia': {competencia: {'vacias', 'invalidas', 'validas'}}
+      * 'por_estudiante': columnas 'fila', 'estudiante', 'vacias', 'invalidas', 'validas'
+      * 'celdas_invalidas': columnas 'fila', 'columna', 'competencia', 'valor'
+    Las filas y columnas son las de Excel (fila 1, columna 'A').
+    """
+    student_rows = np.flatnonzero([_is_student_number(value) for value in order_numbers]).astype(np.int64)
+    codes = codes[student_rows]
+    vacias = codes == CODIGO_VACIO
+    invalidas = codes == CODIGO_INVALIDO
+    validas = codes >= 0
+    excel_rows = student_rows + DATA_START_ROW_INDEX + 1
+
+    por_competencia = {
+        name: {'vacias': v, 'invalidas': i, 'validas': ok}
+        for name, v, i, ok in zip(comp_names, vacias.sum(axis=0).tolist(), invalidas.sum(axis=0).tolist(), validas.sum(axis=0).tolist())
+    }
+    por_estudiante = {
+        'fila': excel_rows.tolist(),
+        'estudiante': ['' if pd.isna(names[r]) else str(names[r]) for r in student_rows.tolist()],
+        'vacias': vacias.sum(axis=1).tolist(),
+        'invalidas': invalidas.sum(axis=1).tolist(),
+        'validas': validas.sum(axis=1).tolist(),
+    }
+    rows_inv, cols_inv = np.nonzero(invalidas)
+    celdas_invalidas = {
+        'fila': excel_rows[rows_inv].tolist(),
+        'columna': [get_column_letter(START_NOTE_COLUMN_INDEX + JUMP_SIZE * c + 1) for c in cols_inv.tolist()],
+        'competencia': [comp_names[c] for c in cols_inv.tolist()],
+        'valor': [str(notes[c][student_rows[r]]) for r, c in zip(rows_inv.tolist(), cols_inv.tolist())],
+    }
+    return {'por_competencia': por_competencia, 'por_estudiante': por_estudiante, 'celdas_invalidas': celdas_invalidas}
+
+def normalize_text(text):
+    """Normalización ultra-robusta: quita acentos (NFD), mayúsculas y espacios extremos."""
+    return ''.join(c for c in unicodedata.normalize('NFD', str(text))
+                   if unicodedata.category(c) != 'Mn').lower().strip()
+
 def clean_competencia_name(name: str) -> str:
     """Limpia el prefijo 'XX = ' del nombre de la competencia."""
     if pd.isna(name):
@@ -31,19 +537,157 @@ def clean_competencia_name(name: str) -> str:
         return name_str.split('=', 1)[1].strip()
     return name_str.strip()
 
+def build_frequency_table(competencias):
+    """
+    Matriz de Frecuencias de un área (la tabla del dashboard y de la exportación):
+    conteo y porcentaje por nivel para cada competencia, indexada por nombre limpio.
+    """
+    data = {'Competencia': [], 'AD (Est.)': [], '% AD': [], 'A (Est.)': [], '% A': [], 'B (Est.)': [], '% B': [], 'C (Est.)': [], '% C': [], 'Total': []}
+   
+    for col_original_name, comp_data in competencias.items():
+        counts = comp_data['conteo_niveles']
+        total = comp_data['total_evaluados']
+        data['Competencia'].append(comp_data['nombre_limpio'])
+        for level in NIVELES_LOGRO:
+            count = counts.get(level, 0)
+            porcentaje = (count / total * 100) if total > 0 else 0
+            data[f'{level} (Est.)'].append(count)
+            data[f'% {level}'].append(f"{porcentaje:.1f}%")
+        data['Total'].append(total)
+   
+    return pd.DataFrame(data).set_index('Competencia')
+
+RESULT_COLUMNS = ['nivel', 'grado', 'seccion', 'area', 'competencia', 'nombre_limpio'] + NIVELES_LOGRO + ['total_evaluados', 'error']
+
+def results_to_frame(analisis_results):
+    """
+    Aplana analisis_results a una tabla larga (una fila por hoja y competencia),
+    incluyendo las hojas con error o ignoradas con su mensaje.
+    """
+    rows = []
+    for sheet_name, result in analisis_results.items():
+        general = result.get('generalidades', {})
+        base = {
+            'nivel': general.get('nivel'),
+            'grado': general.get('grado'),
+            'seccion': general.get('seccion'),
+            'area': sheet_name,
+        }
+        if not result.get('competencias'):
+            rows.append(dict(base, error=result.get('error') or result.get('message')))
+            continue
+        for comp_name_full, comp_data in result['competencias'].items():
+            row = dict(base, competencia=comp_name_full, nombre_limpio=comp_data['nombre_limpio'])
+            row.update(comp_data['conteo_niveles'])
+            row['total_evaluados'] = comp_data['total_evaluados']
+            rows.append(row)
+    df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    # Enteros con nulos para las filas de error (evita 3.0 en CSV)
+    count_columns = NIVELES_LOGRO + ['total_evaluados']
+    df[count_columns] = df[count_columns].astype('Int64')
+    return df
+
+class AnalysisResult(Mapping):
+    """
+    Modelo columnar y compacto de analisis_results.
+
+    Los conteos viven en un solo array counts (hojas × competencias × 4, en el orden
+    de NIVELES_LOGRO) con índices por nombre de hoja y de competencia, así que la
+    búsqueda por hoja/competencia es O(1) y las tablas se arman sin bucles Python.
+    Se comporta como el dict original (Mapping hoja -> dict) para los consumidores
+    que todavía lo recorren: results[hoja]['competencias'][comp]['conteo_niveles'].
+    """
+    __slots__ = ('sheet_names', 'sheet_index', 'comp_names', 'comp_index', 'clean_names',
+                 'counts', 'present', 'sheet_comps', 'general', 'extras')
+
+    def __init__(self, sheet_names, comp_names, clean_names, counts, present, sheet_comps, general, extras):
+        self.sheet_names = list(sheet_names)
+        self.sheet_index = {name: i for i, name in enumerate(self.sheet_names)}
+        self.comp_names = list(comp_names)
+        self.comp_index = {name: j for j, name in enumerate(self.comp_names)}
+        self.clean_names = np.asarray(clean_names, dtype=object)
+        self.counts = counts
+        self.present = present
+        self.sheet_comps = sheet_comps
+        self.general = general
+        self.extras = extras
+
+    @classmethod
+    def from_dict(cls, analisis_results):
+        """Construye el modelo a partir del dict que devuelve analyze_data."""
+        if isinstance(analisis_results, cls):
+            return analisis_results
+        sheet_names = list(analisis_results)
+        comp_index = {}
+        clean_names = []
+        sheet_comps = []
+        for result in analisis_results.values():
+            indices = []
+            for comp_name_full, comp_data in result.get('competencias', {}).items():
+                if comp_name_full not in comp_index:
+                    comp_index[comp_name_full] = len(comp_index)
+                    clean_names.append(comp_data['nombre_limpio'])
+                indices.append(comp_index[comp_name_full])
+            sheet_comps.append(np.array(indices, dtype=np.intp))
+
+        counts = np.zeros((len(sheet_names), len(comp_index), len(NIVELES_LOGRO)), dtype=np.int64)
+        present = np.zeros((len(sheet_names), len(comp_index)), dtype=bool)
+        general = []
+        extras = []
+        for i, result in enumerate(analisis_results.values()):
+            competencias = result.get('competencias', {})
+            if competencias:
+                counts[i, sheet_comps[i]] = [
+                    [comp_data['conteo_niveles'].get(n, 0) for n in NIVELES_LOGRO]
+                    for comp_data in competencias.values()
+                ]
+                present[i, sheet_comps[i]] = True
+            general.append(result.get('generalidades', {}))
+            extras.append({k: v for k, v in result.items() if k not in ('generalidades', 'competencias')})
+        return cls(sheet_names, list(comp_index), clean_names, counts, present, sheet_comps, general, extras)
+
+    # --- Vista compatible con el dict original ---
+    def __getitem__(self, sheet_name):
+        i = self.sheet_index[sheet_name]
+        competencias = {}
+        for j, fila in zip(self.sheet_comps[i].tolist(), self.counts[i, self.sheet_comps[i]].tolist()):
+            competencias[self.comp_names[j]] = {
+                'conteo_niveles': dict(zip(NIVELES_LOGRO, fila)),
+                'total_evaluados': sum(fila),
+                'nombre_limpio': self.clean_names[j]
+            }
+        return dict(self.extras[i], generalidades=self.general[i], competencias=competencias)
+
+    def __iter__(self):
+        return iter(self.sheet_names)
+
+    def __len__(self):
+        return len(self.sheet_names)
+
+    # --- Acceso columnar ---
+    def frequency_table(self, sheet_name):
+        """Misma tabla que build_frequency_table, calculada sobre el array de conteos."""
+        i = self.sheet_index[sheet_name]
+        idx = self.sheet_comps[i]
+        counts = self.counts[i, idx]
+        total = counts.sum(axis=1)
+        pct = np.divide(counts * 100, total[:, None], out=np.zeros(counts.shape), where=total[:, None] > 0)
+        data = {}
+        for k, level in enumerate(NIVELES_LOGRO):
+            data[f'{level} (Est.)'] = counts[:, k]
+            data[f'% {level}'] = np.char.mod('%.1f%%', pct[:, k]).astype(object)
+        data['Total'] = total
+        return pd.DataFrame(data, index=pd.Index(self.clean_names[idx], name='Competencia'))
+
 def extract_general_data(excel_file):
     """
     Extrae el Nivel (H5), Grado (H10) y Sección (J10) de la hoja 'Generalidades'.
     Lee hasta columna J para llegar a la sección sin error.
     """
     try:
-        df_generalidades = pd.read_excel(
-            excel_file,
-            sheet_name=GENERAL_SHEET_NAME,
-            header=None,
-            nrows=10,  # Más filas por seguridad
-            usecols=range(10)  # Columnas A a J (índices 0-9)
-        )
+        workbook = read_workbook(excel_file)
+        # Columnas A a J (índices 0-9), primeras 10 filas
+        df_generalidades = workbook.raw(GENERAL_SHEET_NAME).iloc[:10, :10]
        
         # Nivel en H5 (fila 4, columna 7)
         nivel = df_generalidades.iloc[4, 7]
@@ -70,107 +714,150 @@ def extract_general_data(excel_file):
             'error_details': str(e)
         }
 
-def analyze_data(excel_file, sheet_names):
+_NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def sheet_fingerprints(excel_file):
+    """
+    Huella SHA-256 de cada hoja a partir de su parte XML cruda dentro del zip .xlsx
+    (sin parsear celdas). Incluye el nombre de la hoja y el contenido de la tabla de
+    textos compartidos (donde viven 'AD', 'A', ...), sin sus contadores globales.
+    """
+    if isinstance(excel_file, (bytes, bytearray)):
+        data = bytes(excel_file)
+    else:
+        data = read_workbook(excel_file).data
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = set(zf.namelist())
+        shared = zf.read('xl/sharedStrings.xml') if 'xl/sharedStrings.xml' in names else b''
+        shared_digest = hashlib.sha256(re.sub(rb'<sst[^>]*>', b'', shared, count=1)).digest()
+
+        rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{_NS_PKG_REL}Relationship')}
+
+        fingerprints = {}
+        workbook_xml = ET.fromstring(zf.read('xl/workbook.xml'))
+        for sheet in workbook_xml.iter(f'{_NS_MAIN}sheet'):
+            target = targets.get(sheet.get(f'{_NS_REL}id'), '')
+            part = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            if part not in names:
+                continue
+            digest = hashlib.sha256(sheet.get('name').encode('utf-8'))
+            digest.update(shared_digest)
+            digest.update(zf.read(part))
+            fingerprints[sheet.get('name')] = digest.hexdigest()
+    return fingerprints
+
+def _analyze_sheet(workbook, sheet_name, general_data):
+    """Analiza una hoja de área; los errores quedan registrados en el propio resultado."""
+    if normalize_text(sheet_name) == "comentarios":
+        return {
+            'ignored': True,  # ← Nueva clave: 'ignored' en lugar de 'error'
+            'message': f"La hoja '{sheet_name}' fue ignorada automáticamente porque no contiene competencias (es una hoja de comentarios).",
+            'generalidades': general_data,
+            'competencias': {}
+        }
+
+    try:
+        # Solo se lee el bloque de notas (streaming si la hoja no fue cargada antes)
+        block = workbook.grade_block(sheet_name)
+        competencias_data, calidad = _analyze_grade_block(block)
+        
+        # Guardar el resultado para esta hoja
+        return {
+            'generalidades': general_data,
+            'competencias': competencias_data,
+            'calidad': calidad
+        }
+
+    except Exception as e:
+        return {
+            'error': f"Error al procesar la hoja '{sheet_name}': {e}",
+            'generalidades': general_data,
+            'competencias': {}
+        }
+
+def process_pool(max_workers):
+    """
+    Pool de procesos que arranca los hijos con 'forkserver' (o 'spawn' donde no existe).
+    Un fork dentro del servidor de Streamlit, que tiene hilos, puede copiar un lock
+    tomado por otro hilo y dejar al proceso hijo bloqueado para siempre.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    contexto = multiprocessing.get_context('forkserver')
+    # El servidor importa pandas/NumPy una sola vez; cada hijo nace ya con ellos cargados
+    contexto.set_forkserver_preload(['analysis_core'])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto)
+
+def _analyze_sheets_worker(data, sheet_names, general_data):
+    """Tarea de un proceso del pool: abre el libro desde los bytes y analiza su grupo de hojas."""
+    workbook = WorkbookModel(data)
+    return [_analyze_sheet(workbook, sheet_name, general_data) for sheet_name in sheet_names]
+
+def analyze_data(excel_file, sheet_names, workers=None):
     """
     Procesa las hojas seleccionadas basándose en la estructura compleja del Excel.
+
+    workers: número de procesos para el modo paralelo (opcional). Cada hoja es
+    independiente, así que se reparten en grupos entre los procesos y los
+    resultados se devuelven en el orden original. Con pocas hojas, sin bytes del
+    archivo o con las hojas ya cargadas en memoria se procesa secuencialmente.
     """
     analisis_results = {}
     
-    general_data = extract_general_data(excel_file)
-    
-    # El for debe estar al mismo nivel que general_data (sin espacios extras al inicio)
+    workbook = read_workbook(excel_file)
+    general_data = extract_general_data(workbook)
+    sheet_names = list(sheet_names)
+
+    pending = [name for name in sheet_names if name not in workbook._rows]
+    use_pool = (
+        workers is not None and workers > 1
+        and workbook.data is not None
+        and len(pending) >= PARALLEL_MIN_SHEETS
+    )
+
+    if use_pool:
+        n_workers = min(workers, len(pending))
+        groups = [pending[i::n_workers] for i in range(n_workers)]
+        with process_pool(n_workers) as executor:
+            futures = [executor.submit(_analyze_sheets_worker, workbook.data, group, general_data) for group in groups]
+            for group, future in zip(groups, futures):
+                analisis_results.update(zip(group, future.result()))
+
+    # Hojas restantes (o todas, en modo secuencial); el dict final respeta el orden de sheet_names
     for sheet_name in sheet_names:
-        # Normalización ultra-robusta: quita acentos, mayúsculas y espacios
-        import unicodedata
-        sheet_normalized = ''.join(c for c in unicodedata.normalize('NFD', sheet_name) 
-                                   if unicodedata.category(c) != 'Mn').lower().strip()
-        
-        if sheet_normalized == "comentarios":
-            analisis_results[sheet_name] = {
-                'ignored': True,  # ← Nueva clave: 'ignored' en lugar de 'error'
-                'message': f"La hoja '{sheet_name}' fue ignorada automáticamente porque no contiene competencias (es una hoja de comentarios).",
-                'generalidades': general_data,
-                'competencias': {}
-            }
-            continue  # Salta al siguiente sheet sin procesar
-        
+        if sheet_name not in analisis_results:
+            analisis_results[sheet_name] = _analyze_sheet(workbook, sheet_name, general_data)
 
-        try:
-            df_full = pd.read_excel(excel_file, sheet_name=sheet_name, header=None) 
-            max_cols = df_full.shape[1] 
-
-            # A. Identificar límites de estudiantes (Columna A/índice 0)
-            is_student_row = df_full.iloc[:, 0].apply(lambda x: pd.notna(x) and isinstance(x, (int, float)) and x == int(x) and x > 0)
-            last_student_row_index = df_full[is_student_row].index.max()
-
-            # El primer estudiante está en la Fila 3 (índice 2)
-            data_start_row_index = 2 
-            
-            # El último estudiante es la fila máxima con un número en Columna A
-            end_data_row_index = int(last_student_row_index) if pd.notna(last_student_row_index) else 32
-            
-            # La primera fila con el nombre de la competencia (ej: '01 = ...')
-            comp_name_start_row_index = end_data_row_index + 4
-            
-            # B. Extraer Nombres de Competencias (en Columna B, índice 1)
-            competencias_raw = df_full.iloc[comp_name_start_row_index:, 1]
-            competencias_list = []
-            
-            for idx, val in competencias_raw.head(15).items():
-                if pd.notna(val) and isinstance(val, str) and '=' in val and val.strip().lower().startswith(('01', '02', '03', '04', '05', '06', '07', '08', '09', '10')):
-                    competencias_list.append((idx, val))
-            
-            if not competencias_list:
-                 raise ValueError("No se pudieron identificar los nombres de las competencias en el rango esperado (Columna B).")
-
-            
-            # C. Analizar cada Competencia: Patrón D, F, H, J...
-            competencias_data = {}
-            
-            # *** CORRECCIÓN CRÍTICA: La primera nota (NL) está en Columna D (índice 3) ***
-            START_NOTE_COLUMN_INDEX = 3 
-            
-            # *** CORRECCIÓN CRÍTICA: El salto es de +2 (para D -> F -> H...) ***
-            JUMP_SIZE = 2
-            
-            for i, (row_idx, comp_name_full) in enumerate(competencias_list):
-                
-                # Cálculo de la columna de nota (NL): 3 + (i * 2)
-                note_col_index = START_NOTE_COLUMN_INDEX + (i * JUMP_SIZE) 
-                
-                # VERIFICACIÓN CRÍTICA
-                if note_col_index >= max_cols:
-                    break
-                
-                # Extraemos la serie de notas:
-                notas_series = df_full.iloc[data_start_row_index : end_data_row_index + 1, note_col_index]
-
-                # Analizar la serie de notas (la función get_level_counts es estricta)
-                counts = get_level_counts(
-                    notas_series.astype(str).str.strip().str.upper()
-                )
-                
-                # Almacenar datos
-                comp_name_clean = clean_competencia_name(comp_name_full)
-                
-                competencias_data[comp_name_full] = {
-                    'conteo_niveles': counts['conteo_niveles'],
-                    'total_evaluados': counts['total_evaluados'],
-                    'nombre_limpio': comp_name_clean
-                }
-            
-            # Guardar el resultado para esta hoja
-            analisis_results[sheet_name] = {
-                'generalidades': general_data,
-                'competencias': competencias_data
-            }
+    return {sheet_name: analisis_results[sheet_name] for sheet_name in sheet_names}
 
-        except Exception as e:
-            analisis_results[sheet_name] = {
-                'error': f"Error al procesar la hoja '{sheet_name}': {e}",
-                'generalidades': general_data,
-                'competencias': {}
-            }
-            
+def analyze_data_incremental(excel_file, sheet_names, previous_results=None, workers=None):
+    """
+    Re-análisis incremental para re-uploads: las hojas cuya huella (sheet_fingerprints)
+    ya aparece en previous_results (dict huella -> resultado de hoja) se reutilizan;
+    solo se vuelven a analizar las hojas que cambiaron.
+
+    Devuelve (analisis_results, huellas, hojas_recalculadas).
+    """
+    previous_results = previous_results or {}
+    workbook = read_workbook(excel_file)
+    fingerprints = sheet_fingerprints(workbook)
+    general_data = extract_general_data(workbook)
+
+    reused = {}
+    for sheet_name in sheet_names:
+        previous = previous_results.get(fingerprints.get(sheet_name))
+        if previous is not None:
+            # Generalidades puede haber cambiado aunque la hoja no
+            reused[sheet_name] = dict(previous, generalidades=general_data)
+
+    recomputed = [sheet_name for sheet_name in sheet_names if sheet_name not in reused]
+    computed = analyze_data(workbook, recomputed, workers=workers) if recomputed else {}
 
-    return analisis_results
+    analisis_results = {
+        sheet_name: reused[sheet_name] if sheet_name in reused else computed[sheet_name]
+        for sheet_name in sheet_names
+    }
+    return analisis_results, fingerprints, recomputed
@@ -906,6 +906,8 @@ def mostrar_sidebar():
                 st.session_state.df_cargado = False
                 st.session_state.info_areas = None
                 st.session_state.all_dataframes = None
+                st.session_state.indice_estudiantes = None
+                st.session_state.upload_hash = None
                 st.session_state.df = None
                 # Truco para limpiar el widget de carga
                 if 'file_uploader' in st.session_state:
@@ -0,0 +1,55 @@
+import os
+import stat
+import sys
+
+# =========================================================================
+# === DIRECTORIO DE DATOS DE LA APLICACIÓN ===
+# La caché de análisis y el historial guardan nombres y notas de
+# estudiantes: viven en un directorio propio del usuario que corre la app
+# (no en el temporal compartido, que es predecible y escribible por todos),
+# creado con permisos 0700 y que sobrevive a los reinicios.
+# =========================================================================
+
+APP_NAME = 'aulametrics'
+
+
+def app_data_dir(*partes):
+    """
+    Ruta dentro del directorio de datos de la aplicación: AULAMETRICS_DATA_DIR si está
+    definida; si no, %LOCALAPPDATA%\\aulametrics en Windows y $XDG_DATA_HOME/aulametrics
+    (por defecto ~/.local/share/aulametrics) en el resto. No crea nada (ver private_dir).
+    """
+    base = os.environ.get('AULAMETRICS_DATA_DIR')
+    if not base:
+        if sys.platform == 'win32':
+            raiz = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~')
+        else:
+            raiz = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+        base = os.path.join(raiz, APP_NAME)
+    return os.path.join(base, *partes)
+
+
+def private_dir(path):
+    """
+    Crea el directorio (permisos 0700) si no existe y verifica que sea un directorio real
+    del usuario actual; si otros tienen acceso, se le quitan. PermissionError si es un
+    enlace o pertenece a otro usuario: ahí alguien más podría dejar archivos para que
+    la app los cargue. Devuelve la ruta.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.name != 'posix':
+        return path
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"El directorio de datos '{path}' no pertenece al usuario actual.")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def is_private_file(fd):
+    """True si el archivo abierto (descriptor) es del usuario actual y nadie más puede escribirlo."""
+    if os.name != 'posix':
+        return True
+    info = os.fstat(fd)
+    return stat.S_ISREG(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o022
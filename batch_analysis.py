@@ -0,0 +1,256 @@
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+import analysis_core
+import rollup
+
+try:
+    import resource
+except ImportError:  # Windows: sin medición de RSS
+    resource = None
+
+# =========================================================================
+# === ANÁLISIS POR LOTES (TODA LA INSTITUCIÓN) ===
+# Procesa las exportaciones SIAGIE de todas las secciones (una carpeta o un
+# ZIP con cientos de .xlsx) y acumula los conteos en un agregado de escuela
+# por nivel / grado / sección / área / competencia.
+# =========================================================================
+
+AGGREGATE_KEYS = ['nivel', 'grado', 'seccion', 'area', 'competencia']
+
+
+def iter_workbook_sources(source):
+    """
+    Lista los libros de una carpeta (recursiva) o de un .zip como pares
+    (nombre, referencia). Los bytes se leen recién con load_workbook_bytes, así
+    que solo están en memoria los archivos que se están procesando.
+    El nombre es la entrada más la ruta relativa del libro ('secciones/1A/registro.xlsx',
+    'lote.zip/2024/registro.xlsx'): es la identidad del archivo en los resultados y los
+    agregados, y no se repite aunque dos carpetas tengan libros con el mismo nombre.
+    """
+    source = os.path.normpath(source)
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith('.xlsx') and not name.startswith('~$'):
+                    paths.append(os.path.join(root, name))
+        for path in sorted(paths):
+            yield path, ('archivo', path)
+    elif not source.lower().endswith('.xlsx') and zipfile.is_zipfile(source):
+        # Un .xlsx también es un zip: solo se abren como lote los demás .zip
+        with zipfile.ZipFile(source) as zf:
+            # Un nombre repetido dentro del zip es el mismo miembro para zf.read
+            members = sorted({
+                info.filename for info in zf.infolist()
+                if not info.is_dir() and info.filename.lower().endswith('.xlsx')
+                and not os.path.basename(info.filename).startswith('~$')
+            })
+        for member in members:
+            yield f"{source}/{member}", ('zip', source, member)
+    else:
+        yield source, ('archivo', source)
+
+
+def load_workbook_bytes(ref):
+    """Lee los bytes de un libro a partir de la referencia de iter_workbook_sources."""
+    if ref[0] == 'zip':
+        with zipfile.ZipFile(ref[1]) as zf:
+            return zf.read(ref[2])
+    with open(ref[1], 'rb') as f:
+        return f.read()
+
+
+def summarize_workbook(name, data):
+    """
+    Analiza un libro y devuelve un resumen compacto (sin DataFrames) para el agregado.
+    Las hojas se procesan de a una en streaming y de cada resultado solo quedan los
+    conteos. Cualquier fallo queda aislado en la clave 'error' del propio archivo.
+    """
+    workbook = None
+    try:
+        workbook = analysis_core.read_workbook(data)
+        hojas = [s for s in workbook.sheet_names if s not in analysis_core.HOJAS_NO_AREA]
+        summary = {
+            'archivo': name,
+            'generalidades': analysis_core.extract_general_data(workbook),
+            'areas': {},
+            'errores': {},
+        }
+        for sheet_name in hojas:
+            result = analysis_core.analyze_data(workbook, [sheet_name])[sheet_name]
+            if 'error' in result:
+                summary['errores'][sheet_name] = result['error']
+            else:
+                summary['areas'].update(rollup.section_counts({sheet_name: result}))
+        return summary
+    except Exception as e:
+        return {'archivo': name, 'error': f"Error al procesar el archivo '{name}': {e}"}
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def peak_rss_mb():
+    """
+    Pico de memoria residente (MB) de este proceso en toda su vida; None si no se puede
+    medir. Los workers del pool son hijos del forkserver, no de este proceso, así que
+    RUSAGE_CHILDREN no los ve: cada worker informa su propio pico en el resumen.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+class SchoolAggregate:
+    """
+    Conteos AD/A/B/C acumulados por (nivel, grado, sección, área, competencia), más
+    el consolidado por grado, nivel e institución (rollup.Rollup, un aporte por archivo).
+    La identidad de un archivo es su nombre de iter_workbook_sources: los conteos y el
+    consolidado reciben un solo aporte por nombre (un archivo repetido se omite).
+    """
+
+    def __init__(self, keep_sections=True):
+        self.counts = {}
+        self.archivos = []
+        self._nombres = set()
+        self.rollup = rollup.Rollup(keep_sections=keep_sections)
+        self.stats = {}
+
+    def __contains__(self, archivo):
+        return archivo in self._nombres
+
+    def add(self, summary):
+        """
+        Incorpora el resumen de un archivo; los archivos con error solo se registran.
+        Devuelve False (y no suma nada) si ese archivo ya se había incorporado.
+        """
+        estado = {'archivo': summary['archivo']}
+        if summary['archivo'] in self._nombres:
+            return False
+        self._nombres.add(summary['archivo'])
+        if 'error' in summary:
+            estado['error'] = summary['error']
+            self.archivos.append(estado)
+            return True
+        general = summary['generalidades']
+        base = (general.get('nivel'), general.get('grado'), general.get('seccion'))
+        for area, competencias in summary['areas'].items():
+            for competencia, counts in competencias.items():
+                key = base + (area, competencia)
+                if key not in self.counts:
+                    self.counts[key] = np.zeros(len(analysis_core.NIVELES_LOGRO), dtype=np.int64)
+                self.counts[key] += counts
+        self.rollup.add_section(general, summary['areas'], section_id=summary['archivo'])
+        if summary['errores']:
+            estado['errores_hojas'] = summary['errores']
+        self.archivos.append(estado)
+        return True
+
+    def to_frame(self):
+        """Tabla larga: una fila por clave del agregado con AD, A, B, C y total."""
+        keys = list(self.counts)
+        matrix = np.array([self.counts[k] for k in keys], dtype=np.int64).reshape(len(keys), len(analysis_core.NIVELES_LOGRO))
+        df = pd.DataFrame(keys, columns=AGGREGATE_KEYS)
+        df[analysis_core.NIVELES_LOGRO] = matrix
+        df['total'] = matrix.sum(axis=1)
+        return df
+
+    def errores(self):
+        return [a for a in self.archivos if 'error' in a or 'errores_hojas' in a]
+
+
+def _summarize_worker(name, ref):
+    try:
+        data = load_workbook_bytes(ref)
+    except Exception as e:
+        summary = {'archivo': name, 'error': f"Error al leer el archivo '{name}': {e}"}
+    else:
+        summary = summarize_workbook(name, data)
+    # Pico del proceso que hizo el trabajo (el worker, o el principal en modo secuencial)
+    summary['pico_rss_mb'] = peak_rss_mb()
+    return summary
+
+
+def analyze_batch(source, workers=None, max_in_flight=None, progress=None, aggregate=None):
+    """
+    Analiza todos los libros de `source` (carpeta o .zip) y devuelve un SchoolAggregate.
+    La memoria queda acotada por los archivos en proceso, no por el total: de cada libro
+    solo se conservan los conteos. aggregate.stats guarda archivos, segundos y el pico
+    de RSS por proceso: 'pico_rss_mb' es el mayor entre el proceso principal
+    ('pico_rss_mb_principal') y los workers ('pico_rss_mb_workers').
+
+    workers: procesos en paralelo (None o 1 = secuencial en este proceso).
+    max_in_flight: archivos en proceso a la vez (por defecto 2 por worker); acota la memoria.
+    progress: callback opcional progress(procesados, total, nombre_archivo).
+    aggregate: SchoolAggregate existente donde seguir acumulando (varias fuentes; usar
+        SchoolAggregate(keep_sections=False) para lotes de escala UGEL).
+    """
+    inicio = time.perf_counter()
+    aggregate = SchoolAggregate() if aggregate is None else aggregate
+    # Un archivo ya incorporado desde otra fuente (la misma ruta dada dos veces) no se vuelve a leer
+    sources = [(name, ref) for name, ref in iter_workbook_sources(source) if name not in aggregate]
+    total = len(sources)
+
+    if not workers or workers <= 1:
+        for done, (name, ref) in enumerate(sources, start=1):
+            aggregate.add(_summarize_worker(name, ref))
+            if progress:
+                progress(done, total, name)
+        _record_stats(aggregate, total, inicio, pico_workers=None)
+        return aggregate
+
+    max_in_flight = max_in_flight or 2 * workers
+    pending = iter(sources)
+    done = 0
+    picos = []
+    with analysis_core.process_pool(workers) as executor:
+        in_flight = {}
+
+        def submit_next():
+            item = next(pending, None)
+            if item is not None:
+                name, ref = item
+                in_flight[executor.submit(_summarize_worker, name, ref)] = name
+
+        for _ in range(max_in_flight):
+            submit_next()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = in_flight.pop(future)
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    summary = {'archivo': name, 'error': f"Error al procesar el archivo '{name}': {e}"}
+                if summary.get('pico_rss_mb') is not None:
+                    picos.append(summary['pico_rss_mb'])
+                aggregate.add(summary)
+                done += 1
+                if progress:
+                    progress(done, total, name)
+                submit_next()
+    _record_stats(aggregate, total, inicio, pico_workers=max(picos, default=None))
+    return aggregate
+
+
+def _record_stats(aggregate, total, inicio, pico_workers):
+    """Acumula archivos y segundos; los picos de RSS son máximos (también entre llamadas)."""
+    previos = aggregate.stats
+    principal = peak_rss_mb()
+    pico_workers = max((p for p in (previos.get('pico_rss_mb_workers'), pico_workers) if p is not None), default=None)
+    aggregate.stats = {
+        'archivos': previos.get('archivos', 0) + total,
+        'segundos': round(previos.get('segundos', 0) + time.perf_counter() - inicio, 2),
+        'pico_rss_mb': max((p for p in (principal, pico_workers) if p is not None), default=None),
+        'pico_rss_mb_principal': principal,
+        'pico_rss_mb_workers': pico_workers,
+    }
@@ -0,0 +1,58 @@
+"""
+Benchmark del conteo de niveles de logro.
+
+Compara la ruta anterior (por cada competencia: astype(str).str.strip().str.upper()
++ get_level_counts) con el motor vectorizado (encode_levels + count_levels_matrix)
+sobre bloques de notas sintéticos de 40 a 2000 estudiantes.
+
+Uso:
+    python benchmarks/bench_conteo.py [--competencias 6] [--repeticiones 20]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analysis_core  # noqa: E402
+
+TAMANOS = [40, 200, 500, 1000, 2000]
+# Valores típicos de una exportación SIAGIE: niveles válidos con ruido y vacíos
+VALORES = ['AD', 'A', 'B', 'C', 'a ', ' b', 'Ad', 'A+', '', None, np.nan, 14]
+
+
+def generar_bloque(n_estudiantes, n_competencias, seed=0):
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(VALORES), size=(n_competencias, n_estudiantes))
+    return [[VALORES[i] for i in fila] for fila in idx]
+
+
+def conteo_por_columna(notes):
+    """Ruta anterior: una Series y un get_level_counts por competencia."""
+    return [
+        analysis_core.get_level_counts(pd.Series(col, dtype=object).astype(str).str.strip().str.upper())
+        for col in notes
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--competencias', type=int, default=6)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'Estudiantes':>12} {'Por columna (ms)':>18} {'Vectorizado (ms)':>18} {'Aceleración':>12}")
+    for n in TAMANOS:
+        notes = generar_bloque(n, args.competencias, seed=n)
+        assert conteo_por_columna(notes) == analysis_core.count_levels_block(notes)
+
+        t_col = min(timeit.repeat(lambda: conteo_por_columna(notes), number=1, repeat=args.repeticiones))
+        t_vec = min(timeit.repeat(lambda: analysis_core.count_levels_block(notes), number=1, repeat=args.repeticiones))
+        print(f"{n:>12} {t_col * 1000:>18.3f} {t_vec * 1000:>18.3f} {t_col / t_vec:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Suite de benchmarks de ingesta y análisis sobre libros SIAGIE sintéticos.
+
+Para cada tamaño mide, con libros de siagie_sintetico.py:
+  * lectura:  read_workbook + parse de todas las hojas de área (lo que el perfil
+              por estudiante necesita del uploader).
+  * analisis: analyze_data en streaming sobre un libro recién abierto.
+  * uploader: analysis_cache.analyze_upload sin caché (ingesta completa del dashboard).
+  * extract_general_data.
+y el pico de memoria (tracemalloc) de cada etapa.
+
+Uso:
+    python benchmarks/bench_suite.py                         # tabla en consola
+    python benchmarks/bench_suite.py --json actual.json      # guardar resultados
+    python benchmarks/bench_suite.py --baseline base.json    # falla si hay regresión
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analysis_cache  # noqa: E402
+import analysis_core  # noqa: E402
+from siagie_sintetico import generar_libro  # noqa: E402
+
+# (nombre, estudiantes, áreas, competencias, columnas_extra)
+TAMANOS = [
+    ('seccion-primaria', 30, 8, 3, 0),
+    ('seccion-secundaria', 40, 15, 4, 0),
+    ('seccion-ancha', 40, 15, 4, 60),
+    ('grado-completo', 400, 15, 4, 0),
+    ('escuela', 2000, 15, 5, 0),
+]
+
+
+def medir(func, repeticiones):
+    """Mejor tiempo (s) de `repeticiones` corridas y pico de memoria (MB) de una corrida."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        func()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return mejor, pico / (1024 * 1024)
+
+
+def correr(tamanos, repeticiones, ruido):
+    resultados = {}
+    for nombre, estudiantes, areas, competencias, extra in tamanos:
+        data = generar_libro(estudiantes, areas, competencias, ruido=ruido, columnas_extra=extra, seed=estudiantes)
+        hojas = [s for s in analysis_core.read_workbook(data).sheet_names if s not in analysis_core.HOJAS_NO_AREA]
+
+        def lectura():
+            workbook = analysis_core.read_workbook(data)
+            return {sheet: workbook.parse(sheet) for sheet in hojas}
+
+        etapas = {
+            'lectura': lectura,
+            'analisis': lambda: analysis_core.analyze_data(data, hojas),
+            'uploader': lambda: analysis_cache.analyze_upload(data),
+            'generalidades': lambda: analysis_core.extract_general_data(data),
+        }
+        fila = {'bytes': len(data)}
+        for etapa, func in etapas.items():
+            segundos, pico_mb = medir(func, repeticiones)
+            fila[f'{etapa}_s'] = round(segundos, 4)
+            fila[f'{etapa}_mb'] = round(pico_mb, 2)
+        resultados[nombre] = fila
+        print(
+            f"{nombre:<20} {fila['bytes'] / 1024:>8.0f} KB"
+            + ''.join(f" | {e} {fila[f'{e}_s'] * 1000:>8.1f} ms {fila[f'{e}_mb']:>6.1f} MB" for e in etapas),
+            flush=True,
+        )
+    return resultados
+
+
+def comparar(actual, baseline, tolerancia):
+    """Lista de regresiones: etapas más lentas o con más memoria que baseline * (1 + tolerancia)."""
+    regresiones = []
+    for nombre, fila in actual.items():
+        base = baseline.get(nombre)
+        if not base:
+            continue
+        for clave, valor in fila.items():
+            if clave == 'bytes' or clave not in base or not base[clave]:
+                continue
+            if valor > base[clave] * (1 + tolerancia):
+                regresiones.append(f"{nombre}.{clave}: {base[clave]} -> {valor} (+{(valor / base[clave] - 1) * 100:.0f}%)")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--ruido', type=float, default=0.05)
+    parser.add_argument('--rapido', action='store_true', help='Solo los tamaños de una sección')
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    parser.add_argument('--baseline', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Regresión permitida (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    tamanos = TAMANOS[:3] if args.rapido else TAMANOS
+    resultados = correr(tamanos, args.repeticiones, args.ruido)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+        if regresiones:
+            print("\nRegresiones detectadas:")
+            for r in regresiones:
+                print(f"  - {r}")
+            return 1
+        print("\nSin regresiones respecto al baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Generador de libros SIAGIE sintéticos (sin datos reales de estudiantes).
+
+Reproduce el formato que lee analysis_core:
+  * Hoja 'Generalidades' con Nivel (H5), Grado (H10), Sección (J10) y la fila
+    'Período de evaluación :' que usa extraer_periodo_de_generalidades.
+  * Una hoja por área: encabezados en las filas 1-2, estudiantes desde la fila 3
+    (N° de orden en A, nombre en B), notas NL en D, F, H... y conclusiones en E, G, I...
+  * La leyenda '01 = competencia' en la Columna B, 4 filas debajo del último estudiante.
+
+Uso:
+    python benchmarks/siagie_sintetico.py salida.xlsx --estudiantes 40 --areas 10
+"""
+import argparse
+import io
+
+import numpy as np
+import xlsxwriter
+
+AREAS = [
+    'Matemática', 'Comunicación', 'Inglés', 'Arte y Cultura', 'Ciencias Sociales',
+    'Desarrollo Personal, Ciudadanía y Cívica', 'Educación Física', 'Educación Religiosa',
+    'Ciencia y Tecnología', 'Educación para el Trabajo', 'Tutoría', 'Castellano como segunda lengua',
+    'Lengua originaria', 'Taller de Robótica', 'Taller de Oratoria',
+]
+NIVELES = ['AD', 'A', 'B', 'C']
+# Ruido típico de registros llenados a mano: vacíos, minúsculas, espacios, notas vigesimales
+RUIDO = ['', 'Ad', 'a ', ' B', 'A+', 'c', '15', 'EXO']
+APELLIDOS = ['QUISPE', 'MAMANI', 'HUAMÁN', 'FLORES', 'RODRÍGUEZ', 'SÁNCHEZ', 'GARCÍA', 'ÑAUPARI', 'CCAHUANA', 'PÉREZ']
+NOMBRES = ['JOSÉ', 'MARÍA', 'LUIS', 'ANA', 'JESÚS', 'ROSA', 'ÁNGEL', 'SOFÍA', 'MIGUEL', 'LUCÍA']
+
+
+def generar_libro(estudiantes=40, areas=10, competencias=4, ruido=0.05, columnas_extra=0,
+                  nivel='SECUNDARIA', grado='PRIMERO', seccion='A', periodo='PRIMER BIMESTRE', seed=0):
+    """
+    Devuelve los bytes de un .xlsx con formato SIAGIE.
+
+    estudiantes: filas de estudiantes por hoja de área.
+    areas: número de hojas de área (si supera len(AREAS) los nombres se numeran).
+    competencias: competencias por área (columnas de nota D, F, H...).
+    ruido: fracción de celdas de nota con valores no válidos o vacíos.
+    columnas_extra: columnas de relleno a la derecha (hojas anchas con formato).
+    """
+    rng = np.random.default_rng(seed)
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+
+    relleno = workbook.add_format({'bg_color': '#F2F2F2', 'border': 1})
+
+    gen = workbook.add_worksheet('Generalidades')
+    gen.write('B3', 'Período de evaluación :')
+    gen.write('D3', periodo)
+    gen.write('F3', 'Grado :')
+    gen.write('G3', grado)
+    gen.write('H3', 'Sección :')
+    gen.write('I3', seccion)
+    gen.write('H5', nivel)
+    gen.write('H10', grado)
+    gen.write('J10', seccion)
+
+    nombres = [
+        f"{APELLIDOS[rng.integers(len(APELLIDOS))]} {APELLIDOS[rng.integers(len(APELLIDOS))]}, {NOMBRES[rng.integers(len(NOMBRES))]}"
+        for _ in range(estudiantes)
+    ]
+    for a in range(areas):
+        area = AREAS[a % len(AREAS)][:31]
+        if a >= len(AREAS):
+            area = f"{area[:27]} {a // len(AREAS) + 1}"
+        ws = workbook.add_worksheet(area)
+        ws.write_row(0, 0, ['Nro', 'Estudiante', 'DNI'])
+        ws.write_row(1, 0, ['', '', ''])
+        for c in range(competencias):
+            col = 3 + 2 * c
+            ws.write(0, col, f"{c + 1:02d}")
+            ws.write(1, col, 'NL')
+            ws.write(1, col + 1, 'Conclusión descriptiva')
+        last_col = 3 + 2 * competencias
+        for extra in range(columnas_extra):
+            ws.write(0, last_col + extra, f"Col {extra + 1}")
+
+        notas = rng.choice(NIVELES, size=(estudiantes, competencias), p=[0.15, 0.4, 0.3, 0.15])
+        ruidosas = rng.random((estudiantes, competencias)) < ruido
+        for r in range(estudiantes):
+            row = 2 + r
+            ws.write_number(row, 0, r + 1)
+            ws.write_string(row, 1, nombres[r])
+            ws.write_string(row, 2, f"{70000000 + r:08d}")
+            for c in range(competencias):
+                valor = RUIDO[rng.integers(len(RUIDO))] if ruidosas[r, c] else notas[r, c]
+                if valor:
+                    ws.write_string(row, 3 + 2 * c, valor)
+                ws.write_string(row, 4 + 2 * c, 'Logra los aprendizajes esperados.')
+            for extra in range(columnas_extra):
+                ws.write_blank(row, last_col + extra, None, relleno)
+
+        legend_row = 2 + estudiantes - 1 + 4
+        for c in range(competencias):
+            ws.write_string(legend_row + c, 1, f"{c + 1:02d} = Competencia {c + 1} de {area}")
+        ws.write_string(legend_row + competencias, 1, 'NL = Nivel de logro')
+
+    workbook.close()
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('salida')
+    parser.add_argument('--estudiantes', type=int, default=40)
+    parser.add_argument('--areas', type=int, default=10)
+    parser.add_argument('--competencias', type=int, default=4)
+    parser.add_argument('--ruido', type=float, default=0.05)
+    parser.add_argument('--columnas-extra', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    data = generar_libro(args.estudiantes, args.areas, args.competencias, args.ruido, args.columnas_extra, seed=args.seed)
+    with open(args.salida, 'wb') as f:
+        f.write(data)
+
+
+if __name__ == '__main__':
+    main()
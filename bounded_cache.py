@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+# =========================================================================
+# === CACHÉ LRU ACOTADA EN MEMORIA ===
+# Base común de las cachés del proceso compartidas entre sesiones (layouts
+# de plantilla, libros exportados, figuras): un OrderedDict protegido por
+# un lock, con desalojo LRU por número de entradas o por tamaño total y
+# contadores de aciertos para monitoreo. Cada módulo define solo su clave
+# y lo que guarda.
+# =========================================================================
+
+
+class BoundedLRUCache:
+    """
+    Dict LRU seguro entre hilos. Se acota por número de entradas (max_entries), por
+    tamaño total (max_bytes, medido con sizeof) o por ambos; un valor más grande que
+    max_bytes no se guarda. No se guardan valores None (get devuelve None si no está).
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # clave -> (valor, tamaño)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'desalojados': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # Sin contar acierto ni fallo ni cambiar el orden LRU
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            previo = self._entries.pop(key, None)
+            if previo is not None:
+                self._bytes -= previo[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._over_limit():
+                _, (_, desalojado) = self._entries.popitem(last=False)
+                self._bytes -= desalojado
+                self._stats['desalojados'] += 1
+
+    def get_or_build(self, key, build):
+        """Valor guardado para `key`, o el que devuelve build() (que queda guardado)."""
+        value = self.get(key)
+        if value is None:
+            # Se genera fuera del lock: dos sesiones a la vez pueden generar el mismo valor
+            value = build()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entradas=len(self._entries), bytes=self._bytes)
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _over_limit(self):
+        return (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        )
@@ -0,0 +1,209 @@
+"""
+AulaMetrics - análisis de libros SIAGIE desde la línea de comandos.
+
+Corre analysis_core.analyze_data sobre uno o varios libros (archivos .xlsx,
+carpetas o .zip) sin abrir el navegador; pensado para procesos nocturnos (cron).
+No importa Streamlit, plotly ni el cliente de Gemini.
+
+Ejemplos:
+    python cli.py registro_1A.xlsx --salida resultados/
+    python cli.py exportaciones/ --formato csv --excel --workers 4
+    python cli.py secciones.zip --formato parquet
+    python cli.py secciones/ --consolidado --formato csv
+    python cli.py ugel/ --streaming --workers 4      # memoria acotada, cientos de colegios
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import pandas as pd
+
+import analysis_core
+import batch_analysis
+import excel_export
+import rollup
+
+FORMATOS = ('json', 'csv', 'parquet')
+
+
+def _nombre_seguro(texto):
+    return re.sub(r'[^\w\-.]+', '_', str(texto)).strip('_')
+
+
+def analizar_fuente(nombre, ref, workers=None):
+    """Analiza un libro; devuelve analisis_results o un dict con 'error' si no se pudo leer."""
+    try:
+        workbook = analysis_core.read_workbook(batch_analysis.load_workbook_bytes(ref))
+        hojas = [s for s in workbook.sheet_names if s not in analysis_core.HOJAS_NO_AREA]
+        return analysis_core.analyze_data(workbook, hojas, workers=workers)
+    except Exception as e:
+        return {'error': f"Error al procesar el archivo '{nombre}': {e}"}
+
+
+def escribir_resultados(resultados, salida, formato):
+    """Escribe todos los resultados en un solo archivo JSON, CSV o Parquet."""
+    if formato == 'json':
+        path = os.path.join(salida, 'resultados.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        return path
+
+    frames = []
+    for archivo, results in resultados.items():
+        if 'error' in results:
+            df = pd.DataFrame([{'error': results['error']}], columns=analysis_core.RESULT_COLUMNS)
+        else:
+            df = analysis_core.results_to_frame(results)
+        df.insert(0, 'archivo', archivo)
+        frames.append(df)
+    tabla = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return escribir_tabla(tabla, salida, 'resultados', formato)
+
+
+def escribir_tabla(tabla, salida, nombre, formato):
+    """Escribe un DataFrame como nombre.csv / .parquet / .json (lista de filas)."""
+    path = os.path.join(salida, f'{nombre}.{formato}')
+    if formato == 'csv':
+        tabla.to_csv(path, index=False, encoding='utf-8-sig')
+    elif formato == 'parquet':
+        tabla.to_parquet(path, index=False)
+    else:
+        tabla.to_json(path, orient='records', force_ascii=False, indent=2)
+    return path
+
+
+def escribir_consolidado(resultados, salida, formato):
+    """Consolidado por grado, nivel e institución de todos los libros analizados."""
+    consolidado = rollup.Rollup()
+    for archivo, results in resultados.items():
+        if 'error' not in results:
+            consolidado.add_results(results, section_id=archivo)
+    return [
+        escribir_tabla(consolidado.to_frame(nivel), salida, f'consolidado_{nivel}', formato)
+        for nivel in rollup.ROLLUP_KEYS
+    ]
+
+
+def escribir_excel(archivo, results, salida):
+    """Un libro de Matriz de Frecuencias por área (igual que el botón del dashboard)."""
+    paths = []
+    for sheet_name, result in results.items():
+        if not result.get('competencias'):
+            continue
+        df_table = analysis_core.build_frequency_table(result['competencias'])
+        excel_data = excel_export.frequency_workbook_bytes(df_table, sheet_name, result.get('generalidades', {}))
+        nombre = f"Reporte_PBI_{_nombre_seguro(os.path.splitext(archivo)[0])}_{_nombre_seguro(sheet_name)}.xlsx"
+        path = os.path.join(salida, nombre)
+        with open(path, 'wb') as f:
+            f.write(excel_data)
+        paths.append(path)
+    return paths
+
+
+def correr_streaming(entradas, salida, formato, workers=None):
+    """
+    Modo de memoria acotada: cada libro se resume y se suma a los agregados en cuanto
+    se termina de leer; no se guardan resultados por archivo. Escribe el agregado por
+    sección y los consolidados, e informa el pico de RSS por proceso (principal y workers).
+    """
+    aggregate = batch_analysis.SchoolAggregate(keep_sections=False)
+
+    def progreso(procesados, total, nombre):
+        print(f"[aulametrics] ({procesados}/{total}) {nombre}", file=sys.stderr)
+
+    for entrada in entradas:
+        if not os.path.exists(entrada):
+            print(f"[aulametrics] No existe: {entrada}", file=sys.stderr)
+            aggregate.archivos.append({'archivo': entrada, 'error': f"No existe la ruta '{entrada}'"})
+            continue
+        batch_analysis.analyze_batch(entrada, workers=workers, progress=progreso, aggregate=aggregate)
+
+    paths = [escribir_tabla(aggregate.to_frame(), salida, 'agregado_secciones', formato)]
+    paths += [
+        escribir_tabla(aggregate.rollup.to_frame(nivel), salida, f'consolidado_{nivel}', formato)
+        for nivel in rollup.ROLLUP_KEYS
+    ]
+    return aggregate, paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='aulametrics',
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('entradas', nargs='+', help='Archivos .xlsx, carpetas o .zip con libros SIAGIE')
+    parser.add_argument('-o', '--salida', default='resultados', help='Carpeta de salida (por defecto: resultados/)')
+    parser.add_argument('-f', '--formato', choices=FORMATOS, default='json', help='Formato de los resultados')
+    parser.add_argument('--excel', action='store_true', help='Exportar además la Matriz de Frecuencias por área (.xlsx)')
+    parser.add_argument('--consolidado', action='store_true',
+                        help='Escribir además los consolidados por grado, nivel e institución')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Memoria acotada para muchos libros: solo agregados, sin resultados por archivo')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Procesos para analizar las hojas en paralelo')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.salida, exist_ok=True)
+
+    if args.streaming:
+        try:
+            aggregate, paths = correr_streaming(args.entradas, args.salida, args.formato, workers=args.workers)
+        except ImportError as e:
+            print(f"[aulametrics] No se pudo escribir {args.formato}: {e}", file=sys.stderr)
+            return 2
+        for path in paths:
+            print(f"[aulametrics] Agregado: {path}", file=sys.stderr)
+        pico = aggregate.stats.get('pico_rss_mb')
+        detalle = ''
+        if aggregate.stats.get('pico_rss_mb_workers') is not None:
+            detalle = (f" (principal {aggregate.stats['pico_rss_mb_principal']} MB, "
+                       f"workers {aggregate.stats['pico_rss_mb_workers']} MB)")
+        print(f"[aulametrics] {aggregate.stats.get('archivos', 0)} archivos en {aggregate.stats.get('segundos', 0)} s; "
+              f"pico de memoria por proceso (RSS): {pico if pico is not None else 'no disponible'} MB{detalle}",
+              file=sys.stderr)
+        fallidos = [a for a in aggregate.archivos if 'error' in a]
+        for archivo in fallidos:
+            print(f"[aulametrics] {archivo['error']}", file=sys.stderr)
+        return 1 if fallidos else 0
+
+    resultados = {}
+    for entrada in args.entradas:
+        if not os.path.exists(entrada):
+            print(f"[aulametrics] No existe: {entrada}", file=sys.stderr)
+            resultados[entrada] = {'error': f"No existe la ruta '{entrada}'"}
+            continue
+        # El nombre incluye la entrada y la ruta relativa: libros homónimos de carpetas distintas no se pisan
+        for nombre, ref in batch_analysis.iter_workbook_sources(entrada):
+            if nombre in resultados:
+                print(f"[aulametrics] {nombre} ya se analizó (entrada repetida); se omite", file=sys.stderr)
+                continue
+            print(f"[aulametrics] Analizando {nombre}...", file=sys.stderr)
+            resultados[nombre] = analizar_fuente(nombre, ref, workers=args.workers)
+
+    try:
+        path = escribir_resultados(resultados, args.salida, args.formato)
+        consolidados = escribir_consolidado(resultados, args.salida, args.formato) if args.consolidado else []
+    except ImportError as e:
+        # Parquet requiere pyarrow o fastparquet
+        print(f"[aulametrics] No se pudo escribir {args.formato}: {e}", file=sys.stderr)
+        return 2
+    print(f"[aulametrics] Resultados: {path}", file=sys.stderr)
+    for consolidado_path in consolidados:
+        print(f"[aulametrics] Consolidado: {consolidado_path}", file=sys.stderr)
+
+    if args.excel:
+        for archivo, results in resultados.items():
+            if 'error' not in results:
+                for excel_path in escribir_excel(archivo, results, args.salida):
+                    print(f"[aulametrics] Excel: {excel_path}", file=sys.stderr)
+
+    fallidos = [archivo for archivo, results in resultados.items() if 'error' in results]
+    for archivo in fallidos:
+        print(f"[aulametrics] {resultados[archivo]['error']}", file=sys.stderr)
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
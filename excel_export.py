@@ -0,0 +1,346 @@
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+import analysis_core
+from bounded_cache import BoundedLRUCache
+
+# =========================================================================
+# === EXPORTACIÓN A EXCEL (sin dependencias de Streamlit) ===
+# Usado por el dashboard (modules/evaluacion.convert_df_to_excel) y por la CLI.
+# =========================================================================
+
+# Versión del formato de los libros exportados (cambiarla invalida exportaciones guardadas)
+EXPORTER_VERSION = '1'
+
+# Caracteres que Excel no admite en el nombre de una hoja
+_SHEET_NAME_INVALID = re.compile(r'[\[\]:*?/\\]')
+
+# Tamaño máximo de la caché de exportaciones en memoria
+EXPORT_CACHE_MAX_BYTES = 128 * 1024 * 1024  # 128 MB
+
+
+def export_key(upload_hash, name, version=EXPORTER_VERSION):
+    """Clave de una exportación: hash del archivo subido + hoja (o tipo de libro) + versión del exportador."""
+    return (upload_hash, name, version)
+
+
+class ExportCache(BoundedLRUCache):
+    """
+    Libros exportados (bytes) en memoria, compartidos por todas las sesiones del proceso:
+    dos docentes que exportan el mismo archivo reciben los mismos bytes sin regenerarlos.
+    La búsqueda es por clave (export_key), sin hashear los datos. Desalojo LRU por
+    tamaño total; un libro más grande que el límite no se guarda.
+    """
+
+    def __init__(self, max_bytes=EXPORT_CACHE_MAX_BYTES):
+        super().__init__(max_bytes=max_bytes)
+
+
+_export_cache = None
+
+
+def get_export_cache():
+    """Instancia compartida por todo el proceso. Límite configurable con AULAMETRICS_EXPORT_CACHE_MB."""
+    global _export_cache
+    if _export_cache is None:
+        _export_cache = ExportCache(
+            int(os.environ.get('AULAMETRICS_EXPORT_CACHE_MB', EXPORT_CACHE_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+        )
+    return _export_cache
+
+
+def _level_header_formats(workbook):
+    """Formatos de encabezado por nivel de logro (colores del dashboard)."""
+    return {
+        'AD': workbook.add_format({'bg_color': '#008450', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'}),
+        'A': workbook.add_format({'bg_color': '#32CD32', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'}),
+        'B': workbook.add_format({'bg_color': '#FFB900', 'font_color': 'black', 'bold': True, 'border': 1, 'align': 'center'}),
+        'C': workbook.add_format({'bg_color': '#E81123', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'}),
+        'default': workbook.add_format({'bg_color': '#113770', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'})
+    }
+
+
+# pandas escribe con worksheet.write, que convierte '=...' en fórmula: los nombres de
+# estudiantes y de áreas son texto de los usuarios y se guardan siempre como texto
+_WRITER_KWARGS = {'options': {'strings_to_formulas': False}}
+
+
+def _group_title(general_info):
+    return f"Nivel: {general_info.get('nivel', 'Descon.')} | Grado: {general_info.get('grado', 'Descon.')} | Sección: {general_info.get('seccion', 'Descon.')}"
+
+
+def frequency_workbook_bytes(df, area_name, general_info):
+    """
+    Libro .xlsx de la Matriz de Frecuencias de un área (hoja 'Frecuencias'),
+    con encabezados coloreados por nivel y el contexto del grupo como título.
+    """
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs=_WRITER_KWARGS) as writer:
+        # Escribir la tabla empezando en fila 3 (deja espacio arriba para título)
+        df.to_excel(writer, sheet_name='Frecuencias', index=True, startrow=2, startcol=0)
+        
+        workbook = writer.book
+        worksheet = writer.sheets['Frecuencias']
+        
+        # Formatos para encabezados por nivel
+        header_formats = _level_header_formats(workbook)
+        
+        # Formato para celdas de datos
+        fmt_data = workbook.add_format({'border': 1, 'align': 'center', 'num_format': '0'})
+        fmt_percent = workbook.add_format({'border': 1, 'align': 'center', 'num_format': '0.0%'})
+        fmt_total = workbook.add_format({'bg_color': '#E2E8F0', 'bold': True, 'border': 1, 'align': 'center'})
+        
+        # Ajustar anchos de columnas
+        worksheet.set_column('A:A', 50, fmt_data)
+        worksheet.set_column('B:J', 12, fmt_data)
+        
+        # Aplicar formato a encabezados (según nivel)
+        header_row = 2  # Fila de encabezados (startrow=2)
+        for col_num, col_name in enumerate(df.columns):
+            level = col_name.split(' ')[0]
+            fmt = header_formats.get(level, header_formats['default'])
+            worksheet.write(header_row, col_num + 1, col_name, fmt)  # +1 por índice
+        
+        # Título fusionado arriba (sin afectar la tabla)
+        title_format = workbook.add_format({
+            'bold': True, 'font_size': 12, 'align': 'center', 'bg_color': '#E2E8F0', 'border': 1
+        })
+        title_text = f"Área: {area_name} - {_group_title(general_info)}"
+        worksheet.merge_range('A1:J1', title_text, title_format)
+        
+        # Limpiar filas vacías (sin bordes)
+        empty_format = workbook.add_format({'border': 0})
+        for row in range(len(df) + 3, 50):  # Limpiar desde la fila siguiente a la tabla
+            worksheet.set_row(row, None, empty_format)
+        
+        # Congelar paneles (encabezados fijos)
+        worksheet.freeze_panes(3, 1)  # Congelar fila 3 (encabezados) y columna A
+    
+    output.seek(0)
+    return output.getvalue()
+
+
+def risk_ranking_workbook_bytes(df, general_info, pesos=None, normalizar=False):
+    """
+    Libro .xlsx del ranking de estudiantes en riesgo (risk_ranking.rank_students):
+    conteos por nivel, puntaje total y puntaje por área con escala de color.
+    """
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs=_WRITER_KWARGS) as writer:
+        df.to_excel(writer, sheet_name='En riesgo', index=False, startrow=3)
+        workbook = writer.book
+        worksheet = writer.sheets['En riesgo']
+        header_formats = _level_header_formats(workbook)
+
+        title_format = workbook.add_format({'bold': True, 'font_size': 12, 'align': 'center', 'bg_color': '#E2E8F0', 'border': 1})
+        last_col = max(len(df.columns) - 1, 1)
+        worksheet.merge_range(0, 0, 0, last_col, f"Estudiantes en riesgo - {_group_title(general_info)}", title_format)
+        criterio = ', '.join(f"{nivel}={peso}" for nivel, peso in (pesos or {}).items())
+        worksheet.write(1, 0, f"Puntaje: {criterio or 'pesos por defecto'}{' (por nota registrada)' if normalizar else ''}")
+
+        header_row = 3
+        for col_num, col_name in enumerate(df.columns):
+            worksheet.write_string(header_row, col_num, str(col_name), header_formats.get(col_name, header_formats['default']))
+        worksheet.set_column(0, 0, 8)
+        worksheet.set_column(1, 1, 40)
+        worksheet.set_column(2, last_col, 12)
+
+        if len(df):
+            # Escala de color (verde -> rojo) sobre el puntaje total y el de cada área
+            puntaje_col = df.columns.get_loc('Puntaje')
+            worksheet.conditional_format(header_row + 1, puntaje_col, header_row + len(df), last_col, {
+                'type': '3_color_scale', 'min_color': '#F8FFF8', 'mid_color': '#FFE699', 'max_color': '#F4B6B6',
+            })
+        worksheet.freeze_panes(header_row + 1, 2)
+
+    output.seek(0)
+    return output.getvalue()
+
+
+# =========================================================================
+# === LIBRO CONSOLIDADO (todas las áreas en una sola pasada) ===
+# Resumen, una hoja de frecuencias por área, matriz estudiante × competencia
+# y calidad de datos. Se escribe con xlsxwriter en modo constant_memory: cada
+# fila se vuelca a disco apenas se completa, así que la memoria no crece con
+# la cantidad de estudiantes. Por eso cada hoja se escribe de arriba hacia
+# abajo, sin volver a filas anteriores.
+# =========================================================================
+
+
+def _sheet_name(name, usados):
+    """Nombre de hoja válido (sin []:*?/\\, hasta 31 caracteres) y único entre `usados`."""
+    base = _SHEET_NAME_INVALID.sub('', str(name)).strip()[:31] or 'Hoja'
+    nombre, n = base, 2
+    while nombre.lower() in usados:
+        sufijo = f" ({n})"
+        nombre = base[:31 - len(sufijo)] + sufijo
+        n += 1
+    usados.add(nombre.lower())
+    return nombre
+
+
+def _student_matrix(index):
+    """
+    Matriz estudiantes × (área, competencia) con el código de nivel (-1 = sin nota) a
+    partir de los registros del índice, más las etiquetas de columna (área, competencia).
+    """
+    records = index.records
+    n_comps = max(len(index.competencies), 1)
+    pair = records['area'].astype(np.int64) * n_comps + records['competencia']
+    # Columnas ordenadas por área y luego por competencia (orden de las columnas de la hoja)
+    columns = np.unique(pair)
+    column_of = {key: j for j, key in enumerate(columns.tolist())}
+    matrix = np.full((len(index.students), len(columns)), -1, dtype=np.int8)
+    if len(pair):
+        matrix[records['estudiante'], np.array([column_of[key] for key in pair.tolist()], dtype=np.intp)] = records['nivel']
+    labels = [(index.areas[key // n_comps], index.competencies[key % n_comps]) for key in columns.tolist()]
+    return matrix, labels
+
+
+def write_consolidated_workbook(destino, results, general_info, index=None):
+    """
+    Escribe en `destino` (ruta o archivo binario) el libro consolidado del análisis:
+      * 'Resumen': una fila por área con conteos, porcentajes, calidad y estado.
+      * una hoja por área con la Matriz de Frecuencias.
+      * 'Estudiantes': nivel de cada estudiante en cada competencia (si se pasa el
+        student_index.StudentIndex) y sus totales.
+      * 'Calidad de datos': celdas vacías / no reconocidas por competencia y el
+        detalle de cada nota no reconocida.
+    `results` es el dict de analyze_data o un analysis_core.AnalysisResult.
+    """
+    results = analysis_core.AnalysisResult.from_dict(results)
+    niveles = analysis_core.NIVELES_LOGRO
+    workbook = xlsxwriter.Workbook(destino, {'constant_memory': True})
+    try:
+        header_formats = _level_header_formats(workbook)
+        title_format = workbook.add_format({'bold': True, 'font_size': 12, 'align': 'center', 'bg_color': '#E2E8F0', 'border': 1})
+        fmt_data = workbook.add_format({'border': 1, 'align': 'center', 'num_format': '0'})
+        fmt_percent = workbook.add_format({'border': 1, 'align': 'center', 'num_format': '0.0%'})
+        fmt_text = workbook.add_format({'border': 1})
+        fmt_nivel = {n: workbook.add_format({'border': 1, 'align': 'center', 'bold': True, 'font_color': color})
+                     for n, color in zip(niveles, ('#008450', '#1E7B1E', '#B07800', '#E81123'))}
+        titulo_grupo = _group_title(general_info)
+        usados = set()
+
+        def encabezados(worksheet, row, columnas):
+            for col, nombre in enumerate(columnas):
+                nivel = (str(nombre).replace('%', '').split() or [''])[0]
+                worksheet.write_string(row, col, str(nombre), header_formats.get(nivel, header_formats['default']))
+
+        # --- Resumen ---
+        ws = workbook.add_worksheet(_sheet_name('Resumen', usados))
+        columnas = ['Área', 'Competencias'] + niveles + [f'% {n}' for n in niveles] + ['Total', 'Vacías', 'No reconocidas', 'Estado']
+        ws.set_column(0, 0, 35)
+        ws.set_column(1, len(columnas) - 2, 12)
+        ws.set_column(len(columnas) - 1, len(columnas) - 1, 60)
+        ws.merge_range(0, 0, 0, len(columnas) - 1, f"Resumen por área - {titulo_grupo}", title_format)
+        encabezados(ws, 2, columnas)
+        for row, sheet_name in enumerate(results.sheet_names, start=3):
+            i = results.sheet_index[sheet_name]
+            idx = results.sheet_comps[i]
+            counts = results.counts[i, idx].sum(axis=0) if len(idx) else np.zeros(len(niveles), dtype=np.int64)
+            total = int(counts.sum())
+            extras = results.extras[i]
+            calidad = extras.get('calidad') or {}
+            por_comp = calidad.get('por_competencia', {}).values()
+            estado = extras.get('error') or ('Ignorada' if extras.get('ignored') else 'OK')
+            ws.write_string(row, 0, sheet_name, fmt_text)
+            ws.write(row, 1, len(idx), fmt_data)
+            for k, value in enumerate(counts.tolist()):
+                ws.write(row, 2 + k, value, fmt_data)
+                ws.write(row, 2 + len(niveles) + k, value / total if total else 0, fmt_percent)
+            ws.write(row, 2 + 2 * len(niveles), total, fmt_data)
+            ws.write(row, 3 + 2 * len(niveles), sum(c['vacias'] for c in por_comp), fmt_data)
+            ws.write(row, 4 + 2 * len(niveles), sum(c['invalidas'] for c in por_comp), fmt_data)
+            ws.write_string(row, 5 + 2 * len(niveles), estado, fmt_text)
+        ws.freeze_panes(3, 1)
+
+        # --- Una hoja de frecuencias por área ---
+        for sheet_name in results.sheet_names:
+            i = results.sheet_index[sheet_name]
+            idx = results.sheet_comps[i]
+            if not len(idx):
+                continue
+            counts = results.counts[i, idx]
+            total = counts.sum(axis=1)
+            ws = workbook.add_worksheet(_sheet_name(sheet_name, usados))
+            columnas = ['Competencia']
+            for n in niveles:
+                columnas += [f'{n} (Est.)', f'% {n}']
+            columnas.append('Total')
+            ws.set_column(0, 0, 50)
+            ws.set_column(1, len(columnas) - 1, 12)
+            ws.merge_range(0, 0, 0, len(columnas) - 1, f"Área: {sheet_name} - {titulo_grupo}", title_format)
+            encabezados(ws, 2, columnas)
+            for row, (nombre, fila, fila_total) in enumerate(zip(results.clean_names[idx], counts.tolist(), total.tolist()), start=3):
+                ws.write_string(row, 0, str(nombre), fmt_text)
+                for k, value in enumerate(fila):
+                    ws.write(row, 1 + 2 * k, value, fmt_data)
+                    ws.write(row, 2 + 2 * k, value / fila_total if fila_total else 0, fmt_percent)
+                ws.write(row, len(columnas) - 1, fila_total, fmt_data)
+            ws.freeze_panes(3, 1)
+
+        # --- Matriz estudiante × competencia ---
+        if index is not None and len(index):
+            matrix, labels = _student_matrix(index)
+            ws = workbook.add_worksheet(_sheet_name('Estudiantes', usados))
+            n_cols = 1 + len(labels) + len(niveles)
+            ws.set_column(0, 0, 40)
+            ws.set_column(1, n_cols - 1, 14)
+            ws.merge_range(0, 0, 0, max(n_cols - 1, 1), f"Nivel por estudiante y competencia - {titulo_grupo}", title_format)
+            # Dos filas de encabezado: área y competencia
+            ws.write(1, 0, 'Área', header_formats['default'])
+            for j, (area, _) in enumerate(labels, start=1):
+                ws.write_string(1, j, area, header_formats['default'])
+            encabezados(ws, 2, ['Estudiante'] + [comp for _, comp in labels] + niveles)
+            # Fila por fila (sin convertir la matriz completa a listas de Python)
+            for row, (nombre, codes, totales) in enumerate(zip(index.students, matrix, index.totals), start=3):
+                ws.write_string(row, 0, str(nombre), fmt_text)
+                for j, code in enumerate(codes.tolist(), start=1):
+                    if code >= 0:
+                        ws.write(row, j, niveles[code], fmt_nivel[niveles[code]])
+                for k, value in enumerate(totales.tolist()):
+                    ws.write(row, 1 + len(labels) + k, value, fmt_data)
+            ws.freeze_panes(3, 1)
+
+        # --- Calidad de datos ---
+        ws = workbook.add_worksheet(_sheet_name('Calidad de datos', usados))
+        ws.set_column(0, 0, 30)
+        ws.set_column(1, 1, 50)
+        ws.set_column(2, 4, 14)
+        ws.merge_range(0, 0, 0, 4, f"Calidad de datos - {titulo_grupo}", title_format)
+        encabezados(ws, 2, ['Área', 'Competencia', 'Vacías', 'No reconocidas', 'Válidas'])
+        row = 3
+        detalle = []
+        for sheet_name in results.sheet_names:
+            calidad = results.extras[results.sheet_index[sheet_name]].get('calidad')
+            if not calidad:
+                continue
+            for competencia, c in calidad['por_competencia'].items():
+                ws.write_string(row, 0, sheet_name, fmt_text)
+                ws.write_string(row, 1, analysis_core.clean_competencia_name(competencia), fmt_text)
+                ws.write(row, 2, c['vacias'], fmt_data)
+                ws.write(row, 3, c['invalidas'], fmt_data)
+                ws.write(row, 4, c['validas'], fmt_data)
+                row += 1
+            detalle.append((sheet_name, calidad['celdas_invalidas']))
+        if any(celdas['fila'] for _, celdas in detalle):
+            row += 1
+            ws.write(row, 0, 'Notas no reconocidas (no se cuentan en las matrices)', workbook.add_format({'bold': True}))
+            encabezados(ws, row + 1, ['Área', 'Competencia', 'Fila', 'Columna', 'Valor'])
+            row += 2
+            for sheet_name, celdas in detalle:
+                for fila, columna, competencia, valor in zip(celdas['fila'], celdas['columna'], celdas['competencia'], celdas['valor']):
+                    ws.write_string(row, 0, sheet_name, fmt_text)
+                    ws.write_string(row, 1, analysis_core.clean_competencia_name(competencia), fmt_text)
+                    ws.write(row, 2, fila, fmt_data)
+                    ws.write_string(row, 3, columna, fmt_text)
+                    ws.write_string(row, 4, valor, fmt_text)
+                    row += 1
+    finally:
+        workbook.close()
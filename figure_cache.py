@@ -0,0 +1,37 @@
+from bounded_cache import BoundedLRUCache
+
+# =========================================================================
+# === CACHÉ DE FIGURAS (ESPECIFICACIÓN JSON) ===
+# Guarda el JSON de cada gráfico del dashboard por (archivo, hoja,
+# competencia, tipo de gráfico). Cambiar de pestaña o de tipo de gráfico
+# pasa a ser una búsqueda en un dict en lugar de armar la figura con
+# plotly.express. Los textos JSON son inmutables, así que la caché se
+# comparte entre todas las sesiones del proceso.
+# =========================================================================
+
+# Versión del diseño de las figuras (cambiarla invalida las especificaciones guardadas)
+FIGURE_SPEC_VERSION = '1'
+FIGURE_CACHE_MAX_ENTRIES = 2048
+
+
+def figure_key(upload_hash, sheet_name, competencia, chart_type, version=FIGURE_SPEC_VERSION):
+    """Clave de una figura: hash del archivo + hoja + competencia + tipo de gráfico + versión."""
+    return (upload_hash, sheet_name, competencia, chart_type, version)
+
+
+class FigureSpecCache(BoundedLRUCache):
+    """
+    Especificaciones JSON de figuras en memoria, compartidas por todas las sesiones.
+    Desalojo LRU por número de entradas.
+    """
+
+    def __init__(self, max_entries=FIGURE_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries=max_entries)
+
+
+_figure_cache = FigureSpecCache()
+
+
+def get_figure_cache():
+    """Caché de figuras del proceso (para monitoreo o para vaciarla en pruebas)."""
+    return _figure_cache
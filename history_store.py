@@ -0,0 +1,255 @@
+import contextlib
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import analysis_core
+import app_paths
+import trend_analysis
+
+# =========================================================================
+# === HISTORIAL DE RESULTADOS (SQLITE LOCAL) ===
+# Guarda los conteos AD/A/B/C de cada período analizado, con clave
+# cuenta / institución / grado / sección / período / área / competencia,
+# para que la comparación entre períodos lea los períodos pasados sin
+# volver a subir ni leer los Excel. La cuenta (propietario) es el usuario
+# autenticado: la institución es texto libre y no separa un colegio de
+# otro. Las claves se guardan normalizadas (sin tildes ni mayúsculas, como
+# analysis_core.normalize_text) junto al texto original.
+# =========================================================================
+
+# En el directorio de datos de la app (privado y persistente entre reinicios)
+DEFAULT_DB_PATH = app_paths.app_data_dir('historial.sqlite3')
+
+# La tabla anterior (resultados, sin cuenta) no se lee: no se sabe de quién es cada fila
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS historial (
+    propietario TEXT NOT NULL,
+    institucion TEXT NOT NULL,
+    grado TEXT NOT NULL,
+    seccion TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    area TEXT NOT NULL,
+    competencia TEXT NOT NULL,
+    nivel TEXT NOT NULL,
+    institucion_nombre TEXT NOT NULL,
+    grado_nombre TEXT NOT NULL,
+    seccion_nombre TEXT NOT NULL,
+    periodo_nombre TEXT NOT NULL,
+    periodo_orden INTEGER,
+    area_nombre TEXT NOT NULL,
+    area_orden INTEGER NOT NULL,
+    competencia_nombre TEXT NOT NULL,
+    competencia_completa TEXT NOT NULL,
+    competencia_orden INTEGER NOT NULL,
+    ad INTEGER NOT NULL,
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    c INTEGER NOT NULL,
+    archivo TEXT,
+    guardado REAL NOT NULL,
+    PRIMARY KEY (propietario, institucion, grado, seccion, periodo, area, competencia_orden)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_historial_area ON historial (propietario, institucion, area, competencia, periodo);
+CREATE INDEX IF NOT EXISTS idx_historial_periodo ON historial (propietario, institucion, periodo);
+"""
+
+# Columnas de clave (normalizadas) por las que filtra query, dentro de una cuenta
+KEY_COLUMNS = ['institucion', 'grado', 'seccion', 'periodo', 'area', 'competencia']
+_LEVEL_COLUMNS = [nivel.lower() for nivel in analysis_core.NIVELES_LOGRO]
+_INSERT_COLUMNS = ['propietario'] + KEY_COLUMNS + [
+    'nivel', 'institucion_nombre', 'grado_nombre', 'seccion_nombre', 'periodo_nombre', 'periodo_orden',
+    'area_nombre', 'area_orden', 'competencia_nombre', 'competencia_completa', 'competencia_orden',
+] + _LEVEL_COLUMNS + ['archivo', 'guardado']
+
+
+def _key(value):
+    return analysis_core.normalize_text('' if value is None else str(value))
+
+
+def _require(**valores):
+    """ValueError si algún valor de clave (cuenta, institución, período) está vacío."""
+    vacios = [nombre for nombre, valor in valores.items() if not _key(valor)]
+    if vacios:
+        raise ValueError(f"Falta {' y '.join(vacios)} para el historial.")
+
+
+class HistoryStore:
+    """
+    Historial persistente en un archivo SQLite. Cada operación abre su propia conexión,
+    así que una instancia se puede compartir entre sesiones (hilos) de Streamlit. Todas
+    las operaciones reciben la cuenta (propietario, el id del usuario autenticado) y solo
+    ven o modifican las filas de esa cuenta.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        directorio = os.path.dirname(os.path.abspath(path))
+        if path == DEFAULT_DB_PATH:
+            app_paths.private_dir(directorio)
+        else:
+            os.makedirs(directorio, mode=0o700, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:  # transacción: commit al salir, rollback si hay error
+                yield conn
+        finally:
+            conn.close()
+
+    def save_results(self, propietario, institucion, periodo, analisis_results, archivo=None):
+        """
+        Guarda (o reemplaza) un período completo a partir del resultado de analyze_data.
+        Grado y sección salen de sus generalidades. Las hojas con error o ignoradas no se
+        guardan. Cuenta, institución y período son obligatorios (ValueError si están
+        vacíos): con una clave vacía, archivos distintos se pisarían entre sí. Cada
+        competencia se identifica por su orden en el área (dos nombres que se normalizan
+        igual no se pisan). Devuelve la cantidad de competencias guardadas.
+        """
+        _require(propietario=propietario, institucion=institucion, periodo=periodo)
+        model = analysis_core.AnalysisResult.from_dict(analisis_results)
+        general = next((g for g in model.general if g), {})
+        grado, seccion = general.get('grado', ''), general.get('seccion', '')
+        grupo = (str(propietario), _key(institucion), _key(grado), _key(seccion), _key(periodo))
+        comunes = (str(general.get('nivel', '')), str(institucion), str(grado), str(seccion),
+                   str(periodo), trend_analysis.period_order(periodo))
+        guardado = time.time()
+
+        rows = []
+        for i, sheet_name in enumerate(model.sheet_names):
+            for orden, j in enumerate(model.sheet_comps[i].tolist()):
+                rows.append(grupo + (_key(sheet_name), _key(model.clean_names[j])) + comunes + (
+                    sheet_name, i, model.clean_names[j], model.comp_names[j], orden,
+                    *model.counts[i, j].tolist(), archivo, guardado,
+                ))
+
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM historial WHERE propietario = ? AND institucion = ? AND grado = ? AND seccion = ? AND periodo = ?',
+                grupo,
+            )
+            conn.executemany(
+                f"INSERT INTO historial ({', '.join(_INSERT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_INSERT_COLUMNS))})",
+                rows,
+            )
+        return len(rows)
+
+    def groups(self, propietario, institucion=None):
+        """
+        Grupos guardados de la cuenta: institución, grado, sección (texto original) y
+        cantidad de períodos. Sin institución (None) lista todas las de la cuenta; una
+        institución vacía es ValueError.
+        """
+        _require(propietario=propietario)
+        sql = ('SELECT institucion_nombre AS institucion, grado_nombre AS grado, seccion_nombre AS seccion, '
+               'COUNT(DISTINCT periodo) AS periodos FROM historial WHERE propietario = ?')
+        params = (str(propietario),)
+        if institucion is not None:
+            _require(institucion=institucion)
+            sql += ' AND institucion = ?'
+            params += (_key(institucion),)
+        sql += ' GROUP BY institucion, grado, seccion ORDER BY institucion, grado, seccion'
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def periods(self, propietario, institucion, grado, seccion):
+        """Etiquetas de los períodos guardados de un grupo, en orden (ver trend_analysis.period_order)."""
+        _require(propietario=propietario, institucion=institucion)
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT periodo_nombre FROM historial '
+                'WHERE propietario = ? AND institucion = ? AND grado = ? AND seccion = ? '
+                'GROUP BY periodo ORDER BY periodo_orden IS NULL, periodo_orden, MIN(guardado)',
+                (str(propietario), _key(institucion), _key(grado), _key(seccion)),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def load_results(self, propietario, institucion, grado, seccion, periodo):
+        """
+        Un período guardado con la forma de analyze_data ({área: {'generalidades',
+        'competencias'}}), listo para trend_analysis.PeriodTrend.build. {} si no existe.
+        """
+        _require(propietario=propietario)
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT nivel, grado_nombre, seccion_nombre, area_nombre, competencia_completa, '
+                'competencia_nombre, ad, a, b, c FROM historial '
+                'WHERE propietario = ? AND institucion = ? AND grado = ? AND seccion = ? AND periodo = ? '
+                'ORDER BY area_orden, competencia_orden',
+                (str(propietario), _key(institucion), _key(grado), _key(seccion), _key(periodo)),
+            ).fetchall()
+
+        results = {}
+        for nivel, grado_nombre, seccion_nombre, area, completa, limpia, *conteos in rows:
+            result = results.setdefault(area, {
+                'generalidades': {'nivel': nivel, 'grado': grado_nombre, 'seccion': seccion_nombre},
+                'competencias': {},
+            })
+            result['competencias'][completa] = {
+                'conteo_niveles': dict(zip(analysis_core.NIVELES_LOGRO, conteos)),
+                'total_evaluados': sum(conteos),
+                'nombre_limpio': limpia,
+            }
+        return results
+
+    def load_trend(self, propietario, institucion, grado, seccion, periodos=None):
+        """PeriodTrend de los períodos guardados de un grupo (todos si periodos es None)."""
+        periodos = self.periods(propietario, institucion, grado, seccion) if periodos is None else periodos
+        return trend_analysis.PeriodTrend.build(
+            [(periodo, self.load_results(propietario, institucion, grado, seccion, periodo)) for periodo in periodos]
+        )
+
+    def query(self, propietario, **filtros):
+        """
+        Filas guardadas de la cuenta como DataFrame, filtrando por cualquier columna de
+        clave (institucion=..., grado=..., area=..., etc.; se comparan normalizadas).
+        """
+        _require(propietario=propietario)
+        desconocidas = set(filtros) - set(KEY_COLUMNS)
+        if desconocidas:
+            raise ValueError(f"Filtros no válidos: {', '.join(sorted(desconocidas))}. Use: {', '.join(KEY_COLUMNS)}")
+        where = ' AND '.join(['propietario = ?'] + [f'{column} = ?' for column in filtros])
+        sql = (
+            'SELECT institucion_nombre AS institucion, nivel, grado_nombre AS grado, seccion_nombre AS seccion, '
+            'periodo_nombre AS periodo, area_nombre AS area, competencia_nombre AS competencia, '
+            f"{', '.join(f'{c} AS {n}' for c, n in zip(_LEVEL_COLUMNS, analysis_core.NIVELES_LOGRO))}, archivo "
+            f'FROM historial WHERE {where}'
+            ' ORDER BY institucion, grado, seccion, periodo_orden IS NULL, periodo_orden, area_orden, competencia_orden'
+        )
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=[str(propietario)] + [_key(v) for v in filtros.values()])
+        df['total'] = df[analysis_core.NIVELES_LOGRO].sum(axis=1)
+        return df
+
+    def delete_period(self, propietario, institucion, grado, seccion, periodo):
+        """Borra un período guardado de la cuenta. Devuelve las filas borradas."""
+        _require(propietario=propietario)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'DELETE FROM historial WHERE propietario = ? AND institucion = ? AND grado = ? AND seccion = ? AND periodo = ?',
+                (str(propietario), _key(institucion), _key(grado), _key(seccion), _key(periodo)),
+            )
+            return cursor.rowcount
+
+
+_default_store = None
+
+
+def get_default_store():
+    """
+    Instancia compartida por todo el proceso. Ruta configurable con AULAMETRICS_HISTORIAL_DB.
+    Si el archivo no se puede abrir (PermissionError si el directorio de datos es de otro
+    usuario, sqlite3.Error) lanza la excepción y se vuelve a intentar en la próxima llamada.
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = HistoryStore(os.environ.get('AULAMETRICS_HISTORIAL_DB', DEFAULT_DB_PATH))
+    return _default_store
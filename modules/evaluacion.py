@@ -2,12 +2,21 @@ import streamlit as st
 import pandas as pd
 import io
 import analysis_core
+import analysis_cache
+import excel_export
+import student_index
+import risk_ranking
+import trend_analysis
+import history_store
+import student_reports
+import figure_cache
 import plotly.express as px
 import plotly.graph_objects as go
 import xlsxwriter
 import pedagogical_assistant
 import colorsys  # CAMBIO: Import para manejar colores
 import re
+import sqlite3
 import time
 from datetime import date
 from reportlab.lib.pagesizes import letter
@@ -42,6 +51,70 @@ def darken_color(hex_color, factor=0.7):
     new_hex = '#%02x%02x%02x' % (int(new_rgb[0]*255), int(new_rgb[1]*255), int(new_rgb[2]*255))
     return new_hex
 
+# Bordes oscurecidos de la paleta del dashboard, calculados una sola vez al cargar el módulo
+COLORES_BORDE = {color: darken_color(color) for color in list(COLORS_NIVELES.values()) + [PBI_LIGHT_BLUE]}
+
+def color_borde(color):
+    """Versión oscurecida de un color (precalculada para la paleta del dashboard)."""
+    borde = COLORES_BORDE.get(color)
+    return borde if borde is not None else darken_color(color)
+
+def construir_figura_competencia(df_plot, chart_type):
+    """Figura del panel 'Visualización Dinámica' para los conteos (Nivel, Estudiantes) de una competencia."""
+    if chart_type == 'Barras (Clásico PBI)':
+        fig = px.bar(df_plot, x='Nivel', y='Estudiantes', color='Nivel',
+                      text='Estudiantes', color_discrete_map=COLORS_NIVELES)
+        # CAMBIO: Bordes personalizados por barra (más intensos)
+        for trace in fig.data:
+            trace.marker.line = dict(color=color_borde(trace.marker.color), width=2)
+        fig.update_traces(textposition='outside')
+
+    elif chart_type == 'Anillo (Proporción)':
+        fig = px.pie(df_plot, values='Estudiantes', names='Nivel', hole=0.6,
+                      color='Nivel', color_discrete_map=COLORS_NIVELES)
+        # CAMBIO: Bordes personalizados por sector (más intensos)
+        colors = fig.data[0].marker.colors
+        dark_colors = [color_borde(c) for c in colors]
+        fig.update_traces(textinfo='percent+label', marker=dict(line=dict(color=dark_colors, width=2)))
+
+    elif chart_type == 'Mapa de Árbol (Jerarquía)':
+        fig = px.treemap(df_plot, path=['Nivel'], values='Estudiantes',
+                          color='Nivel', color_discrete_map=COLORS_NIVELES)
+        # CAMBIO: Bordes personalizados por rectángulo (más intensos)
+        colors = fig.data[0].marker.colors
+        dark_colors = [color_borde(c) for c in colors]
+        fig.update_traces(marker=dict(line=dict(color=dark_colors, width=2)))
+
+    elif chart_type == 'Radar de Competencias':
+        # CAMBIO: Relleno original, borde más intenso
+        fig = go.Figure(data=go.Scatterpolar(
+            r=df_plot['Estudiantes'],
+            theta=df_plot['Nivel'],
+            fill='toself',
+            fillcolor=PBI_LIGHT_BLUE,  # Relleno original
+            line=dict(color=color_borde(PBI_LIGHT_BLUE), width=3)  # Borde más intenso
+        ))
+
+    elif chart_type == 'Solar (Sunburst)':
+        fig = px.sunburst(df_plot, path=['Nivel'], values='Estudiantes',
+                           color='Nivel', color_discrete_map=COLORS_NIVELES)
+        # CAMBIO: Bordes personalizados por sector (más intensos)
+        colors = fig.data[0].marker.colors
+        dark_colors = [color_borde(c) for c in colors]
+        fig.update_traces(marker=dict(line=dict(color=dark_colors, width=2)))
+
+    fig.update_layout(
+        margin=dict(t=40, b=20, l=20, r=20),
+        height=450,
+        font_family="Segoe UI",
+        font=dict(size=12),
+        hovermode="closest",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
 def evaluacion_page(asistente):
     """Punto de entrada compatible con app.py"""
     inject_pbi_css()
@@ -73,6 +146,8 @@ def evaluacion_page(asistente):
 def mostrar_analisis_general(results):
     """Lógica original con diseño avanzado de Power BI"""
     st.markdown(f"<h2 class='pbi-header'>Resultados Consolidados por Área</h2>", unsafe_allow_html=True)
+    # Modelo columnar: búsquedas O(1) y tablas sin recorrer dicts anidados
+    results = analysis_core.AnalysisResult.from_dict(results)
     
     # Mensaje amigable para hojas ignoradas (opción 2)
     ignored_sheets = [name for name, data in results.items() if data.get('ignored', False)]
@@ -83,6 +158,20 @@ def mostrar_analisis_general(results):
             icon="ℹ️"
         )
     
+    # Hojas con error: el mensaje indica qué filas se revisaron para corregir el archivo
+    error_sheets = [(name, data['error']) for name, data in results.items() if 'error' in data]
+    if error_sheets:
+        st.warning(
+            "No se pudieron analizar algunas hojas:\n\n" + "\n".join(f"- **{name}**: {error}" for name, error in error_sheets),
+            icon="⚠️"
+        )
+
+    # Resumen del re-análisis incremental (solo si se reutilizaron hojas de una carga previa)
+    recalculadas = st.session_state.get('hojas_recalculadas')
+    if recalculadas is not None and len(recalculadas) < len(results):
+        detalle = ', '.join(recalculadas) if recalculadas else 'ninguna (archivo ya analizado)'
+        st.caption(f"♻️ Hojas recalculadas en esta carga: {detalle}. Las demás se reutilizaron de un análisis previo.")
+
     # Filtrar solo áreas válidas (con competencias)
     valid_areas = {name: data for name, data in results.items() if 'competencias' in data and data['competencias']}
     
@@ -112,6 +201,9 @@ def mostrar_analisis_general(results):
                 </span>
             </div>
         """, unsafe_allow_html=True)
+
+    # Libro único con todas las áreas, estudiantes y calidad de datos (solo a pedido)
+    mostrar_exportacion_consolidada(results, general_data)
     
     # Sidebar de Configuración (Power BI Slicer Style)
     with st.sidebar:
@@ -139,90 +231,54 @@ def mostrar_analisis_general(results):
             
             # --- TABLA DE DATOS (ESTILO PBI) ---
             st.markdown("<div class='pbi-card'><b>1. Matriz de Frecuencias de Evaluación</b>", unsafe_allow_html=True)
-            data = {'Competencia': [], 'AD (Est.)': [], '% AD': [], 'A (Est.)': [], '% A': [], 'B (Est.)': [], '% B': [], 'C (Est.)': [], '% C': [], 'Total': []}
-           
-            for col_original_name, comp_data in competencias.items():
-                counts = comp_data['conteo_niveles']
-                total = comp_data['total_evaluados']
-                data['Competencia'].append(comp_data['nombre_limpio'])
-                for level in ['AD', 'A', 'B', 'C']:
-                    count = counts.get(level, 0)
-                    porcentaje = (count / total * 100) if total > 0 else 0
-                    data[f'{level} (Est.)'].append(count)
-                    data[f'% {level}'].append(f"{porcentaje:.1f}%")
-                data['Total'].append(total)
-           
-            df_table = pd.DataFrame(data).set_index('Competencia')
+            df_table = results.frequency_table(sheet_name)
             st.dataframe(df_table, use_container_width=True)
            
-            excel_data = convert_df_to_excel(df_table, sheet_name, general_data)
-            st.download_button(label=f"⬇️ Exportar Datos a Excel", data=excel_data,
-                              file_name=f'Reporte_PBI_{sheet_name}.xlsx', key=f'btn_dl_{i}')
+            # El libro del área se genera solo al pedirlo (no en cada rerun ni para todas las pestañas)
+            clave = excel_export.export_key(st.session_state.get('upload_hash'), sheet_name)
+            if st.button("📄 Preparar Excel de esta área", key=f'btn_excel_area_{i}'):
+                preparar_exportacion(f'excel_area_{i}', clave,
+                                     lambda: excel_export.frequency_workbook_bytes(df_table, sheet_name, general_data))
+            excel_data = exportacion_preparada(f'excel_area_{i}', clave)
+            if excel_data is not None:
+                st.download_button(label=f"⬇️ Exportar Datos a Excel", data=excel_data,
+                                  file_name=f'Reporte_PBI_{sheet_name}.xlsx', key=f'btn_dl_{i}')
             st.markdown("</div>", unsafe_allow_html=True)
+
+            # --- CALIDAD DE DATOS (celdas vacías o con notas no reconocidas) ---
+            calidad = result.get('calidad')
+            if calidad:
+                invalidas = pd.DataFrame(calidad['celdas_invalidas'])
+                total_vacias = sum(c['vacias'] for c in calidad['por_competencia'].values())
+                with st.expander(f"🧹 Calidad de datos: {len(invalidas)} notas no reconocidas, {total_vacias} celdas vacías"):
+                    df_calidad = pd.DataFrame.from_dict(calidad['por_competencia'], orient='index')
+                    df_calidad.index = [analysis_core.clean_competencia_name(c) for c in df_calidad.index]
+                    df_calidad.columns = ['Vacías', 'No reconocidas', 'Válidas']
+                    st.dataframe(df_calidad, use_container_width=True)
+                    if not invalidas.empty:
+                        st.caption("Celdas con notas que no son AD, A, B o C (no se cuentan en la matriz):")
+                        invalidas['competencia'] = invalidas['competencia'].map(analysis_core.clean_competencia_name)
+                        invalidas.columns = ['Fila', 'Columna', 'Competencia', 'Valor']
+                        st.dataframe(invalidas, use_container_width=True, hide_index=True)
             
             # --- GRÁFICOS INTERACTIVOS ---
             st.markdown(f"<div class='pbi-card'><b>2. Visualización Dinámica: {st.session_state.chart_type}</b>", unsafe_allow_html=True)
             competencia_nombres_limpios = df_table.index.tolist()
             selected_comp = st.selectbox(f"Filtrar por Competencia específica:", options=competencia_nombres_limpios, key=f'sel_{sheet_name}_{i}')
             if selected_comp:
-                df_plot = df_table.loc[selected_comp, ['AD (Est.)', 'A (Est.)', 'B (Est.)', 'C (Est.)']].reset_index()
-                df_plot.columns = ['Nivel', 'Estudiantes']
-                df_plot['Nivel'] = df_plot['Nivel'].str.replace(' (Est.)', '', regex=False)
-               
-                if st.session_state.chart_type == 'Barras (Clásico PBI)':
-                    fig = px.bar(df_plot, x='Nivel', y='Estudiantes', color='Nivel',
-                                  text='Estudiantes', color_discrete_map=COLORS_NIVELES)
-                    # CAMBIO: Bordes personalizados por barra (más intensos)
-                    for trace in fig.data:
-                        fill_color = trace.marker.color
-                        dark_color = darken_color(fill_color)
-                        trace.marker.line = dict(color=dark_color, width=2)
-                    fig.update_traces(textposition='outside')
-                
-                elif st.session_state.chart_type == 'Anillo (Proporción)':
-                    fig = px.pie(df_plot, values='Estudiantes', names='Nivel', hole=0.6,
-                                  color='Nivel', color_discrete_map=COLORS_NIVELES)
-                    # CAMBIO: Bordes personalizados por sector (más intensos)
-                    colors = fig.data[0].marker.colors
-                    dark_colors = [darken_color(c) for c in colors]
-                    fig.update_traces(textinfo='percent+label', marker=dict(line=dict(color=dark_colors, width=2)))
-                
-                elif st.session_state.chart_type == 'Mapa de Árbol (Jerarquía)':
-                    fig = px.treemap(df_plot, path=['Nivel'], values='Estudiantes',
-                                      color='Nivel', color_discrete_map=COLORS_NIVELES)
-                    # CAMBIO: Bordes personalizados por rectángulo (más intensos)
-                    colors = fig.data[0].marker.colors
-                    dark_colors = [darken_color(c) for c in colors]
-                    fig.update_traces(marker=dict(line=dict(color=dark_colors, width=2)))
-                
-                elif st.session_state.chart_type == 'Radar de Competencias':
-                    # CAMBIO: Relleno original, borde más intenso
-                    fig = go.Figure(data=go.Scatterpolar(
-                        r=df_plot['Estudiantes'],
-                        theta=df_plot['Nivel'],
-                        fill='toself',
-                        fillcolor=PBI_LIGHT_BLUE,  # Relleno original
-                        line=dict(color=darken_color(PBI_LIGHT_BLUE), width=3)  # Borde más intenso
-                    ))
-               
-                elif st.session_state.chart_type == 'Solar (Sunburst)':
-                    fig = px.sunburst(df_plot, path=['Nivel'], values='Estudiantes',
-                                       color='Nivel', color_discrete_map=COLORS_NIVELES)
-                    # CAMBIO: Bordes personalizados por sector (más intensos)
-                    colors = fig.data[0].marker.colors
-                    dark_colors = [darken_color(c) for c in colors]
-                    fig.update_traces(marker=dict(line=dict(color=dark_colors, width=2)))
-                
-                fig.update_layout(
-                    margin=dict(t=40, b=20, l=20, r=20),
-                    height=450,
-                    font_family="Segoe UI",
-                    font=dict(size=12),
-                    hovermode="closest",
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                )
+                # La figura se arma una vez por archivo/hoja/competencia/tipo; luego sale de la caché
+                upload_hash = st.session_state.get('upload_hash')
+                clave_figura = figure_cache.figure_key(upload_hash, sheet_name, selected_comp, st.session_state.chart_type)
+                spec = figure_cache.get_figure_cache().get(clave_figura) if upload_hash else None
+                if spec is not None:
+                    fig = pio.from_json(spec)
+                else:
+                    df_plot = df_table.loc[selected_comp, ['AD (Est.)', 'A (Est.)', 'B (Est.)', 'C (Est.)']].reset_index()
+                    df_plot.columns = ['Nivel', 'Estudiantes']
+                    df_plot['Nivel'] = df_plot['Nivel'].str.replace(' (Est.)', '', regex=False)
+                    fig = construir_figura_competencia(df_plot, st.session_state.chart_type)
+                    if upload_hash:
+                        figure_cache.get_figure_cache().put(clave_figura, fig.to_json())
                 st.plotly_chart(fig, use_container_width=True, key=f"plotly_v2_{sheet_name}_{selected_comp}_{i}")
             st.markdown("</div>", unsafe_allow_html=True)
             if st.button(f"💡 Ideas de mejora IA para {sheet_name}", type="primary", use_container_width=True, key=f"btn_ai_{i}"):
@@ -230,6 +286,17 @@ def mostrar_analisis_general(results):
                     ai_text = pedagogical_assistant.generate_suggestions(results, sheet_name, selected_comp)
                     st.markdown(f"<div style='background-color: #f8f9fa; padding: 15px; border-radius: 5px; border-left: 4px solid {PBI_BLUE};'>{ai_text}</div>", unsafe_allow_html=True)
 
+def periodo_detectado(periodo):
+    """False si extraer_periodo_de_generalidades no encontró el período (en su lugar devuelve un mensaje)."""
+    texto = analysis_core.normalize_text(periodo)
+    return bool(texto) and 'no encontrad' not in texto and not texto.startswith('error al leer')
+
+def cuenta_actual():
+    """Id del usuario autenticado (Supabase), o None: es el dueño de los períodos del historial."""
+    user = st.session_state.get('user')
+    return getattr(user, 'id', None)
+
+
 def extraer_periodo_de_generalidades(excel_file):
     """
     Extrae el período de evaluación desde la hoja 'Generalidades'
@@ -244,7 +311,7 @@ def extraer_periodo_de_generalidades(excel_file):
    
     try:
         # Leemos la hoja sin encabezados para preservar todo el formato
-        df_gen = pd.read_excel(excel_file, sheet_name="Generalidades", header=None)
+        df_gen = analysis_core.read_workbook(excel_file).raw("Generalidades")
        
         # Convertimos todo a string para búsqueda segura
         df_gen = df_gen.astype(str).apply(lambda x: x.str.strip())
@@ -322,113 +389,155 @@ def mostrar_comparacion_entre_periodos():
         st.session_state['reset_timestamp'] = time.time()
     
     reset_timestamp = st.session_state['reset_timestamp']
-    uploader_key1 = f"comparacion_file1_{reset_timestamp}"
-    uploader_key2 = f"comparacion_file2_{reset_timestamp}"
+    uploader_key = f"comparacion_files_{reset_timestamp}"
     
     st.info("""
-    Carga dos archivos Excel con la misma estructura para comparar el desempeño
-    del aula entre dos momentos diferentes (bimestres, trimestres, etc.).
+    Carga dos o más archivos Excel con la misma estructura para ver la evolución
+    del aula a lo largo del año (por ejemplo, los 4 bimestres a la vez).
+    Los períodos se ordenan según su nombre (Primer, II, 3...) y, si no se reconoce, por orden de carga.
+    Cada período procesado queda guardado en el historial: después basta con subir el período nuevo.
     """)
 
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("Período 1 (anterior/base)")
-        file1 = st.file_uploader(
-            "Selecciona el archivo del primer período",
-            type=["xlsx"],
-            key=uploader_key1,  # ← Key dinámica
-            help="Archivo base para la comparación"
+    try:
+        historial = history_store.get_default_store()
+    except (OSError, sqlite3.Error) as e:
+        # Directorio de datos ajeno o sin permisos: se compara solo con los archivos subidos
+        historial = None
+        st.warning(f"El historial no está disponible ({e}). Puedes comparar los archivos que subas, "
+                   "pero los períodos no se guardarán.")
+    # Cada cuenta ve solo sus períodos: la institución es texto libre y no identifica a nadie
+    cuenta = cuenta_actual()
+    institucion = ''
+    if historial is not None:
+        institucion = st.text_input(
+            "Institución educativa",
+            key="institucion_historial",
+            help="Nombre con el que se guardan y se buscan los períodos en el historial"
         )
-       
-        if file1 is not None:
-            try:
-                excel1 = pd.ExcelFile(file1)
-                info1 = extraer_periodo_de_generalidades(excel1)
-                st.success("Archivo cargado correctamente")
-                st.markdown(f"**Período:** {info1['periodo']}")
-                st.markdown(f"**Grado:** {info1['grado']}")
-                st.markdown(f"**Sección:** {info1['seccion']}")
-                st.session_state['excel_periodo1'] = excel1
-                st.session_state['info_periodo1'] = info1
-            except Exception as e:
-                st.error(f"Error al procesar el primer archivo: {str(e)}")
-
-    with col2:
-        st.subheader("Período 2 (actual/comparación)")
-        file2 = st.file_uploader(
-            "Selecciona el archivo del segundo período",
-            type=["xlsx"],
-            key=uploader_key2,  # ← Key dinámica
-            help="Archivo que se comparará con el primero"
+
+    files = st.file_uploader(
+        "Selecciona los archivos de cada período",
+        type=["xlsx"],
+        accept_multiple_files=True,
+        key=uploader_key,  # ← Key dinámica
+        help="Un archivo SIAGIE por período, del mismo grado y sección"
+    )
+
+    periodos = []
+    for file in files or []:
+        try:
+            data = file.getvalue()
+            excel = analysis_core.read_workbook(data)
+            info = extraer_periodo_de_generalidades(excel)
+            # Grado y sección con los que analyze_data (y el historial) identifican al grupo
+            info['general'] = analysis_core.extract_general_data(excel)
+            periodos.append((file.name, data, info))
+        except Exception as e:
+            st.error(f"Error al procesar el archivo '{file.name}': {str(e)}")
+
+    # Sin cuenta o sin institución no se guarda ni se lista nada: grupos de colegios distintos se mezclarían
+    institucion = institucion.strip()
+    usar_historial = historial is not None and cuenta is not None and bool(institucion)
+    if historial is not None and not usar_historial:
+        st.caption(
+            "Inicia sesión para guardar los períodos y ver los ya guardados." if cuenta is None
+            else "Escribe el nombre de la institución para guardar los períodos y ver los ya guardados."
         )
-       
-        if file2 is not None:
-            try:
-                excel2 = pd.ExcelFile(file2)
-                info2 = extraer_periodo_de_generalidades(excel2)
-                st.success("Archivo cargado correctamente")
-                st.markdown(f"**Período:** {info2['periodo']}")
-                st.markdown(f"**Grado:** {info2['grado']}")
-                st.markdown(f"**Sección:** {info2['seccion']}")
-                st.session_state['excel_periodo2'] = excel2
-                st.session_state['info_periodo2'] = info2
-            except Exception as e:
-                st.error(f"Error al procesar el segundo archivo: {str(e)}")
-
-    # Validación de compatibilidad
-    if 'info_periodo1' in st.session_state and 'info_periodo2' in st.session_state:
-        info1 = st.session_state['info_periodo1']
-        info2 = st.session_state['info_periodo2']
-       
-        # Verificamos si grado y sección coinciden (ignoramos si no se detectaron)
-        if (info1['grado'] != "No encontrado" and info2['grado'] != "No encontrado" and
-            info1['grado'] != info2['grado']) or \
-           (info1['seccion'] != "No encontrado" and info2['seccion'] != "No encontrado" and
-            info1['seccion'] != info2['seccion']):
+
+    # Períodos ya guardados del mismo grado y sección (se leen sin volver a abrir ningún Excel)
+    grupos = historial.groups(cuenta, institucion) if usar_historial else pd.DataFrame()
+    if not grupos.empty:
+        with st.expander("🗂️ Períodos guardados en el historial", expanded=not periodos):
+            if periodos:
+                general = periodos[0][2]['general']
+                grupo = (general['grado'], general['seccion'])
+                st.markdown(f"Grado: **{grupo[0]}** | Sección: **{grupo[1]}**")
+            else:
+                grupo = st.selectbox(
+                    "Grado y sección",
+                    options=list(zip(grupos['grado'], grupos['seccion'])),
+                    format_func=lambda g: f"{g[0]} - {g[1]}",
+                    key="grupo_historial"
+                )
+            # Un período subido de nuevo reemplaza al guardado
+            subidos = {analysis_core.normalize_text(info['periodo']) for _, _, info in periodos}
+            disponibles = [p for p in historial.periods(cuenta, institucion, *grupo) if analysis_core.normalize_text(p) not in subidos]
+            seleccion = st.multiselect(
+                "Períodos a incluir en la comparación",
+                options=disponibles,
+                default=disponibles,
+                key=f"periodos_historial_{reset_timestamp}"
+            )
+            if not disponibles:
+                st.caption("No hay otros períodos guardados para este grupo.")
+        periodos += [
+            ("historial", None, {'periodo': p, 'grado': grupo[0], 'seccion': grupo[1], 'general': None})
+            for p in seleccion
+        ]
+
+    if len(periodos) >= 2:
+        # Verificamos si grado y sección coinciden en todos los archivos (ignoramos si no se detectaron)
+        grados = {info['grado'] for _, data, info in periodos if data is not None and info['grado'] != "No encontrado"}
+        secciones = {info['seccion'] for _, data, info in periodos if data is not None and info['seccion'] != "No encontrado"}
+        if len(grados) > 1 or len(secciones) > 1:
             st.error("""
             ❌ **Error de compatibilidad**
-            Los dos archivos pertenecen a **grados o secciones diferentes**.
+            Los archivos pertenecen a **grados o secciones diferentes**.
             No se puede comparar el desempeño entre grupos distintos.
             Por favor, carga archivos del **mismo grado y sección**.
             """)
-            # Limpiamos para obligar recarga
-            if 'excel_periodo2' in st.session_state:
-                del st.session_state['excel_periodo2']
-                del st.session_state['info_periodo2']
+            st.session_state.pop('tendencia_periodos', None)
             return
-       
+
+        # Etiqueta única por período (dos archivos del mismo período se distinguen por nombre)
+        etiquetas = [info['periodo'] for _, _, info in periodos]
+        etiquetas = [
+            f"{etiqueta} ({nombre})" if etiquetas.count(etiqueta) > 1 else etiqueta
+            for etiqueta, (nombre, _, _) in zip(etiquetas, periodos)
+        ]
+        orden = trend_analysis.sort_periods(list(zip(etiquetas, periodos)))
+
         st.markdown("---")
-        st.success("¡Ambos periodos están cargados y son compatibles! Listo para comparar.")
-       
+        st.success(f"¡{len(periodos)} períodos cargados y compatibles! Listo para comparar.")
         st.markdown("### Comparación entre:")
-        st.markdown(f"""
-        **🡅 {info1['periodo']}**
-        Grado: {info1['grado']} | Sección: {info1['seccion']}
-       
-        **🡇 {info2['periodo']}**
-        Grado: {info2['grado']} | Sección: {info2['seccion']}
-        """, unsafe_allow_html=True)
-       
+        st.markdown("\n".join(
+            f"{i}. **{etiqueta}** — Grado: {info['grado']} | Sección: {info['seccion']} (`{nombre}`)"
+            for i, (etiqueta, (nombre, _, info)) in enumerate(orden, start=1)
+        ))
+
         # Botón "Procesar" (con key para evitar duplicados)
-        if st.button("🔄 Procesar ambos periodos y comparar", type="primary", use_container_width=True, key="procesar_comparacion"):
-            with st.spinner("Procesando datos de ambos períodos..."):
+        if st.button("🔄 Procesar todos los períodos y comparar", type="primary", use_container_width=True, key="procesar_comparacion"):
+            with st.spinner(f"Procesando datos de {len(orden)} períodos..."):
                 try:
-                    hojas_validas = [s for s in st.session_state['excel_periodo1'].sheet_names 
-                                    if s != "Generalidades" and s != "Parametros"]
-
-                    results1 = analysis_core.analyze_data(st.session_state['excel_periodo1'], hojas_validas)
-                    results2 = analysis_core.analyze_data(st.session_state['excel_periodo2'], hojas_validas)
-
-                    st.session_state['results_periodo1'] = results1
-                    st.session_state['results_periodo2'] = results2
-
+                    # Los archivos se analizan en paralelo (los ya subidos antes salen de la caché)
+                    subidos = [i for i, (_, (_, data, _)) in enumerate(orden) if data is not None]
+                    analizados = analysis_cache.analyze_uploads(
+                        [orden[i][1][1] for i in subidos], analysis_cache.get_default_cache()
+                    )
+                    resultados = dict(zip(subidos, analizados))
+                    for i, resultado in resultados.items():
+                        nombre, _, info = orden[i][1]
+                        if not usar_historial:
+                            continue
+                        if not periodo_detectado(info['periodo']):
+                            # Sin período, el siguiente archivo sin período lo reemplazaría en el historial
+                            st.warning(f"'{nombre}' no se guardó en el historial: no se encontró su período de evaluación.")
+                            continue
+                        historial.save_results(cuenta, institucion, info['periodo'], resultado, archivo=nombre)
+                    # Los períodos del historial se leen de la base, sin abrir ningún Excel
+                    for i, (_, (_, data, info)) in enumerate(orden):
+                        if data is None:
+                            resultados[i] = historial.load_results(cuenta, institucion, info['grado'], info['seccion'], info['periodo'])
+                    st.session_state['tendencia_periodos'] = trend_analysis.PeriodTrend.build(
+                        [(etiqueta, resultados[i]) for i, (etiqueta, _) in enumerate(orden)]
+                    )
                     st.success("¡Datos procesados correctamente!")
                 except Exception as e:
                     st.error(f"Error al procesar los datos: {str(e)}")
                     return
 
         # Botón "Nuevo análisis" - aparece SOLO después de procesar
-        if 'results_periodo1' in st.session_state and 'results_periodo2' in st.session_state:
+        if 'tendencia_periodos' in st.session_state:
             st.markdown("---")
             if st.button("Nuevo análisis", type="primary", use_container_width=True, help="Inicia una nueva comparación desde cero"):
                 st.session_state["confirm_reset"] = True  # Activar confirmación
@@ -441,11 +550,8 @@ def mostrar_comparacion_entre_periodos():
                     if st.button("Sí, confirmar y limpiar", type="primary", use_container_width=True):
                         # Limpieza completa: borramos TODAS las claves relacionadas
                         keys_to_clear = [
-                            'excel_periodo1', 'excel_periodo2',
-                            'info_periodo1', 'info_periodo2',
-                            'results_periodo1', 'results_periodo2',
-                            'comparacion_file1', 'comparacion_file2',  # Claves de los uploaders
-                            'todas_competencias', 'competencias_comparar', 'tipo_grafico_comparacion'  # Selecciones
+                            'tendencia_periodos', 'grupo_historial',
+                            'area_comparar', 'todas_competencias', 'competencias_comparar', 'tipo_grafico_comparacion'  # Selecciones
                         ]
                         for key in keys_to_clear:
                             if key in st.session_state:
@@ -453,7 +559,7 @@ def mostrar_comparacion_entre_periodos():
                         
                         # Limpieza de caché para reinicio total
                         st.cache_data.clear()
-                        st.session_state['reset_timestamp'] = time.time()  # Nuevo timestamp → uploaders se recrean
+                        st.session_state['reset_timestamp'] = time.time()  # Nuevo timestamp → uploader se recrea
                         
                         st.session_state["confirm_reset"] = False
                         st.success("¡Comparación reiniciada completamente! Listo para cargar nuevos archivos.")
@@ -463,30 +569,31 @@ def mostrar_comparacion_entre_periodos():
                         st.session_state["confirm_reset"] = False
                         st.info("Acción cancelada.")
        
-    elif 'excel_periodo1' in st.session_state or 'excel_periodo2' in st.session_state:
-        st.warning("Carga el segundo archivo para comenzar la comparación.")
+    elif periodos:
+        st.session_state.pop('tendencia_periodos', None)
+        st.warning("Carga (o elige del historial) al menos un período más para comenzar la comparación.")
     else:
-        st.info("Carga ambos archivos para iniciar la comparación entre períodos.")
+        st.session_state.pop('tendencia_periodos', None)
+        st.info("Carga los archivos de dos o más períodos para iniciar la comparación.")
    
     # ------------------------------------------------
     # Selección de competencias a comparar y visualizaciones
     # ------------------------------------------------
-    if 'results_periodo1' in st.session_state and 'results_periodo2' in st.session_state:
-        results1 = st.session_state['results_periodo1']
-        results2 = st.session_state['results_periodo2']
+    if 'tendencia_periodos' in st.session_state:
+        tendencia = st.session_state['tendencia_periodos']
+        periodos_orden = tendencia.periods
         st.subheader("Seleccione qué comparar")
-        # Obtenemos las competencias disponibles desde la primera hoja válida
-        competencias_disponibles = []
-        if results1:
-            primera_hoja = next(iter(results1))
-            competencias_disponibles = list(results1[primera_hoja].get('competencias', {}).keys())
+        area = st.selectbox("Área", options=tendencia.area_names(), key="area_comparar")
+        # Competencias del área alineadas entre todos los períodos (índice precalculado)
+        competencias_disponibles = tendencia.area_competencies(area) if area else []
         todas_competencias = st.checkbox("Comparar TODAS las competencias", value=True, key="todas_competencias")
         competencias_sel = []
         if not todas_competencias:
             competencias_sel = st.multiselect(
                 "Seleccione las competencias específicas a comparar",
                 options=competencias_disponibles,
-                default=competencias_disponibles[:3] if competencias_disponibles else [],
+                default=competencias_disponibles[:3],
+                format_func=lambda k: tendencia.competencies[k],
                 key="competencias_comparar"
             )
         competencias_a_mostrar = competencias_disponibles if todas_competencias else competencias_sel
@@ -504,123 +611,86 @@ def mostrar_comparacion_entre_periodos():
                 horizontal=True,
                 key="tipo_grafico_comparacion"
             )
+            niveles = analysis_core.NIVELES_LOGRO
+            ultimo, anterior = periodos_orden[-1], periodos_orden[-2]
 
-            for competencia_original in competencias_a_mostrar:
-                nombre_limpio = "Competencia desconocida"
-                for hoja in results1:
-                    comp_data = results1[hoja].get('competencias', {}).get(competencia_original)
-                    if comp_data and 'nombre_limpio' in comp_data:
-                        nombre_limpio = comp_data['nombre_limpio']
-                        break
+            for k in competencias_a_mostrar:
+                nombre_limpio = tendencia.competencies[k]
                 with st.expander(f"Competencia: {nombre_limpio}", expanded=True):
-                    # Buscamos la competencia en alguna de las hojas
-                    data1 = None
-                    for hoja in results1:
-                        comp_data = results1[hoja].get('competencias', {}).get(competencia_original)
-                        if comp_data:
-                            data1 = comp_data
-                            break
-                    data2 = None
-                    for hoja in results2:
-                        comp_data = results2[hoja].get('competencias', {}).get(competencia_original)
-                        if comp_data:
-                            data2 = comp_data
-                            break
-                    if not data1 or not data2:
-                        st.warning("No se encontraron datos completos para esta competencia en uno de los períodos.")
-                        continue
-                    # Conteos y porcentajes por nivel
-                    conteos1 = data1.get('conteo_niveles', {})
-                    total1 = data1.get('total_evaluados', 1)
-                    pct1 = {k: (v / total1 * 100) if total1 > 0 else 0 for k, v in conteos1.items()}
-                    conteos2 = data2.get('conteo_niveles', {})
-                    total2 = data2.get('total_evaluados', 1)
-                    pct2 = {k: (v / total2 * 100) if total2 > 0 else 0 for k, v in conteos2.items()}
-                    niveles = ['AD', 'A', 'B', 'C']
-                    valores1 = [conteos1.get(n, 0) for n in niveles]
-                    valores2 = [conteos2.get(n, 0) for n in niveles]
-                    # Deltas por nivel (P2 - P1)
-                    deltas = {n: pct2.get(n, 0) - pct1.get(n, 0) for n in niveles}
-                    # Colores condicionales por nivel (lógica pedagógica)
-                    color_rules = {
-                        'AD': lambda d: "green" if d > 0 else "red" if d < 0 else "gray",
-                        'A': lambda d: "green" if d > 0 else "red" if d < 0 else "gray",
-                        'B': lambda d: "green" if d > 0 else "orange" if d < 0 else "gray", # ↓ en B puede ser bueno (suben a A)
-                        'C': lambda d: "green" if d < 0 else "red" if d > 0 else "gray" # ↓ en C SIEMPRE positivo
-                    }
-                    # Métricas separadas por nivel (con flecha y color)
-                    cols = st.columns(4)
-                    for i, nivel in enumerate(niveles):
-                        delta = deltas[nivel]
-                        color = color_rules[nivel](delta)
-                        flecha = "↑" if delta > 0 else "↓" if delta < 0 else "→"
-                        with cols[i]:
-                            st.metric(
-                                label=f"% {nivel}",
-                                value=f"{pct2.get(nivel, 0):.1f}%",
-                                delta=f"{delta:+.1f}%",
-                                delta_color="normal" # Usamos color manual abajo
-                            )
-                            st.markdown(f"""
-                            <div style="font-size: 1.5rem; color: {color}; text-align: center; margin-top: -10px;">
-                                {flecha}
-                            </div>
-                            """, unsafe_allow_html=True)
-                    # Tabla comparativa mejorada con deltas y colores
+                    faltantes = [p for p, presente in zip(periodos_orden, tendencia.present[:, k].tolist()) if not presente]
+                    if faltantes:
+                        st.warning(f"No se encontraron datos de esta competencia en: {', '.join(faltantes)}.")
+                    # Las métricas último vs anterior solo si la competencia está en ambos;
+                    # la tabla y el gráfico de tendencia se muestran siempre
+                    if not tendencia.present[-2:, k].all():
+                        st.caption(f"Sin comparación {ultimo} frente a {anterior}: la competencia no está en ambos períodos.")
+                    else:
+                        # Porcentajes y deltas ya calculados para todos los períodos (último vs anterior)
+                        pct_ultimo = dict(zip(niveles, tendencia.pct[-1, k].tolist()))
+                        deltas = dict(zip(niveles, tendencia.delta_prev[-1, k].tolist()))
+                        # Colores condicionales por nivel (lógica pedagógica)
+                        color_rules = {
+                            'AD': lambda d: "green" if d > 0 else "red" if d < 0 else "gray",
+                            'A': lambda d: "green" if d > 0 else "red" if d < 0 else "gray",
+                            'B': lambda d: "green" if d > 0 else "orange" if d < 0 else "gray", # ↓ en B puede ser bueno (suben a A)
+                            'C': lambda d: "green" if d < 0 else "red" if d > 0 else "gray" # ↓ en C SIEMPRE positivo
+                        }
+                        # Métricas separadas por nivel (con flecha y color)
+                        st.caption(f"{ultimo} frente a {anterior}")
+                        cols = st.columns(4)
+                        for i, nivel in enumerate(niveles):
+                            delta = deltas[nivel]
+                            color = color_rules[nivel](delta)
+                            flecha = "↑" if delta > 0 else "↓" if delta < 0 else "→"
+                            with cols[i]:
+                                st.metric(
+                                    label=f"% {nivel}",
+                                    value=f"{pct_ultimo[nivel]:.1f}%",
+                                    delta=f"{delta:+.1f}%",
+                                    delta_color="normal" # Usamos color manual abajo
+                                )
+                                st.markdown(f"""
+                                <div style="font-size: 1.5rem; color: {color}; text-align: center; margin-top: -10px;">
+                                    {flecha}
+                                </div>
+                                """, unsafe_allow_html=True)
+                    # Tabla comparativa con todos los períodos y deltas
                     st.markdown("**Tabla comparativa detallada**")
-                    tabla = pd.DataFrame({
-                        'Nivel': niveles,
-                        f'Conteos {info1["periodo"]}': valores1,
-                        f'% {info1["periodo"]}': [f"{pct1.get(n, 0):.1f}%" for n in niveles],
-                        f'Conteos {info2["periodo"]}': valores2,
-                        f'% {info2["periodo"]}': [f"{pct2.get(n, 0):.1f}%" for n in niveles],
-                        'Δ %': [f"{d:+.1f}%" for d in deltas.values()],
-                        'Tendencia': [flecha + (" mejora" if d > 0 else " ↓ mejora" if d < 0 and n == 'C' else " ↓ retroceso" if d < 0 else " estable")
-                                      for d, n in zip(deltas.values(), niveles)]
-                    })
-                    # Estilo condicional en la tabla (verde/rojo/naranja)
+                    tabla = tendencia.comparison_table(k)
+                    # ↓ en C es mejora; en los demás niveles, ↑ es mejora
+                    tabla['Tendencia'] = [
+                        "—" if pd.isna(d) else "→ estable" if d == 0 else ("↑" if d > 0 else "↓") + (" mejora" if (d < 0 if n == 'C' else d > 0) else " retroceso")
+                        for d, n in zip(tabla['Δ %'].tolist(), niveles)
+                    ]
+                    columnas_delta = [c for c in tabla.columns if c.startswith('Δ')]
+                    # Estilo condicional en la tabla (verde/rojo)
                     def style_delta(val):
-                        color = 'green' if float(val.strip('%+')) > 0 else 'red' if float(val.strip('%+')) < 0 else 'gray'
+                        color = 'green' if val > 0 else 'red' if val < 0 else 'gray'
                         return f'color: {color}; font-weight: bold'
                     st.dataframe(
-                        tabla.style.map(style_delta, subset=['Δ %']),
+                        tabla.style.map(style_delta, subset=columnas_delta)
+                             .format("{:.1f}%", subset=[c for c in tabla.columns if c.startswith('%')], na_rep="—")
+                             .format("{:+.1f}%", subset=columnas_delta, na_rep="—"),
                         use_container_width=True
                     )
-                    # Preparación de datos comunes para los gráficos
-                    niveles = ['AD', 'A', 'B', 'C']
-                    valores1 = [conteos1.get(n, 0) for n in niveles]
-                    valores2 = [conteos2.get(n, 0) for n in niveles]
-                    df_comp = pd.DataFrame({
-                        'Nivel': niveles * 2,
-                        'Estudiantes': valores1 + valores2,
-                        'Período': [info1['periodo']] * 4 + [info2['periodo']] * 4
-                    })
                     if tipo_grafico == "Barras agrupadas (AD/A/B/C por período)":
+                        df_comp = tendencia.levels_frame(k)
                         fig = px.bar(df_comp, x='Nivel', y='Estudiantes', color='Período',
                                      barmode='group', text='Estudiantes',
-                                     color_discrete_sequence=[PBI_LIGHT_BLUE, "#FF6B6B"])
+                                     color_discrete_sequence=[PBI_LIGHT_BLUE, "#FF6B6B", "#8E44AD", "#00A3A3"])
                         fig.update_traces(textposition='outside')
                         st.plotly_chart(fig, use_container_width=True)
                         st.session_state.last_fig = fig
                     elif tipo_grafico == "Barras apiladas (distribución %)":
-                        df_pct = pd.DataFrame({
-                            'Nivel': niveles,
-                            info1['periodo']: [pct1.get(n, 0) for n in niveles],
-                            info2['periodo']: [pct2.get(n, 0) for n in niveles]
-                        }).set_index('Nivel')
+                        df_pct = tendencia.pct_frame(k)
                         fig = px.bar(df_pct, barmode='stack', text_auto='.1f',
                                      color_discrete_sequence=['#008450','#32CD32','#FFB900','#E81123'])
                         st.plotly_chart(fig, use_container_width=True)
                         st.session_state.last_fig = fig
                     elif tipo_grafico == "Líneas - Evolución % Destacado + Logrado (AD+A)":
-                        pct_ad_a_1 = pct1.get('AD', 0) + pct1.get('A', 0)
-                        pct_ad_a_2 = pct2.get('AD', 0) + pct2.get('A', 0)
-                        df_line = pd.DataFrame({
-                            'Período': [info1['periodo'], info2['periodo']],
-                            '% AD + A': [pct_ad_a_1, pct_ad_a_2]
-                        })
-                        min_pct = min(pct_ad_a_1, pct_ad_a_2) - 5
-                        max_pct = max(pct_ad_a_1, pct_ad_a_2) + 5
+                        df_line = tendencia.ad_a_frame(k).dropna()
+                        min_pct = df_line['% AD + A'].min() - 5
+                        max_pct = df_line['% AD + A'].max() + 5
                         range_y = [max(0, min_pct), min(100, max_pct)]
                         fig = px.line(df_line, x='Período', y='% AD + A', markers=True,
                                       range_y=range_y, text='% AD + A')
@@ -653,19 +723,11 @@ def mostrar_comparacion_entre_periodos():
                                 'text_wrap': True
                             })
 
-                            # Colores para Primer Bimestre (Tercer Bimestre en tu ejemplo)
-                            primer_format = workbook.add_format({
-                                'bg_color': '#E6F3FF',  # Azul claro
-                                'border': 1,
-                                'align': 'center'
-                            })
-
-                            # Colores para Segundo Bimestre (Cuarto Bimestre)
-                            segundo_format = workbook.add_format({
-                                'bg_color': '#FFE6E6',  # Rojo claro
-                                'border': 1,
-                                'align': 'center'
-                            })
+                            # Colores alternados por período (azul claro / rojo claro)
+                            formatos_periodo = [
+                                workbook.add_format({'bg_color': '#E6F3FF', 'border': 1, 'align': 'center'}),
+                                workbook.add_format({'bg_color': '#FFE6E6', 'border': 1, 'align': 'center'}),
+                            ]
 
                             # Ancho automático de columnas
                             for idx, col in enumerate(tabla_con_datos.columns):
@@ -676,25 +738,25 @@ def mostrar_comparacion_entre_periodos():
                             for col_num, value in enumerate(tabla_con_datos.columns.values):
                                 worksheet.write(0, col_num, value, header_format)
 
-                            # Colorear columnas correctas
-                            worksheet.set_column('B:B', None, primer_format)  # Conteos Primer
-                            worksheet.set_column('C:C', None, primer_format)  # % Primer
-                            worksheet.set_column('D:D', None, segundo_format) # Conteos Segundo
-                            worksheet.set_column('E:E', None, segundo_format) # % Segundo
-
-                            # Formato condicional en Δ % (columna F)
-                            worksheet.conditional_format('F2:F5', {
-                                'type': 'cell',
-                                'criteria': '>',
-                                'value': 0,
-                                'format': workbook.add_format({'bg_color': '#C6EFCE'})
-                            })
-                            worksheet.conditional_format('F2:F5', {
-                                'type': 'cell',
-                                'criteria': '<',
-                                'value': 0,
-                                'format': workbook.add_format({'bg_color': '#FFC7CE'})
-                            })
+                            # Colorear las dos columnas (conteos y %) de cada período
+                            for p in range(len(periodos_orden)):
+                                worksheet.set_column(1 + 2 * p, 2 + 2 * p, None, formatos_periodo[p % 2])
+
+                            # Formato condicional en las columnas Δ %
+                            for col_name in columnas_delta:
+                                col_idx = tabla_con_datos.columns.get_loc(col_name)
+                                worksheet.conditional_format(1, col_idx, 4, col_idx, {
+                                    'type': 'cell',
+                                    'criteria': '>',
+                                    'value': 0,
+                                    'format': workbook.add_format({'bg_color': '#C6EFCE'})
+                                })
+                                worksheet.conditional_format(1, col_idx, 4, col_idx, {
+                                    'type': 'cell',
+                                    'criteria': '<',
+                                    'value': 0,
+                                    'format': workbook.add_format({'bg_color': '#FFC7CE'})
+                                })
 
                             # Limpiar filas vacías (sin bordes desde fila 6)
                             empty_format = workbook.add_format({'border': 0})
@@ -707,9 +769,9 @@ def mostrar_comparacion_entre_periodos():
                             data=excel_data,
                             file_name=f"Tabla_Comparativa_{nombre_limpio.replace(' ', '_')}.xlsx",
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            key=f"excel_{competencia_original}_{int(time.time())}"
+                            key=f"excel_{area}_{k}_{int(time.time())}"
                         )
-            
+
 def mostrar_analisis_por_estudiante(df_first, df_config, info_areas):
     """Perfil individual con tarjetas de KPI estilo Power BI"""
     st.markdown(f"<h2 class='pbi-header'>Perfil Integral del Estudiante</h2>", unsafe_allow_html=True)
@@ -718,30 +780,35 @@ def mostrar_analisis_por_estudiante(df_first, df_config, info_areas):
     if not all_dfs:
         st.warning("⚠️ No se detectaron datos en la sesión actual.")
         return
-    posibles = ["Estudiante", "ESTUDIANTE", "APELLIDOS Y NOMBRES", "Apellidos y Nombres", "Nombres"]
-    first_sheet = next(iter(all_dfs))
-    df_base = all_dfs[first_sheet]
-    col_nombre = next((c for c in df_base.columns if str(c).strip() in posibles), None)
-    if not col_nombre:
+    # Índice construido al subir el archivo; consultar un estudiante es O(1)
+    indice = st.session_state.get('indice_estudiantes')
+    if indice is None:
+        indice = student_index.StudentIndex.build(all_dfs, info_areas)
+        st.session_state.indice_estudiantes = indice
+    if indice.name_column is None:
         st.error("Error estructural: No se localizó la columna de identidad del estudiante.")
         return
+    mostrar_ranking_riesgo(indice, info_areas)
+    mostrar_informes_masivos(indice)
+
+    # Búsqueda en el servidor: al navegador solo llegan las primeras coincidencias
+    consulta = st.text_input("🔎 Buscar estudiante (apellidos o nombres, sin importar tildes):",
+                             key="pbi_student_search", placeholder="Ej.: quispe mar")
+    coincidencias = indice.search.query(consulta)
+    if consulta and not coincidencias:
+        st.info("No se encontraron estudiantes con ese nombre.")
     estudiante_sel = st.selectbox("👤 Seleccionar Estudiante para análisis focalizado:",
-                                options=df_base[col_nombre].dropna().unique(),
+                                options=coincidencias,
                                 index=None, key="pbi_student_selector")
+    if not consulta and len(indice) > len(coincidencias):
+        st.caption(f"Mostrando {len(coincidencias)} de {len(indice)} estudiantes. Escribe para filtrar.")
+    elif len(coincidencias) == student_index.BUSQUEDA_TOP_K:
+        st.caption(f"Se muestran las {student_index.BUSQUEDA_TOP_K} mejores coincidencias; escribe más letras para afinar.")
     if estudiante_sel:
         st.markdown(f"<div class='pbi-card'><h3 style='color:{PBI_BLUE}; margin-top:0;'>Estudiante: {estudiante_sel}</h3>", unsafe_allow_html=True)
        
-        total_conteo = {'AD': 0, 'A': 0, 'B': 0, 'C': 0}
-        desglose_areas = {'AD': [], 'A': [], 'B': [], 'C': []}
-       
-        for area_name, df_area in all_dfs.items():
-            fila = df_area[df_area[col_nombre] == estudiante_sel]
-            if not fila.empty:
-                vals = [str(v).upper().strip() for v in fila.iloc[0].values]
-                for n in total_conteo.keys():
-                    count = vals.count(n)
-                    total_conteo[n] += count
-                    if count > 0: desglose_areas[n].append(f"{area_name} ({count})")
+        total_conteo = indice.level_counts(estudiante_sel)
+        desglose_areas = indice.area_breakdown(estudiante_sel)
         cols = st.columns(4)
         for idx, (n, label) in enumerate([('AD', 'Destacado'), ('A', 'Logrado'), ('B', 'Proceso'), ('C', 'Inicio')]):
             with cols[idx]:
@@ -766,88 +833,167 @@ def mostrar_analisis_por_estudiante(df_first, df_config, info_areas):
                         color=list(total_conteo.keys()), color_discrete_map=COLORS_NIVELES)
             # CAMBIO: Bordes personalizados por sector (más intensos)
             colors = fig.data[0].marker.colors
-            dark_colors = [darken_color(c) for c in colors]
+            dark_colors = [color_borde(c) for c in colors]
             fig.update_traces(marker=dict(line=dict(color=dark_colors, width=2)))
             fig.update_layout(showlegend=True, height=280, margin=dict(t=0, b=0, l=0, r=0),
                             legend=dict(orientation="v", x=1))
             st.plotly_chart(fig, use_container_width=True, key=f"pie_ind_pbi_{estudiante_sel}")
        
-        doc_buffer = pedagogical_assistant.generar_reporte_estudiante(estudiante_sel, total_conteo, desglose_areas)
-        st.download_button(label="📥 Descargar Informe Individual (Word)", data=doc_buffer,
-                          file_name=f"Informe_{estudiante_sel}.docx", use_container_width=True, key=f"dl_word_{estudiante_sel}")
+        # El informe Word se arma solo a pedido y queda memoizado por estudiante y conteos
+        clave_informe = (
+            estudiante_sel,
+            tuple(total_conteo.items()),
+            tuple((n, tuple(areas)) for n, areas in desglose_areas.items()),
+        )
+        if st.button("📄 Preparar Informe Individual (Word)", use_container_width=True, key=f"btn_word_{estudiante_sel}"):
+            with st.spinner("Generando informe..."):
+                st.session_state.informe_word = (clave_informe, informe_estudiante_bytes(*clave_informe))
+        preparado = st.session_state.get('informe_word')
+        if preparado and preparado[0] == clave_informe:
+            st.download_button(label="📥 Descargar Informe Individual (Word)", data=preparado[1],
+                              file_name=f"Informe_{estudiante_sel}.docx",
+                              mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                              use_container_width=True, key=f"dl_word_{estudiante_sel}")
         st.markdown("</div>", unsafe_allow_html=True)
 
-@st.cache_data
+def preparar_exportacion(nombre, clave, generar):
+    """
+    Genera una exportación, o la toma de la caché compartida si otra sesión ya la generó
+    para el mismo archivo. La sesión guarda solo la clave: los bytes quedan una sola vez
+    en la caché. Un archivo más grande que toda la caché se queda en la sesión.
+    """
+    if clave[0] is None:
+        # Sin hash del archivo la clave no identifica los datos: no se comparte entre sesiones
+        st.session_state[nombre] = (clave, generar())
+        return
+    cache = excel_export.get_export_cache()
+    datos = cache.get_or_build(clave, generar)
+    st.session_state[nombre] = (clave, None if clave in cache else datos)
+
+def exportacion_preparada(nombre, clave):
+    """Bytes de la exportación preparada en esta sesión para `clave`, o None (otra clave o ya desalojada)."""
+    preparado = st.session_state.get(nombre)
+    if not preparado or preparado[0] != clave:
+        return None
+    return preparado[1] if preparado[1] is not None else excel_export.get_export_cache().get(clave)
+
+def mostrar_exportacion_consolidada(results, general_data):
+    """Botón para armar el Excel consolidado; el libro se genera solo al pedirlo."""
+    clave = excel_export.export_key(st.session_state.get('upload_hash'), 'consolidado')
+    c1, c2 = st.columns(2)
+    with c1:
+        if st.button("📊 Preparar Excel consolidado (todas las áreas)", use_container_width=True, key="btn_excel_consolidado"):
+            with st.spinner("Generando libro consolidado..."):
+                def generar():
+                    destino = io.BytesIO()
+                    excel_export.write_consolidated_workbook(
+                        destino, results, general_data, st.session_state.get('indice_estudiantes'))
+                    return destino.getvalue()
+                # Otro docente que ya lo generó para el mismo archivo lo deja listo en la caché
+                preparar_exportacion('excel_consolidado', clave, generar)
+    datos = exportacion_preparada('excel_consolidado', clave)
+    if datos is not None:
+        with c2:
+            st.download_button("⬇️ Descargar Excel consolidado", data=datos,
+                               file_name="Reporte_PBI_Consolidado.xlsx",
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                               use_container_width=True, key="dl_excel_consolidado")
+
+def mostrar_informes_masivos(indice):
+    """ZIP con el informe Word de cada estudiante, generado en paralelo desde el índice."""
+    with st.expander("📦 Informes de todos los estudiantes (ZIP)"):
+        st.caption(f"Genera un informe Word por cada uno de los {len(indice)} estudiantes en un solo archivo ZIP.")
+        clave = excel_export.export_key(st.session_state.get('upload_hash'), 'informes_zip')
+        if st.button("📄 Generar informes", key="btn_informes_zip", disabled=not len(indice)):
+            barra = st.progress(0.0, text="Generando informes...")
+
+            def avance(listos, total, nombre):
+                barra.progress(listos / total, text=f"Informe {listos} de {total}: {nombre}")
+
+            def generar():
+                destino = io.BytesIO()
+                student_reports.write_reports_zip(student_reports.report_items(indice), destino, progress=avance)
+                return destino.getvalue()
+
+            preparar_exportacion('informes_zip', clave, generar)
+            barra.empty()
+        datos = exportacion_preparada('informes_zip', clave)
+        if datos is not None:
+            st.download_button("⬇️ Descargar informes (ZIP)", data=datos,
+                               file_name="Informes_estudiantes.zip", mime="application/zip",
+                               key="dl_informes_zip")
+
+def mostrar_ranking_riesgo(indice, info_areas):
+    """Estudiantes con más notas B/C en todas las áreas (ranking vectorizado sobre el índice)."""
+    # Contexto del grupo para el título del Excel (igual que en el análisis general)
+    first_sheet_key = next(iter(info_areas), None) if info_areas else None
+    general_data = info_areas[first_sheet_key].get('generalidades', {}) if first_sheet_key else {}
+    with st.expander("🚨 Estudiantes en riesgo (todas las áreas)"):
+        c1, c2, c3, c4 = st.columns(4)
+        peso_b = c1.number_input("Puntos por B", min_value=0.0, value=float(risk_ranking.PESOS_RIESGO['B']), step=0.5, key="riesgo_peso_b")
+        peso_c = c2.number_input("Puntos por C", min_value=0.0, value=float(risk_ranking.PESOS_RIESGO['C']), step=0.5, key="riesgo_peso_c")
+        top = c3.number_input("Mostrar", min_value=5, max_value=max(5, len(indice)), value=min(20, max(5, len(indice))), step=5, key="riesgo_top")
+        normalizar = c4.checkbox("Por nota registrada", value=False, key="riesgo_normalizar",
+                                 help="Divide el puntaje entre las notas registradas del estudiante")
+        pesos = {'B': peso_b, 'C': peso_c}
+
+        df_riesgo = risk_ranking.rank_students(indice, pesos=pesos, normalizar=normalizar, top=int(top))
+        if df_riesgo.empty:
+            st.success("Ningún estudiante tiene notas B o C con el criterio actual.")
+            return
+        st.dataframe(df_riesgo, use_container_width=True, hide_index=True)
+
+        # El Excel se arma solo a pedido y queda ligado al archivo y al criterio usados
+        criterio = (st.session_state.get('upload_hash'), peso_b, peso_c, normalizar)
+        if st.button("📊 Preparar Excel del ranking", key="btn_riesgo_excel"):
+            # Para el archivo se usa el ranking completo, no solo los primeros
+            df_completo = risk_ranking.rank_students(indice, pesos=pesos, normalizar=normalizar)
+            st.session_state.riesgo_excel = (criterio, excel_export.risk_ranking_workbook_bytes(
+                df_completo, general_data, pesos, normalizar))
+        preparado = st.session_state.get('riesgo_excel')
+        if preparado and preparado[0] == criterio:
+            st.download_button("⬇️ Descargar ranking (Excel)", data=preparado[1],
+                               file_name="Estudiantes_en_riesgo.xlsx", key="dl_riesgo_excel")
+
 def convert_df_to_excel(df, area_name, general_info):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        # Escribir la tabla empezando en fila 3 (deja espacio arriba para título)
-        df.to_excel(writer, sheet_name='Frecuencias', index=True, startrow=2, startcol=0)
-        
-        workbook = writer.book
-        worksheet = writer.sheets['Frecuencias']
-        
-        # Formatos para encabezados por nivel
-        header_formats = {
-            'AD': workbook.add_format({'bg_color': '#008450', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'}),
-            'A': workbook.add_format({'bg_color': '#32CD32', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'}),
-            'B': workbook.add_format({'bg_color': '#FFB900', 'font_color': 'black', 'bold': True, 'border': 1, 'align': 'center'}),
-            'C': workbook.add_format({'bg_color': '#E81123', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'}),
-            'default': workbook.add_format({'bg_color': '#113770', 'font_color': 'white', 'bold': True, 'border': 1, 'align': 'center'})
-        }
-        
-        # Formato para celdas de datos
-        fmt_data = workbook.add_format({'border': 1, 'align': 'center', 'num_format': '0'})
-        fmt_percent = workbook.add_format({'border': 1, 'align': 'center', 'num_format': '0.0%'})
-        fmt_total = workbook.add_format({'bg_color': '#E2E8F0', 'bold': True, 'border': 1, 'align': 'center'})
-        
-        # Ajustar anchos de columnas
-        worksheet.set_column('A:A', 50, fmt_data)
-        worksheet.set_column('B:J', 12, fmt_data)
-        
-        # Aplicar formato a encabezados (según nivel)
-        header_row = 2  # Fila de encabezados (startrow=2)
-        for col_num, col_name in enumerate(df.columns):
-            level = col_name.split(' ')[0]
-            fmt = header_formats.get(level, header_formats['default'])
-            worksheet.write(header_row, col_num + 1, col_name, fmt)  # +1 por índice
-        
-        # Título fusionado arriba (sin afectar la tabla)
-        title_format = workbook.add_format({
-            'bold': True, 'font_size': 12, 'align': 'center', 'bg_color': '#E2E8F0', 'border': 1
-        })
-        title_text = f"Área: {area_name} - Nivel: {general_info.get('nivel', 'Descon.')} | Grado: {general_info.get('grado', 'Descon.')} | Sección: {general_info.get('seccion', 'Descon.')}"
-        worksheet.merge_range('A1:J1', title_text, title_format)
-        
-        # Limpiar filas vacías (sin bordes)
-        empty_format = workbook.add_format({'border': 0})
-        for row in range(len(df) + 3, 50):  # Limpiar desde la fila siguiente a la tabla
-            worksheet.set_row(row, None, empty_format)
-        
-        # Congelar paneles (encabezados fijos)
-        worksheet.freeze_panes(3, 1)  # Congelar fila 3 (encabezados) y columna A
-    
-    output.seek(0)
-    return output.getvalue()
+    """
+    Excel de la Matriz de Frecuencias de un área. Se busca por archivo + hoja + versión
+    del exportador en la caché compartida entre sesiones (sin hashear la tabla en cada rerun).
+    """
+    upload_hash = st.session_state.get('upload_hash')
+    if upload_hash is None:
+        return excel_export.frequency_workbook_bytes(df, area_name, general_info)
+    return excel_export.get_export_cache().get_or_build(
+        excel_export.export_key(upload_hash, area_name),
+        lambda: excel_export.frequency_workbook_bytes(df, area_name, general_info)
+    )
+
+# Informes Word en memoria (los menos usados salen primero al superar el límite)
+INFORMES_CACHE_MAX = 256
+
+@st.cache_data(max_entries=INFORMES_CACHE_MAX, show_spinner=False)
+def informe_estudiante_bytes(nombre_estudiante, conteo, desglose):
+    """DOCX del informe individual; conteo y desglose son tuplas (hashables) de sus dicts."""
+    buffer = pedagogical_assistant.generar_reporte_estudiante(
+        nombre_estudiante, dict(conteo), {n: list(areas) for n, areas in desglose}
+    )
+    return buffer.getvalue()
     
 def configurar_uploader():
     st.markdown("<div class='pbi-card' style='text-align: center; border: 2px dashed #ccc;'>", unsafe_allow_html=True)
     uploaded_file = st.file_uploader("Arrastra o selecciona el archivo Excel de SIAGIE", type=["xlsx"])
     if uploaded_file:
         with st.spinner('Sincronizando datos...'):
-            excel_file = pd.ExcelFile(uploaded_file)
-            hojas_validas = [s for s in excel_file.sheet_names if s not in ["Generalidades", "Parametros"]]
-            st.session_state.all_dataframes = {sheet: excel_file.parse(sheet) for sheet in hojas_validas}
-            st.session_state.info_areas = analysis_core.analyze_data(excel_file, hojas_validas)
+            data = uploaded_file.getvalue()
+            entry = analysis_cache.analyze_upload(data, analysis_cache.get_default_cache())
+            st.session_state.hojas_recalculadas = entry['hojas_recalculadas']
+            st.session_state.upload_hash = analysis_cache.upload_hash(data)
+            st.session_state.all_dataframes = entry['all_dataframes']
+            st.session_state.indice_estudiantes = entry['indice_estudiantes']
+            st.session_state.info_areas = analysis_core.AnalysisResult.from_dict(entry['info_areas'])
             st.session_state.df_cargado = True
             st.rerun()
 
-        # Guardado de general_data (DESPUÉS del rerun y fuera del spinner)
-        if 'info_areas' in st.session_state and st.session_state.info_areas:
-            primera_hoja = next(iter(st.session_state.info_areas))
-            st.session_state.general_data = st.session_state.info_areas[primera_hoja]['generalidades']
-        else:
-            st.session_state.general_data = {'nivel': 'Descon.', 'grado': 'Descon.', 'seccion': 'Descon.'}
     st.markdown("</div>", unsafe_allow_html=True)
 
 def inject_pbi_css():
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+import analysis_core
+
+# =========================================================================
+# === RANKING DE ESTUDIANTES EN RIESGO ===
+# Puntaje de riesgo por estudiante sobre todas las áreas, calculado de una
+# vez con los conteos del índice student_index.StudentIndex (estudiantes ×
+# áreas × niveles), sin recorrer estudiante por estudiante.
+# =========================================================================
+
+# Puntos por cada nota de ese nivel (configurables desde el dashboard)
+PESOS_RIESGO = {'AD': 0, 'A': 0, 'B': 1, 'C': 2}
+
+
+def risk_scores(counts, pesos=None, normalizar=False):
+    """
+    Puntaje de riesgo para un array de conteos (..., 4) en el orden de NIVELES_LOGRO.
+    Con normalizar=True el puntaje se divide entre las notas registradas, para
+    comparar estudiantes con distinta cantidad de competencias evaluadas.
+    """
+    pesos = dict(PESOS_RIESGO, **(pesos or {}))
+    weights = np.array([pesos[nivel] for nivel in analysis_core.NIVELES_LOGRO], dtype=np.float64)
+    scores = counts @ weights
+    if normalizar:
+        registradas = counts.sum(axis=-1)
+        scores = np.divide(scores, registradas, out=np.zeros_like(scores), where=registradas > 0)
+    return scores
+
+
+def rank_students(index, pesos=None, normalizar=False, umbral=0.0, top=None):
+    """
+    Estudiantes con puntaje de riesgo mayor que `umbral`, de mayor a menor (a igual
+    puntaje, más notas C primero y luego el orden de la lista). Devuelve un DataFrame
+    con los conteos totales, el puntaje y una columna de puntaje por cada área.
+    """
+    niveles = analysis_core.NIVELES_LOGRO
+    totals = index.totals
+    scores = risk_scores(totals, pesos, normalizar)
+    area_scores = risk_scores(index.by_area, pesos, normalizar)
+
+    order = np.lexsort((np.arange(len(scores)), -totals[:, niveles.index('C')], -scores))
+    order = order[scores[order] > umbral]
+    if top is not None:
+        order = order[:top]
+
+    df = pd.DataFrame(totals[order], columns=niveles)
+    df.insert(0, 'Estudiante', [index.students[i] for i in order.tolist()])
+    df.insert(0, 'Puesto', np.arange(1, len(order) + 1))
+    df['Total'] = df[niveles].sum(axis=1)
+    df['Puntaje'] = scores[order].round(3)
+    for j, area in enumerate(index.areas):
+        df[area] = area_scores[order, j].round(3)
+    return df
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+import analysis_core
+
+# =========================================================================
+# === CONSOLIDADO POR GRADO, NIVEL E INSTITUCIÓN ===
+# Suma los conteos AD/A/B/C de varias secciones. Las competencias se agrupan
+# por su nombre limpio normalizado (sin prefijo '01 =', tildes ni mayúsculas),
+# así que la misma competencia se junta aunque cambie su número entre secciones.
+# Cada sección se suma una sola vez al agregarla; volver a agregarla reemplaza
+# su aporte anterior.
+# =========================================================================
+
+# Columnas de clave de cada nivel de consolidado
+ROLLUP_KEYS = {
+    'grado': ['nivel', 'grado', 'area', 'competencia'],
+    'nivel': ['nivel', 'area', 'competencia'],
+    'escuela': ['area', 'competencia'],
+}
+
+
+def section_counts(analisis_results):
+    """
+    Conteos compactos de una sección a partir de analyze_data:
+    {área: {nombre limpio: [AD, A, B, C]}} (las hojas con error o ignoradas se omiten).
+    """
+    areas = {}
+    for sheet_name, result in analisis_results.items():
+        if 'error' in result or not result.get('competencias'):
+            continue
+        areas[sheet_name] = {
+            comp['nombre_limpio']: [comp['conteo_niveles'][n] for n in analysis_core.NIVELES_LOGRO]
+            for comp in result['competencias'].values()
+        }
+    return areas
+
+
+class Rollup:
+    """
+    Conteos consolidados por grado, nivel e institución, actualizados sección por sección.
+    Con keep_sections=False no se guarda el aporte de cada sección (memoria acotada
+    para lotes muy grandes), a cambio de no poder reemplazarlas ni quitarlas.
+    """
+
+    def __init__(self, keep_sections=True):
+        self.keep_sections = keep_sections
+        self.sections = {}                                  # id de sección -> (nivel, grado, aporte)
+        self.counts = {level: {} for level in ROLLUP_KEYS}  # clave normalizada -> array de 4
+        self.n_sections = {level: {} for level in ROLLUP_KEYS}
+        self.labels = {}                                    # texto normalizado -> primera forma vista
+
+    def _key(self, value):
+        text = '' if value is None else str(value).strip()
+        key = analysis_core.normalize_text(text)
+        self.labels.setdefault(key, text)
+        return key
+
+    def add_section(self, general, areas, section_id=None):
+        """
+        Agrega (o reemplaza) una sección. `general` es el dict de extract_general_data y
+        `areas` el formato de section_counts. Por defecto la sección se identifica por
+        (nivel, grado, sección); `section_id` permite otra identidad (p. ej. el archivo).
+        Devuelve el id de la sección.
+        """
+        nivel, grado, seccion = (self._key(general.get(k)) for k in ('nivel', 'grado', 'seccion'))
+        section_id = (nivel, grado, seccion) if section_id is None else section_id
+        if self.keep_sections and section_id in self.sections:
+            self.remove_section(section_id)
+
+        contribution = {}
+        for area, competencias in areas.items():
+            area_key = self._key(area)
+            for competencia, counts in competencias.items():
+                comp_key = self._key(analysis_core.clean_competencia_name(competencia))
+                key = (area_key, comp_key)
+                if key not in contribution:
+                    contribution[key] = np.zeros(len(analysis_core.NIVELES_LOGRO), dtype=np.int64)
+                contribution[key] += counts
+
+        if self.keep_sections:
+            self.sections[section_id] = (nivel, grado, contribution)
+        self._apply(nivel, grado, contribution, sign=1)
+        return section_id
+
+    def add_results(self, analisis_results, section_id=None):
+        """Agrega una sección directamente desde el resultado de analyze_data."""
+        first = next(iter(analisis_results.values()), None)
+        general = first['generalidades'] if first else {}
+        return self.add_section(general, section_counts(analisis_results), section_id)
+
+    def remove_section(self, section_id):
+        """Quita el aporte de una sección ya agregada."""
+        nivel, grado, contribution = self.sections.pop(section_id)
+        self._apply(nivel, grado, contribution, sign=-1)
+
+    def _apply(self, nivel, grado, contribution, sign):
+        prefixes = {'grado': (nivel, grado), 'nivel': (nivel,), 'escuela': ()}
+        for level, prefix in prefixes.items():
+            counts = self.counts[level]
+            n_sections = self.n_sections[level]
+            for area_comp, values in contribution.items():
+                key = prefix + area_comp
+                if sign > 0:
+                    if key not in counts:
+                        counts[key] = np.zeros(len(analysis_core.NIVELES_LOGRO), dtype=np.int64)
+                        n_sections[key] = 0
+                    counts[key] += values
+                    n_sections[key] += 1
+                else:
+                    counts[key] -= values
+                    n_sections[key] -= 1
+                    if not n_sections[key]:
+                        del counts[key], n_sections[key]
+
+    def to_frame(self, level='grado'):
+        """
+        Tabla del consolidado: claves del nivel pedido, conteos AD/A/B/C, total,
+        porcentajes y cuántas secciones aportaron a cada fila.
+        """
+        columns = ROLLUP_KEYS[level]
+        keys = sorted(self.counts[level])
+        matrix = np.array([self.counts[level][k] for k in keys], dtype=np.int64).reshape(len(keys), len(analysis_core.NIVELES_LOGRO))
+        df = pd.DataFrame([[self.labels[part] for part in key] for key in keys], columns=columns)
+        df[analysis_core.NIVELES_LOGRO] = matrix
+        total = matrix.sum(axis=1)
+        df['total'] = total
+        pct = np.divide(matrix * 100.0, total[:, None], out=np.zeros(matrix.shape), where=total[:, None] > 0)
+        for j, nivel in enumerate(analysis_core.NIVELES_LOGRO):
+            df[f'% {nivel}'] = pct[:, j].round(1)
+        df['secciones'] = [self.n_sections[level][k] for k in keys]
+        return df
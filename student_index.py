@@ -0,0 +1,243 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+import analysis_core
+
+# =========================================================================
+# === ÍNDICE ESTUDIANTE × COMPETENCIA ===
+# Se construye una vez al subir el archivo a partir de las hojas leídas
+# (all_dataframes). El perfil individual pasa de filtrar cada DataFrame en
+# cada rerun a una consulta directa por estudiante.
+# =========================================================================
+
+# Encabezados con los que SIAGIE exporta la columna de nombres
+COLUMNAS_NOMBRE = ["Estudiante", "ESTUDIANTE", "APELLIDOS Y NOMBRES", "Apellidos y Nombres", "Nombres"]
+# Resultados que devuelve el buscador de estudiantes
+BUSQUEDA_TOP_K = 20
+
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def find_name_column(df):
+    """Columna de identidad del estudiante en una hoja leída con encabezado, o None."""
+    return next((c for c in df.columns if str(c).strip() in COLUMNAS_NOMBRE), None)
+
+
+def encode_frame(df):
+    """Matriz int8 filas × columnas con los códigos de encode_levels (toda la fila, no solo las notas)."""
+    values = df.to_numpy(dtype=object)
+    return analysis_core.encode_levels([values[:, j] for j in range(values.shape[1])])
+
+
+class StudentIndex:
+    """
+    Tabla larga (estudiante, área, competencia, nivel int8) con una fila por celda que
+    tiene un nivel AD/A/B/C, más los totales por estudiante y el desglose por área
+    ya calculados. Igual que el perfil original, se cuenta toda la fila de la primera
+    coincidencia del nombre en cada hoja.
+    """
+
+    __slots__ = ('name_column', 'students', 'areas', 'competencies', 'records', 'totals', 'by_area', '_ids', '_search')
+
+    def __init__(self, name_column, students, areas, competencies, records, totals, by_area):
+        self.name_column = name_column
+        self.students = students          # nombres en el orden de la primera hoja
+        self.areas = areas                # nombres de hoja
+        self.competencies = competencies  # etiquetas de competencia (categorías de records)
+        self.records = records            # dict de arrays: estudiante, area, competencia, nivel
+        self.totals = totals              # (estudiantes × 4) en el orden de NIVELES_LOGRO
+        self.by_area = by_area            # (estudiantes × áreas × 4)
+        self._ids = {name: i for i, name in enumerate(students)}
+
+    @classmethod
+    def build(cls, all_dataframes, analisis_results=None):
+        """
+        Construye el índice desde las hojas leídas por el uploader. Si se pasa el
+        resultado de analyze_data, las columnas de nota se etiquetan con el nombre
+        limpio de su competencia; las demás columnas, con su encabezado.
+        """
+        n_levels = len(analysis_core.NIVELES_LOGRO)
+        areas = list(all_dataframes)
+        if not areas:
+            return cls(None, [], [], [], _empty_records(), np.zeros((0, n_levels), np.int64), np.zeros((0, 0, n_levels), np.int64))
+
+        df_base = all_dataframes[areas[0]]
+        name_column = find_name_column(df_base)
+        if name_column is None:
+            return cls(None, [], areas, [], _empty_records(), np.zeros((0, n_levels), np.int64), np.zeros((0, len(areas), n_levels), np.int64))
+
+        # Solo filas de estudiante: la leyenda ('01 = ...', 'NL = Nivel de logro') y el pie
+        # de página también tienen texto en la columna de nombres, pero no número de orden
+        students = list(df_base.loc[_student_rows(df_base), name_column].dropna().unique())
+        student_lookup = pd.Index(students)
+        competency_ids = {}
+        parts = []
+        for area_id, (area_name, df_area) in enumerate(all_dataframes.items()):
+            if name_column not in df_area.columns or df_area.empty:
+                continue
+            names = df_area[name_column]
+            ids = student_lookup.get_indexer(names)
+            # Primera fila de cada estudiante en la hoja (como el filtro original)
+            keep = np.flatnonzero((ids >= 0) & _student_rows(df_area) & ~names.duplicated().to_numpy())
+            if not len(keep):
+                continue
+
+            codes = encode_frame(df_area.iloc[keep])
+            rows, cols = np.nonzero(codes >= 0)
+            labels = _column_labels(df_area, area_name, analisis_results)
+            comp_ids = np.array([competency_ids.setdefault(label, len(competency_ids)) for label in labels], dtype=np.int32)
+            parts.append((
+                ids[keep][rows].astype(np.int32),
+                np.full(len(rows), area_id, dtype=np.int32),
+                comp_ids[cols],
+                codes[rows, cols],
+            ))
+
+        if parts:
+            records = {
+                'estudiante': np.concatenate([p[0] for p in parts]),
+                'area': np.concatenate([p[1] for p in parts]),
+                'competencia': np.concatenate([p[2] for p in parts]),
+                'nivel': np.concatenate([p[3] for p in parts]).astype(np.int8),
+            }
+        else:
+            records = _empty_records()
+
+        # Desglose (estudiante, área, nivel) en una sola pasada de np.bincount
+        flat = (records['estudiante'].astype(np.int64) * len(areas) + records['area']) * n_levels + records['nivel']
+        by_area = np.bincount(flat, minlength=len(students) * len(areas) * n_levels).reshape(len(students), len(areas), n_levels)
+        totals = by_area.sum(axis=1)
+        return cls(name_column, students, areas, list(competency_ids), records, totals, by_area)
+
+    @property
+    def search(self):
+        """Buscador por nombre (NameSearchIndex), construido la primera vez que se usa."""
+        if getattr(self, '_search', None) is None:
+            self._search = NameSearchIndex(self.students)
+        return self._search
+
+    def __len__(self):
+        return len(self.students)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def level_counts(self, name):
+        """Total de AD/A/B/C del estudiante en todas las áreas."""
+        i = self._ids[name]
+        return dict(zip(analysis_core.NIVELES_LOGRO, self.totals[i].tolist()))
+
+    def area_breakdown(self, name):
+        """Por nivel, las áreas donde aparece con su cantidad: {'AD': ['Matemática (2)', ...], ...}."""
+        counts = self.by_area[self._ids[name]]
+        return {
+            nivel: [f"{area} ({count})" for area, count in zip(self.areas, counts[:, j].tolist()) if count > 0]
+            for j, nivel in enumerate(analysis_core.NIVELES_LOGRO)
+        }
+
+    def to_frame(self):
+        """Tabla larga con nombres: estudiante, área, competencia, nivel."""
+        return pd.DataFrame({
+            'estudiante': pd.Categorical.from_codes(self.records['estudiante'], categories=pd.Index(self.students, dtype=object)),
+            'area': pd.Categorical.from_codes(self.records['area'], categories=self.areas),
+            'competencia': pd.Categorical.from_codes(self.records['competencia'], categories=self.competencies),
+            'nivel': pd.Categorical.from_codes(self.records['nivel'], categories=analysis_core.NIVELES_LOGRO),
+        })
+
+
+def _tokens(normalized):
+    return [token for token in _TOKEN_SPLIT.split(normalized) if token]
+
+
+class NameSearchIndex:
+    """
+    Búsqueda de estudiantes sin distinguir acentos ni mayúsculas (misma normalización
+    NFD que analysis_core.normalize_text). Cada palabra del nombre se indexa por todos
+    sus prefijos, así que construirlo es lineal en el largo total de los nombres; cada
+    palabra de la consulta es una búsqueda en el dict y el ranking se hace con NumPy.
+    """
+
+    __slots__ = ('names', '_normalized', '_prefixes', '_exact')
+
+    def __init__(self, names):
+        self.names = list(names)
+        normalized = [analysis_core.normalize_text(name) for name in self.names]
+        prefixes = {}
+        exact = {}
+        for i, text in enumerate(normalized):
+            for token in _tokens(text):
+                _append_posting(exact, token, i)
+                for end in range(1, len(token) + 1):
+                    _append_posting(prefixes, token[:end], i)
+        self._normalized = np.array(normalized, dtype=str)
+        self._prefixes = {key: np.array(ids, dtype=np.int32) for key, ids in prefixes.items()}
+        self._exact = {key: np.array(ids, dtype=np.int32) for key, ids in exact.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def query(self, text, k=BUSQUEDA_TOP_K):
+        """
+        Hasta k nombres cuyas palabras empiezan con cada palabra de la consulta
+        ('quis jo' encuentra 'QUISPE MAMANI, JOSÉ'). Primero los nombres que empiezan
+        con la consulta completa, luego los que tienen más palabras exactas; a igualdad,
+        el orden original de la lista.
+        """
+        normalized = analysis_core.normalize_text(text)
+        tokens = _tokens(normalized)
+        if not tokens:
+            return self.names[:k]
+
+        postings = [self._prefixes.get(token) for token in tokens]
+        if any(p is None for p in postings):
+            return []
+        postings.sort(key=len)
+        candidates = postings[0]
+        for other in postings[1:]:
+            candidates = np.intersect1d(candidates, other, assume_unique=True)
+            if not len(candidates):
+                return []
+
+        starts = np.char.startswith(self._normalized[candidates], normalized)
+        exact = np.zeros(len(candidates), dtype=np.int32)
+        for token in set(tokens):
+            if token in self._exact:
+                exact += np.isin(candidates, self._exact[token], assume_unique=True)
+        # lexsort: la última clave es la principal; los ids ya vienen ordenados (desempate)
+        order = np.lexsort((candidates, -exact, ~starts))[:k]
+        return [self.names[i] for i in candidates[order].tolist()]
+
+
+def _append_posting(postings, key, i):
+    ids = postings.setdefault(key, [])
+    # Un apellido repetido (QUISPE QUISPE) no duplica al estudiante
+    if not ids or ids[-1] != i:
+        ids.append(i)
+
+
+def _student_rows(df):
+    """Máscara de las filas con número de orden válido en la Columna A."""
+    return df.iloc[:, 0].map(analysis_core._is_student_number).to_numpy(dtype=bool)
+
+
+def _empty_records():
+    return {
+        'estudiante': np.zeros(0, np.int32),
+        'area': np.zeros(0, np.int32),
+        'competencia': np.zeros(0, np.int32),
+        'nivel': np.zeros(0, np.int8),
+    }
+
+
+def _column_labels(df_area, area_name, analisis_results):
+    """Etiqueta de cada columna: competencia (columnas D, F, H...) o encabezado."""
+    labels = [str(column) for column in df_area.columns]
+    result = analisis_results.get(area_name) if analisis_results is not None else None
+    if result:
+        for i, comp in enumerate(result.get('competencias', {}).values()):
+            col = analysis_core.START_NOTE_COLUMN_INDEX + i * analysis_core.JUMP_SIZE
+            if col < len(labels):
+                labels[col] = comp['nombre_limpio']
+    return labels
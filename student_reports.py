@@ -0,0 +1,229 @@
+import io
+import os
+import re
+from collections import deque
+import zipfile
+
+from docx import Document
+from docx.shared import Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import RGBColor
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+import analysis_core
+
+# =========================================================================
+# === INFORMES INDIVIDUALES DE ESTUDIANTES (Word) ===
+# Sin dependencias de Streamlit ni de la IA, para poder generar los informes
+# de toda un aula o institución en procesos aparte. pedagogical_assistant
+# re-exporta generar_reporte_estudiante para el código existente.
+# =========================================================================
+
+def generar_reporte_estudiante(nombre_estudiante, total_conteo, desglose_areas):
+    """
+    Genera un informe individual en Word con formato semáforo (colores).
+    """
+    document = Document()
+    
+    # --- ESTILOS ---
+    style = document.styles['Normal']
+    font = style.font
+    font.name = 'Arial'
+    font.size = Pt(11)
+
+    # --- FUNCIÓN INTERNA PARA COLOR (Para pintar celdas en Word) ---
+    def set_cell_shading(cell, fill_color):
+        tc = cell._tc
+        tcPr = tc.get_or_add_tcPr()
+        shd = OxmlElement('w:shd')
+        shd.set(qn('w:val'), 'clear')
+        shd.set(qn('w:color'), 'auto')
+        shd.set(qn('w:fill'), fill_color)
+        tcPr.append(shd)
+
+    # 1. ENCABEZADO
+    # Creamos el título pero accedemos a su "run" (el texto) para cambiarle el tamaño
+    h1 = document.add_heading('INFORME DE PROGRESO DEL APRENDIZAJE', 0)
+    h1.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # AJUSTE DE TAMAÑO (Arial 18)
+    run = h1.runs[0]
+    run.font.name = 'Arial'
+    run.font.size = Pt(18)  # <--- AQUÍ ESTÁ EL EQUIVALENTE A ARIAL 18
+    run.font.color.rgb = RGBColor(0, 0, 0) # Aseguramos color negro
+    
+    document.add_paragraph(f"Estudiante: {nombre_estudiante}")
+    document.add_paragraph("Fecha de emisión: _______________________")
+    document.add_paragraph("")
+
+    # 2. SEMÁFORO ACADÉMICO (Tabla de Resumen)
+    document.add_heading('1. Resumen de Logros (Semáforo)', level=1)
+    
+    table = document.add_table(rows=1, cols=2)
+    table.style = 'Table Grid'
+    
+    # Encabezados
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'NIVEL DE LOGRO'
+    hdr_cells[1].text = 'CANTIDAD DE ÁREAS'
+    for cell in hdr_cells: 
+        cell.paragraphs[0].runs[0].bold = True
+        set_cell_shading(cell, "D9D9D9") # Gris claro para encabezado
+
+    # Datos del semáforo
+    data = [
+        ("LOGRO DESTACADO (AD)", total_conteo['AD'], "C6EFCE"), # Verde Claro
+        ("LOGRO ESPERADO (A)", total_conteo['A'], "E7F3FF"),   # Azul Claro
+        ("EN PROCESO (B)", total_conteo['B'], "FFEB9C"),       # Amarillo
+        ("EN INICIO (C)", total_conteo['C'], "FFC7CE")         # Rojo Claro
+    ]
+
+    for nivel, cantidad, color_hex in data:
+        row_cells = table.add_row().cells
+        row_cells[0].text = nivel
+        row_cells[1].text = str(cantidad)
+        
+        # Pintamos la celda del nivel
+        set_cell_shading(row_cells[0], color_hex)
+        row_cells[0].paragraphs[0].runs[0].bold = True
+        
+        # Centramos la cantidad
+        row_cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    document.add_paragraph("")
+
+    # 3. DETALLE DE ÁREAS CRÍTICAS
+    if total_conteo['B'] > 0 or total_conteo['C'] > 0:
+        document.add_heading('2. Áreas que requieren atención', level=1)
+        
+        if total_conteo['C'] > 0:
+            p = document.add_paragraph()
+            run = p.add_run("🛑 EN INICIO (C) - Requiere Recuperación:")
+            run.bold = True
+            run.font.color.rgb = RGBColor(200, 0, 0) # Rojo oscuro
+            
+            for area_txt in desglose_areas['C']:
+                document.add_paragraph(f"   • {area_txt}", style='List Bullet')
+        
+        if total_conteo['B'] > 0:
+            p = document.add_paragraph()
+            run = p.add_run("⚠️ EN PROCESO (B) - Requiere Refuerzo:")
+            run.bold = True
+            run.font.color.rgb = RGBColor(200, 150, 0) # Naranja oscuro
+            
+            for area_txt in desglose_areas['B']:
+                document.add_paragraph(f"   • {area_txt}", style='List Bullet')
+
+    document.add_paragraph("")
+
+    # 4. RECOMENDACIONES PEDAGÓGICAS (Automáticas)
+    document.add_heading('3. Recomendaciones y Compromisos', level=1)
+    
+    recomendacion = ""
+    if total_conteo['C'] > 0:
+        recomendacion = "El estudiante requiere un mayor acompañamiento para consolidar los aprendizajes en las áreas señaladas. Se sugiere reforzar los hábitos de estudio en casa y mantener comunicación constante con los docentes para asegurar su proceso de aprendizaje."
+    elif total_conteo['B'] > 0:
+        recomendacion = "Va por buen camino. Sugerimos motivar al estudiante a participar más activamente y revisar juntos sus avances semanales para que logre alcanzar el nivel de logro esperado en el corto plazo."
+    else:
+        recomendacion = "¡Felicitaciones! El estudiante demuestra un alto nivel de compromiso y logro de competencias. Se sugiere mantener la motivación, leer libros de interés y explorar nuevos retos académicos."
+    
+    document.add_paragraph(recomendacion)
+    document.add_paragraph("")
+    document.add_paragraph("")
+
+    # 5. FIRMAS
+    table_firmas = document.add_table(rows=1, cols=2)
+    f_cells = table_firmas.rows[0].cells
+    
+    p1 = f_cells[0].paragraphs[0]
+    p1.add_run("_________________________").bold = True
+    p1.add_run("\nAPODERADO(A)")
+    p1.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    p2 = f_cells[1].paragraphs[0]
+    p2.add_run("_________________________").bold = True
+    p2.add_run("\nDOCENTE / TUTOR")
+    p2.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Guardar en memoria
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+# =========================================================================
+# === EXPORTACIÓN MASIVA (ZIP CON TODOS LOS INFORMES) ===
+# =========================================================================
+
+# Caracteres que no se permiten en nombres de archivo de Windows
+_NOMBRE_INVALIDO = re.compile(r'[\\/:*?"<>|]+')
+
+
+def report_items(index):
+    """Argumentos de generar_reporte_estudiante para cada estudiante de un student_index.StudentIndex."""
+    for nombre in index.students:
+        yield nombre, index.level_counts(nombre), index.area_breakdown(nombre)
+
+
+def report_filename(nombre_estudiante, usados):
+    """Nombre de archivo del informe dentro del ZIP, único entre `usados` (se actualiza)."""
+    base = _NOMBRE_INVALIDO.sub('', str(nombre_estudiante)).strip() or 'Estudiante'
+    nombre = f"Informe_{base}.docx"
+    n = 2
+    while nombre in usados:
+        nombre = f"Informe_{base} ({n}).docx"
+        n += 1
+    usados.add(nombre)
+    return nombre
+
+
+def _report_bytes(item):
+    nombre, total_conteo, desglose_areas = item
+    return generar_reporte_estudiante(nombre, total_conteo, desglose_areas).getvalue()
+
+
+def write_reports_zip(items, destino, workers=None, max_in_flight=None, progress=None):
+    """
+    Escribe en `destino` (ruta o archivo binario) un ZIP con un informe por estudiante.
+    `items` son tuplas (nombre, total_conteo, desglose_areas), p. ej. report_items(indice).
+    Los DOCX se generan en un pool de procesos (workers, por defecto uno por CPU; 1 =
+    en este proceso) y se escriben en el ZIP en el orden de la lista a medida que
+    terminan. Como mucho hay max_in_flight informes en memoria (por defecto 2 por worker).
+    progress: callback opcional progress(listos, total, nombre). Devuelve los archivos escritos.
+    """
+    items = list(items)
+    total = len(items)
+    workers = min(workers or os.cpu_count() or 1, max(total, 1))
+    usados = set()
+    # Los DOCX ya vienen comprimidos: guardarlos sin volver a comprimir es más rápido
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_STORED) as zf:
+        def escribir(done, nombre, data):
+            zf.writestr(report_filename(nombre, usados), data)
+            if progress:
+                progress(done, total, nombre)
+
+        if workers <= 1:
+            for done, item in enumerate(items, start=1):
+                escribir(done, item[0], _report_bytes(item))
+            return total
+
+        max_in_flight = max_in_flight or 2 * workers
+        pending = iter(items)
+        with analysis_core.process_pool(workers) as executor:
+            in_flight = deque()
+            for item in pending:
+                in_flight.append((item[0], executor.submit(_report_bytes, item)))
+                if len(in_flight) >= max_in_flight:
+                    break
+            done = 0
+            while in_flight:
+                nombre, future = in_flight.popleft()
+                data = future.result()
+                item = next(pending, None)
+                if item is not None:
+                    in_flight.append((item[0], executor.submit(_report_bytes, item)))
+                done += 1
+                escribir(done, nombre, data)
+    return total
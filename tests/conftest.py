@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+from siagie_sintetico import generar_libro  # noqa: E402
+
+# Cada hoja de área del libro sintético trae la leyenda '01 = ...' / 'NL = Nivel de logro'
+ESTUDIANTES = 40
+AREAS = 3
+
+
+@pytest.fixture(scope='session')
+def libro():
+    """Bytes de un libro SIAGIE sintético con leyenda debajo de los estudiantes."""
+    return generar_libro(estudiantes=ESTUDIANTES, areas=AREAS, competencias=4)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    import analysis_cache
+    return analysis_cache.AnalysisCache(str(tmp_path / 'cache'))
@@ -0,0 +1,57 @@
+import os
+import stat
+
+import pytest
+
+import analysis_cache
+from siagie_sintetico import generar_libro
+
+
+@pytest.fixture(scope='module')
+def periodos():
+    return [generar_libro(estudiantes=30, areas=4, periodo=periodo, seed=i)
+            for i, periodo in enumerate(['PRIMER BIMESTRE', 'SEGUNDO BIMESTRE'])]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_analyze_uploads_igual_que_uploader(periodos, cache, workers):
+    esperado = [analysis_cache.analyze_upload(data)['info_areas'] for data in periodos]
+    assert analysis_cache.analyze_uploads(periodos, cache, workers=workers) == esperado
+    # Segunda vez: todo sale de la caché
+    assert analysis_cache.analyze_uploads(periodos, cache, workers=workers) == esperado
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 2)
+
+
+def test_analyze_uploads_usa_resultados_del_uploader(periodos, cache):
+    analysis_cache.analyze_upload(periodos[0], cache)
+    antes = cache.stats()
+    analysis_cache.analyze_uploads(periodos[:1], cache)
+    despues = cache.stats()
+    assert (despues['hits'] - antes['hits'], despues['misses'] - antes['misses']) == (1, 0)
+
+
+def test_analyze_upload_cuenta_una_vez(periodos, cache):
+    analysis_cache.analyze_upload(periodos[0], cache)
+    # Archivo completo + una entrada por hoja de área
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (0, 1 + 4)
+    analysis_cache.analyze_upload(periodos[0], cache)
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1 + 4)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='permisos POSIX')
+def test_directorio_privado(tmp_path):
+    directorio = tmp_path / 'compartido'
+    directorio.mkdir(mode=0o777)
+    directorio.chmod(0o777)
+    analysis_cache.AnalysisCache(str(directorio))
+    assert stat.S_IMODE(directorio.stat().st_mode) == 0o700
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='permisos POSIX')
+def test_no_carga_pickle_escribible_por_otros(cache):
+    cache.put('clave', {'valor': 1})
+    assert cache.get('clave') == {'valor': 1}
+    os.chmod(cache._path('clave'), 0o666)
+    assert cache.get('clave') is None
+    assert not os.path.exists(cache._path('clave'))
@@ -0,0 +1,52 @@
+import zipfile
+
+import pytest
+
+import batch_analysis
+import cli
+
+
+@pytest.fixture
+def registro(tmp_path, libro):
+    path = tmp_path / 'registro_1A.xlsx'
+    path.write_bytes(libro)
+    return str(path)
+
+
+def test_un_xlsx_es_un_libro_y_no_un_lote(registro):
+    # Un .xlsx también es un zip: no debe abrirse como lote de libros
+    assert list(batch_analysis.iter_workbook_sources(registro)) == [(registro, ('archivo', registro))]
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_analyze_batch_un_archivo(registro, workers):
+    aggregate = batch_analysis.analyze_batch(registro, workers=workers)
+    assert aggregate.archivos == [{'archivo': registro}]
+    assert aggregate.stats['archivos'] == 1
+    assert int(aggregate.to_frame()['total'].sum()) > 0
+
+
+def test_cli_un_archivo(registro, tmp_path):
+    salida = tmp_path / 'salida'
+    assert cli.main([registro, '-o', str(salida), '--excel']) == 0
+    assert (salida / 'resultados.json').exists()
+    assert list(salida.glob('Reporte_PBI_*.xlsx'))
+
+
+
+@pytest.mark.skipif(batch_analysis.resource is None, reason='sin medición de RSS')
+def test_pico_rss_incluye_a_los_workers(tmp_path):
+    # Cada worker descomprime un miembro de 256 MB (no es un libro válido: queda como error);
+    # el proceso principal solo lista los nombres del zip
+    mb = 256
+    lote = tmp_path / 'lote.zip'
+    with zipfile.ZipFile(lote, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre in ['1A/registro.xlsx', '1B/registro.xlsx']:
+            with zf.open(nombre, 'w') as f:
+                for _ in range(mb):
+                    f.write(bytes(1024 * 1024))
+    aggregate = batch_analysis.analyze_batch(str(lote), workers=2)
+    stats = aggregate.stats
+    assert len(aggregate.errores()) == 2
+    assert stats['pico_rss_mb_workers'] > mb
+    assert stats['pico_rss_mb_principal'] < stats['pico_rss_mb_workers'] == stats['pico_rss_mb']
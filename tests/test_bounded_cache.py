@@ -0,0 +1,30 @@
+from bounded_cache import BoundedLRUCache
+
+
+def test_desalojo_por_entradas():
+    cache = BoundedLRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'a' pasa a ser la más reciente
+    cache.put('c', 3)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.stats()['desalojados'] == 1
+
+
+def test_desalojo_por_bytes():
+    cache = BoundedLRUCache(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'123456')
+    assert 'a' not in cache and cache.stats()['bytes'] == 6
+    cache.put('grande', b'x' * 11)  # más grande que el límite: no se guarda
+    assert 'grande' not in cache and 'b' in cache
+
+
+def test_get_or_build_y_stats():
+    cache = BoundedLRUCache(max_entries=4)
+    llamadas = []
+    for _ in range(3):
+        assert cache.get_or_build('k', lambda: llamadas.append(1) or 'v') == 'v'
+    assert len(llamadas) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entradas']) == (2, 1, 1)
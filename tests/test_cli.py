@@ -0,0 +1,49 @@
+import json
+import zipfile
+
+import pandas as pd
+import pytest
+
+import cli
+from siagie_sintetico import generar_libro
+
+
+@pytest.fixture
+def entradas(tmp_path):
+    """Dos carpetas y un zip con libros que se llaman igual (registro.xlsx)."""
+    for i, carpeta in enumerate(['1A', '1B']):
+        (tmp_path / carpeta).mkdir()
+        (tmp_path / carpeta / 'registro.xlsx').write_bytes(
+            generar_libro(estudiantes=20, areas=2, seccion=carpeta[-1], seed=i))
+    with zipfile.ZipFile(tmp_path / 'lote.zip', 'w') as zf:
+        for i, carpeta in enumerate(['2A', '2B'], start=2):
+            zf.writestr(f'{carpeta}/registro.xlsx',
+                        generar_libro(estudiantes=20, areas=2, grado='SEGUNDO', seccion=carpeta[-1], seed=i))
+    return [str(tmp_path / '1A'), str(tmp_path / '1B'), str(tmp_path / 'lote.zip')]
+
+
+def _total_escuela(salida):
+    return int(pd.read_csv(salida / 'consolidado_escuela.csv')['total'].sum())
+
+
+def test_libros_homonimos_no_se_pisan(entradas, tmp_path):
+    salida = tmp_path / 'salida'
+    # La misma carpeta dos veces no cuenta dos veces
+    assert cli.main(entradas + [entradas[0], '-o', str(salida), '--consolidado', '-f', 'csv']) == 0
+    resultados = pd.read_csv(salida / 'resultados.csv')
+    assert resultados['archivo'].nunique() == 4
+
+    salida_json = tmp_path / 'salida_json'
+    assert cli.main(entradas + ['-o', str(salida_json)]) == 0
+    with open(salida_json / 'resultados.json', encoding='utf-8') as f:
+        assert len(json.load(f)) == 4
+
+
+def test_streaming_suma_igual_que_por_archivo(entradas, tmp_path):
+    por_archivo, streaming = tmp_path / 'por_archivo', tmp_path / 'streaming'
+    assert cli.main(entradas + [entradas[0], '-o', str(por_archivo), '--consolidado', '-f', 'csv']) == 0
+    assert cli.main(entradas + [entradas[0], '-o', str(streaming), '--streaming', '-f', 'csv']) == 0
+
+    agregado = pd.read_csv(streaming / 'agregado_secciones.csv')
+    assert int(agregado['total'].sum()) == _total_escuela(por_archivo) == _total_escuela(streaming)
+    assert set(agregado['seccion']) == {'A', 'B'}
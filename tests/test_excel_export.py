@@ -0,0 +1,44 @@
+import io
+
+import openpyxl
+import pandas as pd
+
+import analysis_cache
+import excel_export
+import student_index
+from conftest import AREAS, ESTUDIANTES
+
+
+def test_consolidado_hoja_estudiantes_sin_leyenda(libro, cache):
+    entry = analysis_cache.analyze_upload(libro, cache)
+    destino = io.BytesIO()
+    excel_export.write_consolidated_workbook(destino, entry['info_areas'], {}, entry['indice_estudiantes'])
+
+    wb = openpyxl.load_workbook(destino, read_only=True)
+    assert len(wb.sheetnames) == AREAS + 3  # Resumen, áreas, Estudiantes, Calidad de datos
+    # Título y dos filas de encabezado; luego una fila por estudiante
+    nombres = [row[0] for row in wb['Estudiantes'].iter_rows(min_row=4, max_col=1, values_only=True)]
+    assert len(nombres) == ESTUDIANTES
+    assert not any('=' in nombre or 'Nivel de logro' in nombre for nombre in nombres)
+
+
+def test_texto_de_usuarios_se_guarda_como_texto():
+    area, competencia = '2024', '=1+1'
+    niveles = {'AD': 1, 'A': 1, 'B': 0, 'C': 0}
+    results = {area: {'generalidades': {}, 'competencias': {
+        f'01 = {competencia}': {'conteo_niveles': niveles, 'total_evaluados': 2, 'nombre_limpio': competencia},
+    }}}
+    hoja = pd.DataFrame({'Nro': [1, 2], 'Estudiante': ['=HYPERLINK("http://x")', '007'], 'DNI': ['', ''], '01': ['AD', 'A']})
+    index = student_index.StudentIndex.build({area: hoja}, results)
+    destino = io.BytesIO()
+    excel_export.write_consolidated_workbook(destino, results, {}, index)
+
+    wb = openpyxl.load_workbook(destino)
+    celdas = [wb['Resumen']['A4'], wb['Estudiantes']['B2'], wb['Estudiantes']['B3'],
+              wb['Estudiantes']['A4'], wb['Estudiantes']['A5'], wb[area]['A4']]
+    assert [c.value for c in celdas] == [area, area, competencia, '=HYPERLINK("http://x")', '007', competencia]
+    assert {c.data_type for c in celdas} == {'s'}
+
+    df = pd.DataFrame({'Estudiante': ['=1+1'], 'Puntaje': [3]})
+    ranking = openpyxl.load_workbook(io.BytesIO(excel_export.risk_ranking_workbook_bytes(df, {})))
+    assert ranking['En riesgo']['A5'].data_type == 's'
@@ -0,0 +1,77 @@
+import copy
+import tempfile
+
+import pytest
+
+import analysis_cache
+import history_store
+
+# Ids de cuenta (usuario autenticado) dueños de los períodos
+CUENTA = 'cuenta-1'
+OTRA_CUENTA = 'cuenta-2'
+
+
+@pytest.fixture
+def historial(tmp_path):
+    return history_store.HistoryStore(str(tmp_path / 'historial.sqlite3'))
+
+
+@pytest.fixture
+def resultados(libro):
+    return analysis_cache.analyze_upload(libro)['info_areas']
+
+
+def test_guarda_y_lee_un_periodo(historial, resultados):
+    assert historial.save_results(CUENTA, 'IE 123', 'Primer Bimestre', resultados) > 0
+    assert historial.periods(CUENTA, 'ie 123', 'PRIMERO', 'A') == ['Primer Bimestre']
+    assert list(historial.load_results(CUENTA, 'IE 123', 'PRIMERO', 'A', 'primer bimestre')) == list(resultados)
+
+
+@pytest.mark.parametrize('cuenta, institucion, periodo', [
+    (CUENTA, '', 'Primer Bimestre'), (CUENTA, '  ', 'Primer Bimestre'), (CUENTA, 'IE 123', ''),
+    (None, 'IE 123', 'Primer Bimestre'), ('', 'IE 123', 'Primer Bimestre'),
+])
+def test_no_guarda_sin_cuenta_institucion_ni_periodo(historial, resultados, cuenta, institucion, periodo):
+    with pytest.raises(ValueError):
+        historial.save_results(cuenta, institucion, periodo, resultados)
+    assert historial.groups(CUENTA).empty
+
+
+def test_no_lista_sin_cuenta_ni_institucion(historial):
+    with pytest.raises(ValueError):
+        historial.groups(CUENTA, '')
+    with pytest.raises(ValueError):
+        historial.periods(CUENTA, '', 'PRIMERO', 'A')
+    with pytest.raises(ValueError):
+        historial.groups(None)
+
+
+def test_cada_cuenta_ve_solo_sus_periodos(historial, resultados):
+    historial.save_results(CUENTA, 'IE 123', 'Primer Bimestre', resultados)
+    # Otra cuenta que escribe el mismo nombre de institución no lee ni pisa esos datos
+    assert historial.groups(OTRA_CUENTA).empty
+    assert historial.periods(OTRA_CUENTA, 'IE 123', 'PRIMERO', 'A') == []
+    assert historial.load_results(OTRA_CUENTA, 'IE 123', 'PRIMERO', 'A', 'Primer Bimestre') == {}
+    assert historial.query(OTRA_CUENTA, institucion='IE 123').empty
+    assert historial.delete_period(OTRA_CUENTA, 'IE 123', 'PRIMERO', 'A', 'Primer Bimestre') == 0
+
+    historial.save_results(OTRA_CUENTA, 'IE 123', 'Primer Bimestre', resultados)
+    assert historial.delete_period(OTRA_CUENTA, 'IE 123', 'PRIMERO', 'A', 'Primer Bimestre') > 0
+    assert list(historial.load_results(CUENTA, 'IE 123', 'PRIMERO', 'A', 'Primer Bimestre')) == list(resultados)
+
+
+def test_competencias_con_el_mismo_nombre_normalizado(historial, resultados):
+    resultados = copy.deepcopy(resultados)
+    area = next(iter(resultados))
+    competencias = resultados[area]['competencias']
+    nombre, comp = next(iter(competencias.items()))
+    competencias[nombre + ' (2)'] = dict(comp, nombre_limpio=comp['nombre_limpio'].upper())
+
+    guardadas = historial.save_results(CUENTA, 'IE 123', 'Primer Bimestre', resultados)
+    filas = historial.query(CUENTA)
+    assert guardadas == len(filas) == sum(len(r['competencias']) for r in resultados.values())
+    assert len(filas[filas['area'] == area]) == len(competencias)
+
+
+def test_ruta_por_defecto_fuera_del_temporal():
+    assert not history_store.DEFAULT_DB_PATH.startswith(tempfile.gettempdir())
@@ -0,0 +1,132 @@
+"""
+Regresión de la ingesta (WorkbookModel, lector en streaming, layouts en caché, modo
+paralelo e incremental) contra la lectura original con pd.read_excel.
+"""
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import analysis_core
+from siagie_sintetico import generar_libro
+
+
+def _referencia(data, sheet_name):
+    """Conteos de una hoja como los calculaba analyze_data antes de WorkbookModel (pd.read_excel completo)."""
+    df_full = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, header=None)
+    is_student_row = df_full.iloc[:, 0].apply(analysis_core._is_student_number)
+    end_row = int(df_full[is_student_row].index.max())
+    competencias = {}
+    leyenda = df_full.iloc[end_row + analysis_core.LEGEND_OFFSET:, 1].head(analysis_core.LEGEND_SCAN_ROWS)
+    nombres = [val for val in leyenda if isinstance(val, str) and '=' in val and val.strip()[:2].isdigit()]
+    for i, nombre in enumerate(nombres):
+        col = analysis_core.START_NOTE_COLUMN_INDEX + i * analysis_core.JUMP_SIZE
+        notas = df_full.iloc[analysis_core.DATA_START_ROW_INDEX:end_row + 1, col].astype(str).str.strip().str.upper()
+        competencias[nombre] = {
+            'conteo_niveles': analysis_core.get_level_counts(notas)['conteo_niveles'],
+            'nombre_limpio': analysis_core.clean_competencia_name(nombre),
+        }
+    return competencias
+
+
+def _conteos(results):
+    return {
+        sheet_name: {
+            nombre: {'conteo_niveles': comp['conteo_niveles'], 'nombre_limpio': comp['nombre_limpio']}
+            for nombre, comp in result['competencias'].items()
+        }
+        for sheet_name, result in results.items()
+    }
+
+
+def _hojas(data):
+    return [s for s in analysis_core.read_workbook(data).sheet_names if s not in analysis_core.HOJAS_NO_AREA]
+
+
+@pytest.fixture(scope='module')
+def ruidoso():
+    # Notas con espacios, minúsculas y valores no reconocidos; 5 hojas para el modo paralelo
+    return generar_libro(estudiantes=35, areas=5, competencias=6, ruido=0.2, seed=7)
+
+
+@pytest.fixture(scope='module')
+def referencia(ruidoso):
+    return {sheet_name: _referencia(ruidoso, sheet_name) for sheet_name in _hojas(ruidoso)}
+
+
+def test_streaming_igual_que_read_excel(ruidoso, referencia):
+    analysis_core.get_layout_cache().clear()
+    results = analysis_core.analyze_data(analysis_core.read_workbook(ruidoso), _hojas(ruidoso))
+    assert _conteos(results) == referencia
+    general = next(iter(results.values()))['generalidades']
+    assert (general['nivel'], general['grado'], general['seccion']) == ('SECUNDARIA', 'PRIMERO', 'A')
+
+
+def test_hojas_ya_leidas_igual_que_streaming(ruidoso, referencia):
+    workbook = analysis_core.read_workbook(ruidoso)
+    for sheet_name in _hojas(ruidoso):
+        workbook.parse(sheet_name)  # ruta del DataFrame completo (como el uploader)
+    assert _conteos(analysis_core.analyze_data(workbook, _hojas(ruidoso))) == referencia
+
+
+def test_layout_en_cache_igual_que_sin_cache(ruidoso, referencia):
+    cache = analysis_core.get_layout_cache()
+    cache.clear()
+    frio = analysis_core.analyze_data(ruidoso, _hojas(ruidoso))
+    antes = cache.stats()['hits']
+    caliente = analysis_core.analyze_data(ruidoso, _hojas(ruidoso))
+    assert cache.stats()['hits'] > antes
+    assert frio == caliente
+    assert _conteos(caliente) == referencia
+
+
+def test_secciones_de_distinto_tamano_comparten_layout():
+    # Misma plantilla, otra sección y otro número de estudiantes
+    seccion_a = generar_libro(estudiantes=30, areas=2, competencias=4, seccion='A', seed=1)
+    seccion_b = generar_libro(estudiantes=47, areas=2, competencias=4, seccion='B', seed=2)
+    cache = analysis_core.get_layout_cache()
+    cache.clear()
+    analysis_core.analyze_data(seccion_a, _hojas(seccion_a))
+    antes = cache.stats()
+    workbook = analysis_core.read_workbook(seccion_b)
+    for sheet_name in _hojas(seccion_b):
+        workbook.parse(sheet_name)  # ruta del DataFrame completo: corta con el layout guardado
+    results = analysis_core.analyze_data(workbook, _hojas(seccion_b))
+    despues = cache.stats()
+    assert despues['hits'] - antes['hits'] == len(_hojas(seccion_b))
+    assert despues['entradas'] == antes['entradas']
+    assert _conteos(results) == {h: _referencia(seccion_b, h) for h in _hojas(seccion_b)}
+
+
+def test_paralelo_igual_que_secuencial(ruidoso, referencia):
+    hojas = _hojas(ruidoso)
+    assert len(hojas) >= analysis_core.PARALLEL_MIN_SHEETS
+    paralelo = analysis_core.analyze_data(ruidoso, hojas, workers=2)
+    assert list(paralelo) == hojas
+    assert paralelo == analysis_core.analyze_data(ruidoso, hojas)
+    assert _conteos(paralelo) == referencia
+
+
+def test_incremental_solo_recalcula_la_hoja_cambiada(ruidoso):
+    def guardar(wb):
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
+
+    original = guardar(openpyxl.load_workbook(io.BytesIO(ruidoso)))
+    wb = openpyxl.load_workbook(io.BytesIO(ruidoso))
+    cambiada = wb.sheetnames[-1]
+    celda = wb[cambiada]['D3']
+    celda.value = 'C' if str(celda.value).strip().upper() == 'AD' else 'AD'
+    modificado = guardar(wb)
+
+    hojas = _hojas(original)
+    previos, huellas, recalculadas = analysis_core.analyze_data_incremental(original, hojas)
+    assert recalculadas == hojas
+    results, _, recalculadas = analysis_core.analyze_data_incremental(
+        modificado, hojas, {huellas[h]: previos[h] for h in hojas})
+    assert recalculadas == [cambiada]
+    assert results == analysis_core.analyze_data(modificado, hojas)
+    assert _conteos(results) == {h: _referencia(modificado, h) for h in hojas}
+    assert _conteos(results)[cambiada] != _conteos(previos)[cambiada]
@@ -0,0 +1,9 @@
+import analysis_cache
+from conftest import ESTUDIANTES
+
+
+def test_indice_excluye_leyenda(libro, cache):
+    indice = analysis_cache.analyze_upload(libro, cache)['indice_estudiantes']
+    assert len(indice) == ESTUDIANTES
+    assert not any('=' in nombre for nombre in indice.students)
+    assert int(indice.totals.sum()) == len(indice.records['nivel'])
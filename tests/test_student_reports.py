@@ -0,0 +1,20 @@
+import io
+import zipfile
+
+import pytest
+
+import analysis_cache
+import student_reports
+from conftest import ESTUDIANTES
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_zip_un_informe_por_estudiante(libro, cache, workers):
+    indice = analysis_cache.analyze_upload(libro, cache)['indice_estudiantes']
+    destino = io.BytesIO()
+    escritos = student_reports.write_reports_zip(student_reports.report_items(indice), destino, workers=workers)
+
+    with zipfile.ZipFile(destino) as zf:
+        nombres = zf.namelist()
+    assert escritos == len(nombres) == ESTUDIANTES
+    assert not any('=' in nombre or 'Nivel de logro' in nombre for nombre in nombres)
@@ -0,0 +1,14 @@
+import analysis_cache
+
+
+def test_busqueda_no_devuelve_leyenda(libro, cache):
+    indice = analysis_cache.analyze_upload(libro, cache)['indice_estudiantes']
+    for consulta in ('competencia', 'nivel de logro', 'nl', '01'):
+        assert indice.search.query(consulta) == []
+
+
+def test_busqueda_sin_tildes(libro, cache):
+    indice = analysis_cache.analyze_upload(libro, cache)['indice_estudiantes']
+    encontrados = indice.search.query('huaman')
+    assert encontrados
+    assert all('HUAMÁN' in nombre for nombre in encontrados)
@@ -0,0 +1,195 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+import analysis_core
+
+# =========================================================================
+# === TENDENCIA ENTRE N PERÍODOS ===
+# Compara los resultados de varios períodos (p. ej. los 4 bimestres del año).
+# Las competencias se alinean una sola vez por (área, nombre limpio)
+# normalizados, así que el número '01 =' o las tildes pueden cambiar entre
+# archivos; conteos, porcentajes y deltas de todas las competencias y
+# períodos salen de operaciones sobre un único array NumPy.
+# =========================================================================
+
+# Palabras con las que SIAGIE nombra el orden del período ('Primer Bimestre', 'II TRIMESTRE', ...)
+_ORDINALES = {
+    'primer': 1, 'primero': 1, 'segundo': 2, 'tercer': 3, 'tercero': 3, 'cuarto': 4,
+    'i': 1, 'ii': 2, 'iii': 3, 'iv': 4,
+}
+_PALABRA = re.compile(r'[0-9a-z]+')
+
+
+def period_order(label):
+    """
+    Número de orden de un período a partir de su nombre ('Tercer Bimestre' -> 3,
+    'II TRIMESTRE' -> 2, 'Bimestre 4' -> 4), o None si no se reconoce.
+    """
+    for word in _PALABRA.findall(analysis_core.normalize_text(str(label))):
+        if word.isdigit():
+            return int(word)
+        if word in _ORDINALES:
+            return _ORDINALES[word]
+    return None
+
+
+def sort_periods(periods):
+    """
+    Ordena pares (etiqueta, resultados) por el orden reconocido en la etiqueta;
+    los no reconocidos quedan al final en el orden en que llegaron.
+    """
+    keyed = [(period_order(label), i, (label, results)) for i, (label, results) in enumerate(periods)]
+    keyed.sort(key=lambda item: (item[0] is None, item[0] or 0, item[1]))
+    return [item[2] for item in keyed]
+
+
+class PeriodTrend:
+    """
+    Conteos alineados períodos × competencias × 4 (orden de NIVELES_LOGRO), con los
+    porcentajes y deltas ya calculados. Una competencia que falta en un período tiene
+    conteos 0, present=False y porcentajes/deltas NaN en ese período.
+    """
+
+    __slots__ = ('periods', 'areas', 'competencies', 'full_names', 'counts', 'present',
+                 'totals', 'pct', 'delta_prev', 'delta_first', '_index')
+
+    def __init__(self, periods, areas, competencies, full_names, counts, present):
+        self.periods = list(periods)          # etiquetas de período, en orden
+        self.areas = areas                    # área de cada competencia alineada
+        self.competencies = competencies      # nombre limpio de cada competencia alineada
+        self.full_names = full_names          # nombre completo ('01 = ...') visto primero
+        self.counts = counts                  # (períodos × competencias × 4) int64
+        self.present = present                # (períodos × competencias) bool
+        self._index = {
+            (analysis_core.normalize_text(area), analysis_core.normalize_text(comp)): k
+            for k, (area, comp) in enumerate(zip(areas, competencies))
+        }
+
+        self.totals = counts.sum(axis=-1)
+        pct = np.divide(counts * 100.0, self.totals[..., None], out=np.zeros(counts.shape), where=self.totals[..., None] > 0)
+        self.pct = np.where(present[..., None], pct, np.nan)
+        # Delta respecto del período anterior (el primero queda en NaN) y respecto del primero
+        self.delta_prev = np.full(self.pct.shape, np.nan)
+        self.delta_prev[1:] = np.diff(self.pct, axis=0)
+        self.delta_first = self.pct - self.pct[:1]
+
+    @classmethod
+    def build(cls, periods):
+        """
+        Construye la tendencia desde pares (etiqueta, resultados), donde resultados es
+        el dict de analyze_data o un analysis_core.AnalysisResult. Las competencias
+        siguen el orden de aparición (área por área) a lo largo de los períodos.
+        """
+        n_levels = len(analysis_core.NIVELES_LOGRO)
+        labels = []
+        models = []
+        index = {}
+        areas, competencies, full_names = [], [], []
+        # Por período: (índice alineado, hoja, competencia) de cada celda del modelo columnar
+        positions = []
+        for label, results in periods:
+            model = analysis_core.AnalysisResult.from_dict(results)
+            aligned, sheets, comps = [], [], []
+            for i, sheet_name in enumerate(model.sheet_names):
+                area_key = analysis_core.normalize_text(sheet_name)
+                for j in model.sheet_comps[i].tolist():
+                    key = (area_key, analysis_core.normalize_text(model.clean_names[j]))
+                    if key not in index:
+                        index[key] = len(index)
+                        areas.append(sheet_name)
+                        competencies.append(model.clean_names[j])
+                        full_names.append(model.comp_names[j])
+                    aligned.append(index[key])
+                    sheets.append(i)
+                    comps.append(j)
+            labels.append(label)
+            models.append(model)
+            positions.append((np.array(aligned, dtype=np.intp), np.array(sheets, dtype=np.intp), np.array(comps, dtype=np.intp)))
+
+        counts = np.zeros((len(labels), len(index), n_levels), dtype=np.int64)
+        present = np.zeros((len(labels), len(index)), dtype=bool)
+        for p, (model, (aligned, sheets, comps)) in enumerate(zip(models, positions)):
+            # Una competencia repetida en dos hojas del mismo período se suma
+            np.add.at(counts[p], aligned, model.counts[sheets, comps])
+            present[p, aligned] = True
+        return cls(labels, areas, competencies, full_names, counts, present)
+
+    def __len__(self):
+        return len(self.competencies)
+
+    def find(self, area, competencia):
+        """Índice alineado de una competencia (nombre limpio o completo) de un área, o None."""
+        key = (analysis_core.normalize_text(area),
+               analysis_core.normalize_text(analysis_core.clean_competencia_name(competencia)))
+        return self._index.get(key)
+
+    def area_competencies(self, area):
+        """Índices alineados de las competencias de un área, en orden."""
+        area_key = analysis_core.normalize_text(area)
+        return [k for (a, _), k in self._index.items() if a == area_key]
+
+    def area_names(self):
+        """Áreas en orden de aparición (sin repetir)."""
+        return list(dict.fromkeys(self.areas))
+
+    def complete(self):
+        """Máscara de las competencias presentes en todos los períodos."""
+        return self.present.all(axis=0)
+
+    # --- Tablas para los gráficos ---
+    def levels_frame(self, k):
+        """Tabla larga de una competencia: Período, Nivel, Estudiantes, % (barras agrupadas)."""
+        niveles = analysis_core.NIVELES_LOGRO
+        n_periods = len(self.periods)
+        return pd.DataFrame({
+            'Período': np.repeat(self.periods, len(niveles)),
+            'Nivel': niveles * n_periods,
+            'Estudiantes': self.counts[:, k].ravel(),
+            '%': self.pct[:, k].ravel().round(1),
+        })
+
+    def pct_frame(self, k):
+        """Porcentajes de una competencia con Nivel como índice y un período por columna (barras apiladas)."""
+        return pd.DataFrame(self.pct[:, k].T, index=pd.Index(analysis_core.NIVELES_LOGRO, name='Nivel'), columns=self.periods)
+
+    def ad_a_frame(self, k):
+        """% AD + A de una competencia por período (líneas de evolución)."""
+        niveles = analysis_core.NIVELES_LOGRO
+        logro = self.pct[:, k, niveles.index('AD')] + self.pct[:, k, niveles.index('A')]
+        return pd.DataFrame({'Período': self.periods, '% AD + A': logro.round(1)})
+
+    def comparison_table(self, k):
+        """
+        Tabla por nivel de una competencia: conteos y % de cada período, más el delta
+        del último período contra el anterior ('Δ %') y contra el primero ('Δ % total').
+        Los valores son numéricos; el formato queda a cargo de quien la muestre.
+        """
+        df = pd.DataFrame({'Nivel': analysis_core.NIVELES_LOGRO})
+        for p, label in enumerate(self.periods):
+            df[f'Conteos {label}'] = self.counts[p, k]
+            df[f'% {label}'] = self.pct[p, k].round(1)
+        df['Δ %'] = self.delta_prev[-1, k].round(1)
+        if len(self.periods) > 2:
+            df['Δ % total'] = self.delta_first[-1, k].round(1)
+        return df
+
+    def summary_frame(self):
+        """Todas las competencias y períodos en formato largo: conteos, total, % y deltas por nivel."""
+        niveles = analysis_core.NIVELES_LOGRO
+        n_periods, n_comps = self.present.shape
+        df = pd.DataFrame({
+            'periodo': np.repeat(self.periods, n_comps),
+            'area': self.areas * n_periods,
+            'competencia': self.competencies * n_periods,
+        })
+        df[niveles] = self.counts.reshape(-1, len(niveles))
+        df['total'] = self.totals.ravel()
+        pct = self.pct.reshape(-1, len(niveles)).round(1)
+        delta = self.delta_prev.reshape(-1, len(niveles)).round(1)
+        for j, nivel in enumerate(niveles):
+            df[f'% {nivel}'] = pct[:, j]
+        for j, nivel in enumerate(niveles):
+            df[f'Δ {nivel}'] = delta[:, j]
+        return df